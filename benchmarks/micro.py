@@ -0,0 +1,299 @@
+#!/usr/bin/env python3
+
+#  (C) Copyright Wieger Wesselink 2021. Distributed under the GPL-3.0-or-later
+#  Software License, (See accompanying file LICENSE or copy at
+#  https://www.gnu.org/licenses/gpl-3.0.txt)
+
+"""
+Micro-benchmarks of the core operations of the agents: move generation, move ordering (vectorized if numpy is
+installed), move scoring, make/unmake, MCTS rollouts, board parsing and the safe moves query of the oracle. Every benchmark is run on the boards in the boards directory and on positions generated from them.
+
+Typical usage:
+
+    python -m benchmarks.micro --save baseline.json
+    ...  # change the code
+    python -m benchmarks.micro --compare baseline.json --threshold 0.25
+
+The results are times in seconds per operation, so a larger value is worse.
+"""
+
+import argparse
+import json
+import platform
+import sys
+import time
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+from benchmarks.positions import benchmark_positions, game_state
+from competitive_sudoku import tensor
+from competitive_sudoku.engine import SearchEngine
+from competitive_sudoku.solver import solution_support
+from competitive_sudoku.sudoku import Move, SudokuBoard, TabooMove, load_sudoku_from_text
+from team6_A3_extra1.State import State
+
+
+def a1_legal_moves(board: SudokuBoard, taboo_moves: List[TabooMove]) -> List[Move]:
+    """
+    The move generation of the original team6_A1 agent, which scans the row, the column and the block of every
+    candidate move. It is kept here as a reference for the set based move generation of SearchEngine.
+    """
+    m, n, N = board.m, board.n, board.N
+    possible_moves = [Move(i, j, value) for i in range(N) for j in range(N) for value in range(1, N + 1)
+                      if board.get(i, j) == SudokuBoard.empty and not TabooMove(i, j, value) in taboo_moves]
+    legal_moves = []
+    for move in possible_moves:
+        i, j, value = move.i, move.j, move.value
+        legal = True
+        for k in range(N):
+            if board.get(i, k) == value:
+                legal = False
+                break
+        if legal:
+            for l in range(N):
+                if board.get(l, j) == value:
+                    legal = False
+                    break
+        if legal:
+            i0, j0 = i // m * m, j // n * n
+            for l in range(i0, i0 + m):
+                for k in range(j0, j0 + n):
+                    if board.get(l, k) == value:
+                        legal = False
+                        break
+        if legal:
+            legal_moves.append(move)
+    return legal_moves
+
+
+def a1_calculate_move_score(board: SudokuBoard, i: int, j: int, value: int) -> int:
+    """
+    The move scoring of the original team6_A1 agent, which puts the move on the board and scans its three regions.
+    The move is left on the board.
+    """
+    m, n, N = board.m, board.n, board.N
+    board.put(i, j, value)
+    row, column, block = 1, 1, 1
+    for k in range(N):
+        if board.get(i, k) == SudokuBoard.empty:
+            row = 0
+            break
+    for l in range(N):
+        if board.get(l, j) == SudokuBoard.empty:
+            column = 0
+            break
+    i0, j0 = i // m * m, j // n * n
+    for l in range(i0, i0 + m):
+        for k in range(j0, j0 + n):
+            if board.get(l, k) == SudokuBoard.empty:
+                block = 0
+                break
+    return {0: 0, 1: 1, 2: 3, 3: 7}[row + column + block]
+
+
+def measure(function: Callable[[], int], min_time: float = 0.2, repeat: int = 3) -> float:
+    """
+    Measures the time of an operation.
+    @param function: A function that performs a number of operations and returns that number.
+    @param min_time: Every measurement calls function until at least this many seconds have passed.
+    @param repeat: The number of measurements. The fastest one is used, since the others are disturbed by other work.
+    @return: The time in seconds per operation.
+    """
+    best = float('inf')
+    for _ in range(repeat):
+        operations = 0
+        start_time = time.perf_counter()
+        while True:
+            operations += function()
+            elapsed = time.perf_counter() - start_time
+            if elapsed >= min_time:
+                break
+        best = min(best, elapsed / max(1, operations))
+    return best
+
+
+def sample_moves(engine: SearchEngine, size: int = 64) -> List[Move]:
+    """
+    @return: A deterministic sample of the legal moves of a position.
+    """
+    moves = sorted(engine.get_all_legal_moves(), key=lambda move: (move.i, move.j, move.value))
+    step = max(1, len(moves) // size)
+    return moves[::step][:size]
+
+
+def benchmarks_for(board: SudokuBoard) -> Dict[str, Callable[[], int]]:
+    """
+    Creates the benchmarks of a position. Every benchmark is a function that performs a number of operations and returns
+    that number.
+    """
+    state = game_state(board)
+    engine = SearchEngine(state)
+    # an engine that scores the moves by move_and_calculate_score, as without numpy
+    python_engine = SearchEngine(state)
+    python_engine.tensor_min_empties = float('inf')
+    moves = sample_moves(engine)
+    scratch_board = state.board
+    mcts_state = State(scratch_board, [0, 0], engine.get_all_legal_moves(), 1, 1)
+    board_text = str(board)
+
+    def movegen_a1_scan():
+        a1_legal_moves(scratch_board, state.taboo_moves)
+        return 1
+
+    def movegen_engine():
+        engine.get_all_legal_moves()
+        return 1
+
+    def scoring_a1():
+        for move in moves:
+            a1_calculate_move_score(scratch_board, move.i, move.j, move.value)
+            scratch_board.put(move.i, move.j, SudokuBoard.empty)
+        return len(moves)
+
+    def scoring_engine():
+        for move in moves:
+            engine.move_and_calculate_score(move, True)
+            engine.cancel_move(move)
+        return len(moves)
+
+    def scoring_state():
+        for move in moves:
+            mcts_state.get_score(move)
+        return len(moves)
+
+    def make_unmake():
+        for move in moves:
+            engine.make_move(move)
+            engine.cancel_move(move)
+        return len(moves)
+
+    def ordering_engine():
+        python_engine.root_moves()
+        return 1
+
+    def ordering_tensor():
+        # the setup of the tensor is part of the cost, since the agents create it for every root position
+        tensor.CandidateTensor(scratch_board, engine.taboo_moves).ordered_moves()
+        return 1
+
+    def parsing():
+        load_sudoku_from_text(board_text)
+        return 1
+
+    def safe_moves():
+        solution_support(scratch_board)
+        return 1
+
+    benchmarks = {
+        'movegen/a1_scan': movegen_a1_scan,
+        'movegen/engine': movegen_engine,
+        'ordering/engine': ordering_engine,
+        'parsing': parsing,
+    }
+    if tensor.available():
+        benchmarks['ordering/tensor'] = ordering_tensor
+    if moves:
+        benchmarks.update({
+            'scoring/calculate_move_score': scoring_a1,
+            'scoring/move_and_calculate_score': scoring_engine,
+            'scoring/state_get_score': scoring_state,
+            'make_unmake': make_unmake,
+        })
+        rollout = rollout_benchmark(mcts_state)
+        if rollout is not None:
+            benchmarks['mcts/rollout'] = rollout
+        # on the largest boards a single query takes seconds
+        if board.N <= 16:
+            benchmarks['oracle/safe_moves'] = safe_moves
+    return benchmarks
+
+
+def rollout_benchmark(state: State) -> Optional[Callable[[], int]]:
+    """
+    @return: A benchmark of a single MCTS rollout, or None if the MCTS agent cannot be imported (it requires numpy).
+    """
+    try:
+        from team6_A3_extra1.MonteCarlo import MonteCarloTreeSearchNode
+    except ImportError:
+        return None
+    node = MonteCarloTreeSearchNode(state=state)
+
+    def rollout():
+        node.rollout()
+        return 1
+
+    return rollout
+
+
+def run(names: Optional[List[str]], pattern: Optional[str], min_time: float) -> Dict[str, float]:
+    """
+    Runs the benchmarks.
+    @param names: The names of the boards, or None for all boards.
+    @param pattern: If set, only the benchmarks with this substring in their name are run.
+    @param min_time: The minimal duration of a single measurement.
+    @return: A mapping from '<position>/<benchmark>' to the time in seconds per operation.
+    """
+    results = {}
+    for position_name, board in benchmark_positions(names).items():
+        for benchmark_name, function in benchmarks_for(board).items():
+            name = f'{position_name}/{benchmark_name}'
+            if pattern and pattern not in name:
+                continue
+            results[name] = measure(function, min_time)
+            print(f'{name:60} {results[name] * 1e6:12.2f} us')
+    return results
+
+
+def compare(baseline: Dict[str, float], results: Dict[str, float], threshold: float) -> List[str]:
+    """
+    Compares results with a baseline.
+    @param threshold: A benchmark is a regression if it is more than this fraction slower than the baseline.
+    @return: The names of the benchmarks that regressed.
+    """
+    regressions = []
+    for name in sorted(results):
+        if name not in baseline:
+            continue
+        ratio = results[name] / baseline[name]
+        flag = ''
+        if ratio > 1 + threshold:
+            flag = 'REGRESSION'
+            regressions.append(name)
+        elif ratio < 1 - threshold:
+            flag = 'improved'
+        print(f'{name:60} {baseline[name] * 1e6:12.2f} -> {results[name] * 1e6:12.2f} us  {ratio:6.2f}x {flag}')
+    return regressions
+
+
+def main():
+    cmdline_parser = argparse.ArgumentParser(description='Micro-benchmarks of the core operations of the agents.')
+    cmdline_parser.add_argument('--boards', nargs='*', help='the names of the boards (default: all boards)')
+    cmdline_parser.add_argument('--filter', help='only run the benchmarks with this substring in their name')
+    cmdline_parser.add_argument('--min-time', type=float, default=0.2, help='the minimal duration in seconds of a measurement (default: 0.2)')
+    cmdline_parser.add_argument('--save', metavar='FILE', help='save the results as a JSON baseline')
+    cmdline_parser.add_argument('--compare', metavar='FILE', help='compare the results with a JSON baseline')
+    cmdline_parser.add_argument('--threshold', type=float, default=0.25, help='the relative slowdown that counts as a regression (default: 0.25)')
+    args = cmdline_parser.parse_args()
+
+    results = run(args.boards, args.filter, args.min_time)
+
+    if args.save:
+        baseline = {
+            'date': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'machine': platform.node(),
+            'results': results,
+        }
+        with open(args.save, 'w') as handle:
+            json.dump(baseline, handle, indent=2, sort_keys=True)
+
+    if args.compare:
+        with open(args.compare) as handle:
+            baseline = json.load(handle)
+        regressions = compare(baseline['results'], results, args.threshold)
+        if regressions:
+            print(f'{len(regressions)} regression(s) beyond {args.threshold:.0%}')
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
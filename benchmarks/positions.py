@@ -0,0 +1,57 @@
+#  (C) Copyright Wieger Wesselink 2021. Distributed under the GPL-3.0-or-later
+#  Software License, (See accompanying file LICENSE or copy at
+#  https://www.gnu.org/licenses/gpl-3.0.txt)
+
+import copy
+import random
+from pathlib import Path
+from typing import Dict, List, Tuple
+from competitive_sudoku.solver import iter_solutions
+from competitive_sudoku.sudoku import GameState, SudokuBoard, load_sudoku
+
+boards_dir = Path(__file__).resolve().parent.parent / 'boards'
+
+
+def fill_position(board: SudokuBoard, fill_ratio: float, seed: int) -> SudokuBoard:
+    """
+    Creates a position of a game that starts in board, by filling a fraction of its empty squares with the values of a
+    random solution. The position therefore still has a solution.
+    @param board: A sudoku board that has a solution.
+    @param fill_ratio: The fraction of the empty squares that is filled.
+    @param seed: The seed of the random generator.
+    @return: A new board.
+    """
+    rng = random.Random(seed)
+    solution = next(iter_solutions(board, limit=1, rng=rng))
+    result = copy.deepcopy(board)
+    empties = [k for k, value in enumerate(board.squares) if value == SudokuBoard.empty]
+    for k in rng.sample(empties, int(len(empties) * fill_ratio)):
+        result.squares[k] = solution[k]
+    return result
+
+
+def benchmark_positions(names: List[str] = None, fill_ratios: Tuple[float, ...] = (0.5,), seed: int = 0) -> Dict[str, SudokuBoard]:
+    """
+    The positions used by the benchmarks: the boards in the boards directory, and positions that are generated from them
+    by filling part of the empty squares.
+    @param names: The names of the boards, without extension. By default all boards are used.
+    @param fill_ratios: The fill ratios of the generated positions.
+    @param seed: The seed of the generated positions.
+    @return: A mapping from the name of a position to the position.
+    """
+    if names is None:
+        names = sorted(path.stem for path in boards_dir.glob('*.txt'))
+    positions = {}
+    for name in names:
+        board = load_sudoku(str(boards_dir / f'{name}.txt'))
+        positions[name] = board
+        for fill_ratio in fill_ratios:
+            positions[f'{name}@{fill_ratio}'] = fill_position(board, fill_ratio, seed)
+    return positions
+
+
+def game_state(board: SudokuBoard) -> GameState:
+    """
+    @return: A game state with position board, without history.
+    """
+    return GameState(copy.deepcopy(board), copy.deepcopy(board), [], [], [0, 0])
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+
+#  (C) Copyright Wieger Wesselink 2021. Distributed under the GPL-3.0-or-later
+#  Software License, (See accompanying file LICENSE or copy at
+#  https://www.gnu.org/licenses/gpl-3.0.txt)
+
+"""
+Scaling benchmark: measures how the cost of the core operations grows with the board size, from 2x2 blocks (N = 4)
+up to 6x6 blocks (N = 36), on generated positions. Besides the time per operation it prints the growth exponent
+between consecutive sizes, i.e. the e in cost ~ N^e. Move generation is measured per generated move, so an exponent
+close to 0 means that the cost of a move does not depend on N.
+
+Typical usage:
+
+    python -m benchmarks.scaling --fill 0.3 --save scaling.json
+"""
+
+import argparse
+import json
+import math
+from typing import Dict, List, Tuple
+from benchmarks.micro import measure, sample_moves
+from benchmarks.positions import game_state
+from competitive_sudoku.engine import SearchEngine
+from competitive_sudoku.generator import generate_board
+from competitive_sudoku.records import board_from_bytes, board_to_bytes
+from competitive_sudoku.sudoku import load_sudoku_from_text, print_board
+
+shapes = [(2, 2), (2, 3), (3, 3), (3, 4), (4, 4), (4, 5), (5, 5), (5, 6), (6, 6)]
+
+
+def measure_shape(m: int, n: int, fill_ratio: float, min_time: float) -> Dict[str, float]:
+    """
+    @return: The time in seconds per operation of the core operations on a generated m x n position.
+    """
+    board = generate_board(m, n, fill_ratio, 0)
+    state = game_state(board)
+    engine = SearchEngine(state)
+    moves = sample_moves(engine)
+    number_of_moves = len(engine.get_all_legal_moves())
+    board_text = str(board)
+    board_data = board_to_bytes(board)
+
+    def setup():
+        SearchEngine(state)
+        return 1
+
+    def movegen():
+        return len(engine.get_all_legal_moves())
+
+    def make_unmake():
+        for move in moves:
+            engine.make_move(move)
+            engine.cancel_move(move)
+        return len(moves)
+
+    def scoring():
+        for move in moves:
+            engine.move_and_calculate_score(move, True)
+            engine.cancel_move(move)
+        return len(moves)
+
+    def text():
+        load_sudoku_from_text(str(load_sudoku_from_text(board_text)))
+        print_board(board)
+        return 1
+
+    def binary():
+        board_from_bytes(board_data)
+        return 1
+
+    return {
+        'moves': number_of_moves,
+        'setup': measure(setup, min_time),
+        'movegen/move': measure(movegen, min_time),
+        'make_unmake': measure(make_unmake, min_time),
+        'scoring': measure(scoring, min_time),
+        'text': measure(text, min_time),
+        'binary': measure(binary, min_time),
+    }
+
+
+def growth_exponents(results: List[Tuple[int, Dict[str, float]]], name: str) -> List[float]:
+    """
+    @return: The exponents e such that the cost of operation name grows as N^e between consecutive sizes.
+    """
+    exponents = []
+    for (N1, r1), (N2, r2) in zip(results, results[1:]):
+        exponents.append(math.log(r2[name] / r1[name]) / math.log(N2 / N1))
+    return exponents
+
+
+def main():
+    cmdline_parser = argparse.ArgumentParser(description='Benchmark of the core operations for growing board sizes.')
+    cmdline_parser.add_argument('--fill', type=float, default=0.3, help='the fill ratio of the generated positions (default: 0.3)')
+    cmdline_parser.add_argument('--min-time', type=float, default=0.2, help='the minimal duration in seconds of a measurement (default: 0.2)')
+    cmdline_parser.add_argument('--save', metavar='FILE', help='save the results as JSON')
+    args = cmdline_parser.parse_args()
+
+    names = ['setup', 'movegen/move', 'make_unmake', 'scoring', 'text', 'binary']
+    results = []
+    print(f"{'shape':>6} {'N':>3} {'moves':>7} " + ' '.join(f'{name:>14}' for name in names) + '   (us per operation)')
+    for m, n in shapes:
+        result = measure_shape(m, n, args.fill, args.min_time)
+        results.append((m * n, result))
+        print(f"{f'{m}x{n}':>6} {m * n:3} {result['moves']:7} " + ' '.join(f'{result[name] * 1e6:14.2f}' for name in names))
+
+    print('growth exponent e in cost ~ N^e between consecutive sizes')
+    for name in names:
+        exponents = growth_exponents(results, name)
+        print(f'{name:>14} ' + ' '.join(f'{e:5.2f}' for e in exponents))
+
+    if args.save:
+        with open(args.save, 'w') as handle:
+            json.dump({'fill_ratio': args.fill, 'results': [dict(result, N=N) for N, result in results]}, handle, indent=2)
+
+
+if __name__ == '__main__':
+    main()
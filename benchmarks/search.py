@@ -0,0 +1,250 @@
+#!/usr/bin/env python3
+
+#  (C) Copyright Wieger Wesselink 2021. Distributed under the GPL-3.0-or-later
+#  Software License, (See accompanying file LICENSE or copy at
+#  https://www.gnu.org/licenses/gpl-3.0.txt)
+
+"""
+Search benchmark: runs the compute_best_move of the agents on a fixed set of mid-game and endgame positions with fixed
+time budgets. For every run it records the depth reached, the nodes searched, the time at which the final move was
+first proposed, and whether that move is one of the best moves of the position.
+
+The best moves are computed offline and stored in benchmarks/search_positions.json. Endgame positions are solved
+exactly, for mid-game positions the best moves of a deep fixed-depth alpha-beta search are used as reference.
+
+Typical usage:
+
+    python -m benchmarks.search --generate   # recompute the best moves, this takes a few minutes
+    python -m benchmarks.search --agents team6_A2 team6_A3 --time 0.5 2 --save results.json
+"""
+
+import argparse
+import importlib
+import json
+import multiprocessing
+import os
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+from benchmarks.positions import boards_dir, fill_position, game_state
+from competitive_sudoku.endgame import EndgameSolver
+from competitive_sudoku.engine import SearchEngine, points_rule
+from competitive_sudoku.solver import iter_solutions
+from competitive_sudoku.sudoku import Move, SudokuBoard, load_sudoku, load_sudoku_from_text
+from competitive_sudoku.sudokuai import SudokuAI
+
+positions_path = Path(__file__).resolve().parent / 'search_positions.json'
+
+# name -> (board, fill ratio, kind), the positions are generated with seed 0
+position_specs = {
+    'random-2x3@0.0': ('random-2x3', 0.0, 'midgame'),
+    'random-3x3@0.25': ('random-3x3', 0.25, 'midgame'),
+    'hard-3x3@0.4': ('hard-3x3', 0.4, 'midgame'),
+    'empty-3x3@0.5': ('empty-3x3', 0.5, 'midgame'),
+    'random-3x4@0.5': ('random-3x4', 0.5, 'midgame'),
+    'random-2x3@0.2': ('random-2x3', 0.2, 'endgame'),
+    'random-3x3@0.6': ('random-3x3', 0.6, 'endgame'),
+    'easy-3x3@0.7': ('easy-3x3', 0.7, 'endgame'),
+    'random-3x4@0.8': ('random-3x4', 0.8, 'endgame'),
+}
+
+
+def exact_move_values(board: SudokuBoard) -> Dict[tuple, int]:
+    """
+    Computes the exact value of every move that agrees with a solution of the board. Raises RuntimeError if the
+    position after a move is too large for the endgame solver.
+    @return: A mapping from (i, j, value) to the score difference that the player to move obtains with that move.
+    """
+    solver = EndgameSolver(max_empties=board.N * board.N, max_solutions=100000, max_nodes=10 ** 8)
+    m, n, N = board.m, board.n, board.N
+    solutions = list(iter_solutions(board))
+    values = {}
+    for k in range(N * N):
+        if board.squares[k] != SudokuBoard.empty:
+            continue
+        i, j = board.f2rc(k)
+        for value in sorted(set(solution[k] for solution in solutions)):
+            board.squares[k] = value
+            row = all(board.get(i, c) != SudokuBoard.empty for c in range(N))
+            col = all(board.get(r, j) != SudokuBoard.empty for r in range(N))
+            i0, j0 = i // m * m, j // n * n
+            blk = all(board.get(r, c) != SudokuBoard.empty for r in range(i0, i0 + m) for c in range(j0, j0 + n))
+            # a full board has value 0, otherwise the solver gives up only if it reaches one of its limits
+            full = SudokuBoard.empty not in board.squares
+            result = None if full else solver.solve(board)
+            board.squares[k] = SudokuBoard.empty
+            if not full and result is None:
+                raise RuntimeError(f'The endgame solver could not solve the position after the move ({i},{j}) -> {value}.')
+            values[(i, j, value)] = points_rule[row + col + blk] - (0 if full else result.score)
+    return values
+
+
+def searched_move_values(board: SudokuBoard, depth: int) -> Dict[tuple, float]:
+    """
+    Computes the value of every legal move with a full-window alpha-beta search of the given depth.
+    @return: A mapping from (i, j, value) to the value of the move.
+    """
+    engine = SearchEngine(game_state(board))
+    values = {}
+    for move in engine.get_all_legal_moves():
+        score = engine.move_and_calculate_score(move, True)
+        values[(move.i, move.j, move.value)] = score + engine.minimax(depth - 1, -float('inf'), float('inf'), False)
+        engine.cancel_move(move)
+    return values
+
+
+def generate_positions(reference_depth: int) -> None:
+    """
+    Generates the benchmark positions and their best moves, and writes them to positions_path.
+    @param reference_depth: The search depth that is used for the mid-game positions.
+    """
+    positions = {}
+    for name, (board_name, fill_ratio, kind) in position_specs.items():
+        start_time = time.perf_counter()
+        board = fill_position(load_sudoku(str(boards_dir / f'{board_name}.txt')), fill_ratio, 0)
+        if kind == 'endgame':
+            values = exact_move_values(board)
+        else:
+            values = searched_move_values(board, reference_depth)
+        best_value = max(values.values())
+        best_moves = sorted(move for move, value in values.items() if value >= best_value - 1e-9)
+        positions[name] = {
+            'kind': kind,
+            'board': str(board),
+            'reference': 'exact' if kind == 'endgame' else f'alpha-beta depth {reference_depth}',
+            'best_value': best_value,
+            'best_moves': [list(move) for move in best_moves],
+        }
+        print(f'{name}: {len(best_moves)} best move(s) with value {best_value} ({time.perf_counter() - start_time:.1f}s)')
+    with open(positions_path, 'w') as handle:
+        json.dump(positions, handle, indent=2)
+
+
+def run_agent(player: SudokuAI, board: SudokuBoard, proposals, work_dir: str) -> None:
+    """
+    The target of the process in which an agent computes a move. Every proposed move is recorded with its time.
+    """
+    os.chdir(work_dir)
+    start_time = time.perf_counter()
+    propose_move = player.propose_move
+
+    def recording_propose_move(move: Move) -> None:
+        player.lock.acquire()
+        proposals.append((time.perf_counter() - start_time, move.i, move.j, move.value))
+        player.lock.release()
+        propose_move(move)
+
+    player.propose_move = recording_propose_move
+    player.compute_best_move(game_state(board))
+
+
+def benchmark_agent(module_name: str, board: SudokuBoard, calculation_time: float, manager) -> dict:
+    """
+    Computes a move of an agent in a separate process, which is terminated after calculation_time seconds.
+    @return: The final move, the time at which it was first proposed, and the statistics that the agent reported.
+    """
+    player = importlib.import_module(module_name + '.sudokuai').SudokuAI()
+    player.lock = multiprocessing.Lock()
+    player.best_move = manager.list([0, 0, 0])
+    player.stats = manager.dict()
+    player.time_budget = calculation_time
+    player.player_number = 1
+    proposals = manager.list()
+    with tempfile.TemporaryDirectory() as work_dir:
+        process = multiprocessing.Process(target=run_agent, args=(player, board, proposals, work_dir))
+        process.start()
+        time.sleep(calculation_time)
+        player.lock.acquire()
+        process.terminate()
+        player.lock.release()
+        process.join()
+    move = list(player.best_move)
+    time_to_move = None
+    for proposal_time, i, j, value in proposals:
+        if [i, j, value] != move:
+            time_to_move = None
+        elif time_to_move is None:
+            time_to_move = proposal_time
+    return {'move': move, 'time_to_move': time_to_move, 'stats': dict(player.stats)}
+
+
+def run(agents: List[str], budgets: List[float], names: Optional[List[str]]) -> List[dict]:
+    """
+    Runs the benchmark.
+    @param agents: The module names of the agents.
+    @param budgets: The time budgets in seconds.
+    @param names: The names of the positions, or None for all positions.
+    @return: A record for every combination of agent, position and budget.
+    """
+    with open(positions_path) as handle:
+        positions = json.load(handle)
+    records = []
+    with multiprocessing.Manager() as manager:
+        for name, position in positions.items():
+            if names and name not in names:
+                continue
+            board = load_sudoku_from_text(position['board'])
+            for calculation_time in budgets:
+                for agent in agents:
+                    result = benchmark_agent(agent, board, calculation_time, manager)
+                    stats = result['stats']
+                    record = {
+                        'agent': agent,
+                        'position': name,
+                        'kind': position['kind'],
+                        'time': calculation_time,
+                        'move': result['move'],
+                        'best': result['move'] in position['best_moves'],
+                        'time_to_move': result['time_to_move'],
+                        'depth': stats.get('depth'),
+                        'nodes': stats.get('nodes'),
+                        'proved': bool(stats.get('proved')),
+                    }
+                    records.append(record)
+                    time_to_move = '-' if record['time_to_move'] is None else f"{record['time_to_move']:.3f}"
+                    print(f"{name:18} {calculation_time:5}s {agent:16} depth {str(record['depth']):>4} "
+                          f"nodes {str(record['nodes']):>8} move at {time_to_move:>6}s best {record['best']}")
+    return records
+
+
+def summarize(records: List[dict]) -> None:
+    """
+    Prints per agent and budget how many positions were solved, with the average depth and time to the final move.
+    """
+    groups = {}
+    for record in records:
+        groups.setdefault((record['agent'], record['time']), []).append(record)
+    for (agent, calculation_time), group in sorted(groups.items()):
+        best = sum(record['best'] for record in group)
+        depths = [record['depth'] for record in group if record['depth'] is not None]
+        times = [record['time_to_move'] for record in group if record['time_to_move'] is not None]
+        average_depth = sum(depths) / len(depths) if depths else float('nan')
+        average_time = sum(times) / len(times) if times else float('nan')
+        print(f'{agent:16} {calculation_time:5}s best move {best}/{len(group)}  average depth {average_depth:.2f}  '
+              f'average time to move {average_time:.3f}s')
+
+
+def main():
+    cmdline_parser = argparse.ArgumentParser(description='Benchmark of the search of the agents on fixed positions.')
+    cmdline_parser.add_argument('--agents', nargs='*', default=['team6_A1', 'team6_A2', 'team6_A3'], help='the module names of the agents')
+    cmdline_parser.add_argument('--time', nargs='*', type=float, default=[0.5, 2.0], help='the time budgets in seconds')
+    cmdline_parser.add_argument('--positions', nargs='*', help='the names of the positions (default: all positions)')
+    cmdline_parser.add_argument('--save', metavar='FILE', help='save the results as JSON')
+    cmdline_parser.add_argument('--generate', action='store_true', help='recompute the positions and their best moves')
+    cmdline_parser.add_argument('--reference-depth', type=int, default=4, help='the search depth of the reference moves of mid-game positions (default: 4)')
+    args = cmdline_parser.parse_args()
+
+    if args.generate:
+        generate_positions(args.reference_depth)
+        return
+
+    records = run(args.agents, args.time, args.positions)
+    summarize(records)
+    if args.save:
+        with open(args.save, 'w') as handle:
+            json.dump(records, handle, indent=2)
+
+
+if __name__ == '__main__':
+    main()
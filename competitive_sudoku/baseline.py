@@ -0,0 +1,98 @@
+#  (C) Copyright Wieger Wesselink 2021. Distributed under the GPL-3.0-or-later
+#  Software License, (See accompanying file LICENSE or copy at
+#  https://www.gnu.org/licenses/gpl-3.0.txt)
+
+"""
+The move generation of the baseline players random_player and greedy_player, which used to ask solve_sudoku for a
+--random or a --greedy move. The moves are drawn from the same distribution: uniformly from the moves that do not
+conflict with a filled square and that are not taboo, and for a greedy move uniformly from those with the most points.
+"""
+
+import random
+from typing import Iterable, List, Optional, Tuple
+from competitive_sudoku import tensor
+from competitive_sudoku.solver import region_masks
+from competitive_sudoku.sudoku import Move, SudokuBoard
+
+points_rule = {0: 0, 1: 1, 2: 3, 3: 7}  # the relation between the regions completed and the points gotten
+
+tensor_min_empties = 32  # the minimal number of empty squares for which the moves are generated by a CandidateTensor
+
+
+def region_empties(board: SudokuBoard) -> Tuple[List[int], List[int], List[int]]:
+    """
+    @return: The number of empty squares of every row, column and block, see region_masks for the numbering.
+    """
+    m, n, N = board.m, board.n, board.N
+    rows, cols, blks = [0] * N, [0] * N, [0] * N
+    for k, value in enumerate(board.squares):
+        if value == SudokuBoard.empty:
+            i, j = divmod(k, N)
+            rows[i] += 1
+            cols[j] += 1
+            blks[(i // m) * m + j // n] += 1
+    return rows, cols, blks
+
+
+def generate_move(board: SudokuBoard, taboo_moves: Iterable[Tuple[int, int, int]], greedy: bool, rng: random.Random) -> Optional[Tuple[int, int]]:
+    """
+    Draws a random or a greedy move.
+    @param board: A sudoku board.
+    @param taboo_moves: The moves (i, j, value) that were declared taboo.
+    @param greedy: If True, only the moves with the most points are drawn.
+    @param rng: The random number generator.
+    @return: The move as a pair (square index, value), or None if there is no move.
+    """
+    if tensor.available() and board.squares.count(SudokuBoard.empty) >= tensor_min_empties:
+        # the moves are in the same order, so the same move is drawn
+        candidate_tensor = tensor.CandidateTensor(board, taboo_moves)
+        tensor_moves = candidate_tensor.greedy_moves() if greedy else candidate_tensor.legal_moves()
+        if not tensor_moves:
+            return None
+        move = rng.choice(tensor_moves)
+        return board.rc2f(move.i, move.j), move.value
+    m, n, N = board.m, board.n, board.N
+    row_masks, col_masks, blk_masks = region_masks(board)
+    row_empties, col_empties, blk_empties = region_empties(board)
+    full = ((1 << (N + 1)) - 1) & ~1
+    taboo = {}  # square index -> the bitmask of its taboo values
+    for i, j, value in taboo_moves:
+        taboo[i * N + j] = taboo.get(i * N + j, 0) | 1 << value
+    moves = []
+    best_points = 0
+    for k, value in enumerate(board.squares):
+        if value != SudokuBoard.empty:
+            continue
+        i, j = divmod(k, N)
+        b = (i // m) * m + j // n
+        candidates = full & ~(row_masks[i] | col_masks[j] | blk_masks[b] | taboo.get(k, 0))
+        if not candidates:
+            continue
+        if greedy:
+            # a move completes a region if it fills the last empty square of it
+            points = points_rule[(row_empties[i] == 1) + (col_empties[j] == 1) + (blk_empties[b] == 1)]
+            if points < best_points:
+                continue
+            if points > best_points:
+                best_points = points
+                moves = []
+        moves.extend((k, value) for value in range(1, N + 1) if candidates >> value & 1)
+    if not moves:
+        return None
+    return rng.choice(moves)
+
+
+def baseline_move(board: SudokuBoard, taboo_moves: list, greedy: bool, rng: random.Random) -> Move:
+    """
+    @param board: A sudoku board.
+    @param taboo_moves: A list of TabooMove objects.
+    @param greedy: If True, a greedy move is drawn, otherwise a random move.
+    @param rng: The random number generator.
+    @return: A move, see generate_move.
+    """
+    move = generate_move(board, ((move.i, move.j, move.value) for move in taboo_moves), greedy, rng)
+    if move is None:
+        raise RuntimeError('Could not generate a greedy move.' if greedy else 'Could not generate a legal move.')
+    k, value = move
+    i, j = board.f2rc(k)
+    return Move(i, j, value)
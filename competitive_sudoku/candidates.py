@@ -0,0 +1,192 @@
+#  (C) Copyright Wieger Wesselink 2021. Distributed under the GPL-3.0-or-later
+#  Software License, (See accompanying file LICENSE or copy at
+#  https://www.gnu.org/licenses/gpl-3.0.txt)
+
+from typing import Iterable, List, Tuple
+from competitive_sudoku.solver import units_and_peers
+from competitive_sudoku.sudoku import SudokuBoard
+
+_segments_cache = {}
+
+
+def unit_segments(m: int, n: int) -> List[List[Tuple[List[int], List[int], List[int]]]]:
+    """
+    Computes for every unit (see units_and_peers) its intersections with the units of the other kind: the rows and
+    the columns of a block, and the blocks of a row or a column.
+    @return: For every unit a list of triples (the squares of an intersection, the other squares of the unit, the
+    squares of the other unit outside the intersection).
+    """
+    segments = _segments_cache.get((m, n))
+    if segments is None:
+        N = m * n
+        units, _ = units_and_peers(m, n)
+        rows, cols, blks = units[:N], units[N:2 * N], units[2 * N:]
+        segments = []
+        for line in rows + cols:
+            # a row or a column crosses a number of blocks
+            line_segments = []
+            for blk in blks:
+                segment = [k for k in line if k in blk]
+                if segment:
+                    line_segments.append((segment, [k for k in line if k not in segment], [k for k in blk if k not in segment]))
+            segments.append(line_segments)
+        for blk in blks:
+            blk_segments = []
+            for line in rows + cols:
+                segment = [k for k in blk if k in line]
+                if segment:
+                    blk_segments.append((segment, [k for k in blk if k not in segment], [k for k in line if k not in segment]))
+            segments.append(blk_segments)
+        _segments_cache[(m, n)] = segments
+    return segments
+
+
+class CandidateStore(object):
+    """
+    Keeps for every square of a board the bitmask of its candidate values, reduced by the deductions of a human
+    solver: naked singles, hidden singles, pointing pairs and box-line reduction. In competitive sudoku a deduced value
+    is not filled in, the square keeps a single candidate. A value that is eliminated can not be played without making
+    the sudoku unsolvable, so such moves would be declared taboo.
+
+    The store is updated incrementally: make only re-examines the units whose candidates changed, and every change is
+    recorded on a trail, such that unmake restores the previous candidates exactly.
+    """
+
+    def __init__(self, board: SudokuBoard, taboo_moves: Iterable[Tuple[int, int, int]] = ()):
+        """
+        @param board: A sudoku board, it is not modified.
+        @param taboo_moves: The moves (i, j, value) that were declared taboo, their values are eliminated.
+        """
+        m, n, N = board.m, board.n, board.N
+        self.N = N
+        self.full = ((1 << (N + 1)) - 1) & ~1
+        self.units, self.peers = units_and_peers(m, n)
+        self.segments = unit_segments(m, n)
+        # the numbers of the row, the column and the block unit of every square
+        self.square_units = [(k // N, N + k % N, 2 * N + (k // N // m) * m + k % N // n) for k in range(N * N)]
+        self.squares = list(board.squares)
+        self.candidates = [self.full if value == SudokuBoard.empty else 1 << value for value in self.squares]
+        self.trail: List[Tuple[int, int]] = []  # (square, its candidates before the change)
+        self.marks: List[Tuple[int, bool]] = []  # the trail length and the contradiction flag before every make
+        self.contradiction = False  # True if the deductions showed that the board has no solution
+        self.pending_squares: List[int] = []  # squares with a single candidate that was not yet removed from the peers
+        self.pending_units = set()
+        for k, value in enumerate(self.squares):
+            if value != SudokuBoard.empty:
+                self.pending_squares.append(k)
+        for i, j, value in taboo_moves:
+            if self.squares[i * N + j] == SudokuBoard.empty:
+                self.eliminate(i * N + j, 1 << value)
+        self.pending_units.update(range(3 * N))
+        self.propagate()
+        # the initial deductions can not be undone
+        self.trail = []
+
+    def eliminate(self, k: int, bits: int) -> None:
+        """
+        Removes values from the candidates of a square, and schedules the deductions that follow from it.
+        """
+        c = self.candidates[k]
+        if not c & bits:
+            return
+        self.trail.append((k, c))
+        c &= ~bits
+        self.candidates[k] = c
+        if c == 0:
+            self.contradiction = True
+            return
+        if c & (c - 1) == 0:
+            self.pending_squares.append(k)
+        self.pending_units.update(self.square_units[k])
+
+    def propagate(self) -> None:
+        """
+        Applies the deductions until nothing changes or a contradiction is found.
+        """
+        candidates, peers, full = self.candidates, self.peers, self.full
+        pending_squares, pending_units = self.pending_squares, self.pending_units
+        while not self.contradiction and (pending_squares or pending_units):
+            # naked single: the value of a square with a single candidate is removed from its peers
+            while pending_squares and not self.contradiction:
+                k = pending_squares.pop()
+                c = candidates[k]
+                for p in peers[k]:
+                    if candidates[p] & c:
+                        self.eliminate(p, c)
+            if self.contradiction or not pending_units:
+                break
+            u = pending_units.pop()
+            unit = self.units[u]
+            once = twice = 0
+            for k in unit:
+                c = candidates[k]
+                twice |= once & c
+                once |= c
+            if once != full:
+                # a value without a square
+                self.contradiction = True
+                break
+            # hidden single: a value with a single square in the unit is the only candidate of that square
+            singles = once & ~twice
+            if singles:
+                for k in unit:
+                    c = candidates[k] & singles
+                    if c & (c - 1):
+                        # two values can only go to the same square
+                        self.contradiction = True
+                        break
+                    if c and candidates[k] != c:
+                        self.eliminate(k, candidates[k] & ~c)
+                if self.contradiction:
+                    break
+            # pointing pair and box-line reduction: a value that is confined to the intersection with another unit is
+            # removed from the rest of that unit
+            for segment, rest_of_unit, outside in self.segments[u]:
+                inside = rest = 0
+                for k in segment:
+                    inside |= candidates[k]
+                for k in rest_of_unit:
+                    rest |= candidates[k]
+                confined = inside & ~rest
+                if confined:
+                    for k in outside:
+                        if candidates[k] & confined:
+                            self.eliminate(k, confined)
+        if self.contradiction:
+            pending_squares.clear()
+            pending_units.clear()
+
+    def make(self, k: int, value: int) -> None:
+        """
+        Fills in a square and applies the deductions that follow from it.
+        @param k: The index of an empty square.
+        @param value: The value of the square.
+        """
+        self.marks.append((len(self.trail), self.contradiction))
+        self.squares[k] = value
+        if not self.contradiction:
+            self.eliminate(k, self.candidates[k] & ~(1 << value))
+            if not self.contradiction:
+                # a square that already had a single candidate is not scheduled by eliminate
+                self.pending_squares.append(k)
+                self.pending_units.update(self.square_units[k])
+                self.propagate()
+
+    def unmake(self, k: int) -> None:
+        """
+        Cancels the last call to make, which filled in square k.
+        """
+        length, self.contradiction = self.marks.pop()
+        trail, candidates = self.trail, self.candidates
+        while len(trail) > length:
+            square, c = trail.pop()
+            candidates[square] = c
+        self.squares[k] = SudokuBoard.empty
+
+    def forced_cells(self) -> List[Tuple[int, int, int]]:
+        """
+        @return: The empty squares (i, j) with a single candidate, together with that value.
+        """
+        N, squares = self.N, self.squares
+        return [(k // N, k % N, c.bit_length() - 1) for k, c in enumerate(self.candidates)
+                if squares[k] == SudokuBoard.empty and c & (c - 1) == 0 and c]
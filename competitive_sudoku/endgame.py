@@ -0,0 +1,181 @@
+#  (C) Copyright Wieger Wesselink 2021. Distributed under the GPL-3.0-or-later
+#  Software License, (See accompanying file LICENSE or copy at
+#  https://www.gnu.org/licenses/gpl-3.0.txt)
+
+import time
+from typing import List, Optional
+from competitive_sudoku.solver import iter_solutions
+from competitive_sudoku.sudoku import Move, SudokuBoard
+from competitive_sudoku.zobrist import ZobristKeys
+
+points_rule = {0: 0, 1: 1, 2: 3, 3: 7}  # the relation between the regions completed and the points gotten
+
+EXACT, LOWER, UPPER = 0, 1, 2  # the kinds of values stored in the memo table
+
+
+class _NodeLimitReached(Exception):
+    pass
+
+
+class EndgameResult(object):
+    """
+    The proved outcome of an endgame position.
+    """
+
+    def __init__(self, score: int, move: Move, nodes: int):
+        """
+        @param score: The score difference (own points minus opponent points) that the player to move obtains in the
+        rest of the game under optimal play.
+        @param move: An optimal move.
+        @param nodes: The number of nodes that were searched to prove the result.
+        """
+        self.score = score
+        self.move = move
+        self.nodes = nodes
+
+    def __str__(self):
+        return f'{self.move} with score difference {self.score} ({self.nodes} nodes)'
+
+
+class EndgameSolver(object):
+    """
+    Exact solver for positions with few empty squares.
+
+    Only moves that agree with at least one solution of the sudoku are played, so a proved move can never be a taboo
+    move. Deliberately playing a taboo move to pass the turn is not part of the game tree. The value of a position
+    depends on the board only, hence it is memoized under its Zobrist hash.
+    """
+
+    def __init__(self, max_empties: int = 12, max_solutions: int = 512, max_nodes: int = 200000, max_table_size: int = 1000000):
+        """
+        @param max_empties: Positions with more empty squares than this are not solved.
+        @param max_solutions: Positions with more solutions than this are not solved.
+        @param max_nodes: The search gives up after visiting this many nodes.
+        @param max_table_size: The memo table is cleared when it grows beyond this number of entries.
+        """
+        self.max_empties = max_empties
+        self.max_solutions = max_solutions
+        self.max_nodes = max_nodes
+        self.max_table_size = max_table_size
+        self.table = {}
+        self.nodes = 0
+
+    def solve(self, board: SudokuBoard, time_limit: Optional[float] = None) -> Optional[EndgameResult]:
+        """
+        Computes the exact value and an optimal move of a position.
+        @param board: A sudoku board. It is restored to its original contents before returning.
+        @param time_limit: If set, the search gives up after this many seconds.
+        @return: The proved result, or None if the position is too large to be solved within the configured limits.
+        """
+        deadline = None if time_limit is None else time.perf_counter() + time_limit
+        m, n, N = board.m, board.n, board.N
+        squares = board.squares
+        empties = set(k for k, value in enumerate(squares) if value == SudokuBoard.empty)
+        if not empties or len(empties) > self.max_empties:
+            return None
+        solutions = []
+        for solution in iter_solutions(board, limit=self.max_solutions + 1):
+            solutions.append(solution)
+            if deadline is not None and time.perf_counter() > deadline:
+                return None
+        if not solutions or len(solutions) > self.max_solutions:
+            return None
+        if len(self.table) > self.max_table_size:
+            self.table.clear()
+
+        # the number of empty squares of every row, column and block
+        row_empties = [0] * N
+        col_empties = [0] * N
+        blk_empties = [0] * N
+        regions = [(k // N, k % N, (k // N // m) * m + k % N // n) for k in range(N * N)]
+        for k in empties:
+            i, j, b = regions[k]
+            row_empties[i] += 1
+            col_empties[j] += 1
+            blk_empties[b] += 1
+
+        keys = ZobristKeys.for_size(N).keys
+        table = self.table
+        max_nodes = self.max_nodes
+        self.nodes = 0
+
+        def generate_moves(consistent: List[List[int]], tt_move):
+            """
+            Generates the moves that agree with a solution, captures first and parity preserving moves next.
+            """
+            moves = []
+            for k in empties:
+                i, j, b = regions[k]
+                e_row, e_col, e_blk = row_empties[i], col_empties[j], blk_empties[b]
+                points = points_rule[(e_row == 1) + (e_col == 1) + (e_blk == 1)]
+                # a region that is left with an odd number of empties is likely to be completed by the opponent
+                odd = ((e_row - 1) & 1) + ((e_col - 1) & 1) + ((e_blk - 1) & 1)
+                for value in set(solution[k] for solution in consistent):
+                    priority = 0 if (k, value) == tt_move else 1
+                    moves.append((priority, -points, odd, k, value, points))
+            moves.sort()
+            return moves
+
+        def negamax(h: int, consistent: List[List[int]], alpha: int, beta: int) -> int:
+            if not empties:
+                return 0
+            self.nodes += 1
+            if self.nodes > max_nodes:
+                raise _NodeLimitReached()
+            if deadline is not None and self.nodes & 255 == 0 and time.perf_counter() > deadline:
+                raise _NodeLimitReached()
+
+            tt_move = None
+            entry = table.get(h)
+            if entry is not None:
+                value, flag, tt_move = entry
+                if flag == EXACT:
+                    return value
+                if flag == LOWER and value >= beta:
+                    return value
+                if flag == UPPER and value <= alpha:
+                    return value
+
+            alpha_original = alpha
+            best_value = -float('inf')
+            best_move = None
+            for _, _, _, k, value, points in generate_moves(consistent, tt_move):
+                i, j, b = regions[k]
+                squares[k] = value
+                empties.remove(k)
+                row_empties[i] -= 1
+                col_empties[j] -= 1
+                blk_empties[b] -= 1
+                try:
+                    child = [solution for solution in consistent if solution[k] == value]
+                    result = points - negamax(h ^ keys[k][value], child, points - beta, points - alpha)
+                finally:
+                    squares[k] = SudokuBoard.empty
+                    empties.add(k)
+                    row_empties[i] += 1
+                    col_empties[j] += 1
+                    blk_empties[b] += 1
+                if result > best_value:
+                    best_value = result
+                    best_move = (k, value)
+                alpha = max(alpha, result)
+                if alpha >= beta:
+                    break
+
+            if best_value <= alpha_original:
+                flag = UPPER
+            elif best_value >= beta:
+                flag = LOWER
+            else:
+                flag = EXACT
+            table[h] = (best_value, flag, best_move)
+            return best_value
+
+        h = ZobristKeys.for_size(N).hash(board)
+        try:
+            score = negamax(h, solutions, -float('inf'), float('inf'))
+        except _NodeLimitReached:
+            return None
+        k, value = table[h][2]
+        i, j = board.f2rc(k)
+        return EndgameResult(score, Move(i, j, value), self.nodes)
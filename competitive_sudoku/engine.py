@@ -0,0 +1,813 @@
+#  (C) Copyright Wieger Wesselink 2021. Distributed under the GPL-3.0-or-later
+#  Software License, (See accompanying file LICENSE or copy at
+#  https://www.gnu.org/licenses/gpl-3.0.txt)
+
+import copy
+import time
+from typing import Callable, List, Optional, Tuple
+from competitive_sudoku import tensor
+from competitive_sudoku.candidates import CandidateStore
+from competitive_sudoku.search import CpuThrottle, IterativeDeepening, SearchTimeout
+from competitive_sudoku.sudoku import GameState, Move, SudokuBoard
+from competitive_sudoku.sudokuai import SudokuAI
+from competitive_sudoku.zobrist import ZobristKeys
+
+points_rule = {0: 0, 1: 1, 2: 3, 3: 7}  # the relation between the regions completed and the points gotten
+
+EXACT, LOWER, UPPER = 0, 1, 2  # the kinds of values stored in the transposition table
+
+
+def calculate_heuristic_score(empties_left: int) -> float:
+    """
+    A heuristic score based on the empty cells that are left in a region after taking a move.
+    @param empties_left: The number of empty cells left in the region after taking a move.
+    @return: The heuristic score.
+    """
+    # even number of empties left is good, 0 is the best because you get points immediately
+    if empties_left % 2 == 0:
+        return 1 / (empties_left + 1)
+    # odd number of empties left is bad, 1 is the worst because opponent would fill that empty and get points
+    return -1 / empties_left
+
+
+class SearchEngine(object):
+    """
+    A sudoku position that is shared by the search based agents. It maintains the positions of the empty cells and the
+    missing numbers of every region incrementally, such that moves can be generated, made, scored and cancelled without
+    scanning the board. It also contains the minimax search with alpha-beta pruning and quiescence search.
+
+    The engine works on its own copy of the board. The evaluation of a move can be changed by overriding evaluate.
+
+    Every move is computed in a new process, so the engine is created for every move. The transposition table, the
+    history table and the principal variation are carried over to the next turn with export_state and import_state. Their contents only consist of built-in types, so they can be saved with marshal.
+
+    With propagation enabled, the moves are generated from a CandidateStore, which removes the values that the
+    deductions of a human solver rule out. Those moves would be declared taboo, so the branching factor drops.
+
+    If numpy is installed, root_moves scores the moves of a position with many empty cells in one vectorized pass, see
+    CandidateTensor.
+    """
+
+    def __init__(self, game_state: GameState, using_heuristics: bool = True, points_weight: float = 2, propagation: bool = False, owner: str = ''):
+        """
+        @param game_state: A Game state.
+        @param using_heuristics: If True, the parity heuristic is added to the score of a move.
+        @param points_weight: The weight of the points of a move in its score.
+        @param propagation: If True, the candidate values are reduced by constraint propagation.
+        @param owner: The name of the agent that uses the engine. Search state of another agent is not reused.
+        """
+        self.owner = owner
+        self.using_heuristics = using_heuristics
+        self.points_weight = points_weight
+        self.propagation = propagation
+        self.max_quiescence_depth = 4  # the maximal number of plies the quiescence search extends a leaf
+        self.max_quiescence_nodes = 32  # the maximal number of quiescence nodes searched below a single leaf
+        self.node_counts = {'search': 0, 'quiescence': 0}  # nodes visited by minimax and by the quiescence search
+        self.cutoffs = 0  # the number of beta cutoffs in minimax
+        self.tt_probes = 0  # the number of lookups in the transposition table
+        self.tt_hits = 0  # the number of lookups that found an entry
+        self.controller = IterativeDeepening(None)
+        self.max_table_size = 200000  # the maximal number of entries of the transposition table
+        self.history_decay = 4  # the history of the previous turn is divided by this number when it is imported
+        self.max_cache_size = 65536  # the maximal number of entries of the cache of values_of
+        # the minimal number of empty cells for which root_moves uses a CandidateTensor, below it the setup of the
+        # tensor costs more than the moves it scores
+        self.tensor_min_empties = 32
+        # bitset -> the numbers in the bitset
+        self.values_cache = {}
+        # (hash, maximizer) -> (depth, value, flag, best move, number of empties)
+        self.transposition_table = {}
+        # (i, j, value) -> how often and how deep the move caused a cutoff
+        self.history = {}
+        # the expected continuation of the game, starting with the move of the last search
+        self.principal_variation: List[Tuple[int, int, int]] = []
+        self.find_empties_and_missings(game_state)
+
+    def find_empties_and_missings(self, game_state: GameState) -> None:
+        """
+        Calculates the positions of the empties and the missing numbers for each region from scratch.
+        @param game_state: A Game state.
+        """
+        board = copy.deepcopy(game_state.board)
+        m, n, N = board.m, board.n, board.N
+        self.board = board
+        self.m, self.n, self.N = m, n, N
+        self.taboo_moves = set((move.i, move.j, move.value) for move in game_state.taboo_moves)
+        self.move_stack: List[Move] = []  # the moves that have been made and not yet cancelled
+        self.zobrist_keys = ZobristKeys.for_size(N).keys
+        self.hash = ZobristKeys.for_size(N).hash(board)  # the Zobrist hash of the board, maintained incrementally
+
+        # a set consisting of all position (i, j) of empty cells, only the empty cells are tracked
+        self.positions_of_empty_cells = set()
+        # numbers_missing_for_xxx has a length of N, each element is a bitset (a Python int) representing which numbers
+        # are missing in that region, bit v is set if the number v is missing
+        full = ((1 << (N + 1)) - 1) & ~1
+        self.numbers_missing_for_rows = [full] * N
+        self.numbers_missing_for_cols = [full] * N
+        # the block number is defined from left to right, from top to bottom
+        # i.e. 0,1,...,m-1; m,m+1,...,2*m-1; 2*m, 2*m+1,...
+        self.numbers_missing_for_blks = [full] * N
+        # the number of empty cells of each region, which equals the number of missing numbers
+        self.empties_in_rows = [0] * N
+        self.empties_in_cols = [0] * N
+        self.empties_in_blks = [0] * N
+        for i in range(N):
+            for j in range(N):
+                value = board.get(i, j)
+                b = self.block_number(i, j)
+                if value == SudokuBoard.empty:
+                    self.positions_of_empty_cells.add((i, j))
+                    self.empties_in_rows[i] += 1
+                    self.empties_in_cols[j] += 1
+                    self.empties_in_blks[b] += 1
+                else:
+                    self.numbers_missing_for_rows[i] &= ~(1 << value)
+                    self.numbers_missing_for_cols[j] &= ~(1 << value)
+                    self.numbers_missing_for_blks[b] &= ~(1 << value)
+        # the candidate values of every square after propagation, or None
+        self.candidate_store = CandidateStore(board, self.taboo_moves) if self.propagation else None
+
+    def block_number(self, i: int, j: int) -> int:
+        """
+        @return: The number of the block that contains the cell (i, j).
+        """
+        return (i // self.m) * self.m + j // self.n
+
+    def empties_each_region(self, i: int, j: int) -> List[int]:
+        """
+        @return: The number of empty cells in the row, the column and the block of the cell (i, j).
+        """
+        return [self.empties_in_rows[i], self.empties_in_cols[j], self.empties_in_blks[self.block_number(i, j)]]
+
+    def values_of(self, bitset: int) -> Tuple[int, ...]:
+        """
+        @return: The numbers in a bitset of numbers, in increasing order.
+        """
+        values = self.values_cache.get(bitset)
+        if values is None:
+            values = tuple(value for value in range(1, self.N + 1) if bitset >> value & 1)
+            if len(self.values_cache) >= self.max_cache_size:
+                self.values_cache.clear()
+            self.values_cache[bitset] = values
+        return values
+
+    def candidate_bitsets(self) -> Optional[List[int]]:
+        """
+        @return: For every square the bitset of its candidate values after propagation, or None if propagation is
+        disabled or the current position has no solution. In the latter case the deductions are meaningless.
+        """
+        store = self.candidate_store
+        if store is None or store.contradiction:
+            return None
+        return store.candidates
+
+    def forced_cells(self) -> List[Move]:
+        """
+        @return: The moves on the empty cells with a single candidate value. Without propagation these are the cells
+        with a single value that does not conflict with a filled cell.
+        """
+        if self.candidate_store is not None:
+            return [Move(i, j, value) for i, j, value in self.candidate_store.forced_cells()]
+        m, n = self.m, self.n
+        rows, cols, blks = self.numbers_missing_for_rows, self.numbers_missing_for_cols, self.numbers_missing_for_blks
+        forced = []
+        for (x, y) in self.positions_of_empty_cells:
+            values = self.values_of(rows[x] & cols[y] & blks[(x // m) * m + y // n])
+            if len(values) == 1:
+                forced.append(Move(x, y, values[0]))
+        return forced
+
+    def make_move(self, move: Move) -> int:
+        """
+        Takes the move and updates the positions of the empties and the missing numbers for each region.
+        @param move: A legal move.
+        @return: The points gotten for this move.
+        """
+        i, j, value = move.i, move.j, move.value
+        b = (i // self.m) * self.m + j // self.n
+        self.board.squares[i * self.N + j] = value
+        self.positions_of_empty_cells.remove((i, j))
+        bit = ~(1 << value)
+        self.numbers_missing_for_rows[i] &= bit
+        self.numbers_missing_for_cols[j] &= bit
+        self.numbers_missing_for_blks[b] &= bit
+        self.empties_in_rows[i] -= 1
+        self.empties_in_cols[j] -= 1
+        self.empties_in_blks[b] -= 1
+        self.hash ^= self.zobrist_keys[i * self.N + j][value]
+        if self.candidate_store is not None:
+            self.candidate_store.make(i * self.N + j, value)
+        self.move_stack.append(move)
+        # calculate how many regions are completed by this move and the points gotten for this move
+        return points_rule[(not self.empties_in_rows[i]) + (not self.empties_in_cols[j]) + (not self.empties_in_blks[b])]
+
+    def cancel_move(self, move: Move) -> None:
+        """
+        Cancels the move of (i, j) and updates the positions of the empties and the missing numbers for each region.
+        @param move: The last move that was made.
+        """
+        i, j, value = move.i, move.j, move.value
+        b = (i // self.m) * self.m + j // self.n
+        # cancel the move, i.e. take the move of empty value (0)
+        self.board.squares[i * self.N + j] = SudokuBoard.empty
+        self.positions_of_empty_cells.add((i, j))
+        bit = 1 << value
+        self.numbers_missing_for_rows[i] |= bit
+        self.numbers_missing_for_cols[j] |= bit
+        self.numbers_missing_for_blks[b] |= bit
+        self.empties_in_rows[i] += 1
+        self.empties_in_cols[j] += 1
+        self.empties_in_blks[b] += 1
+        self.hash ^= self.zobrist_keys[i * self.N + j][value]
+        if self.candidate_store is not None:
+            self.candidate_store.unmake(i * self.N + j)
+        self.move_stack.pop()
+
+    def unwind(self) -> None:
+        """
+        Cancels all moves that have not been cancelled, e.g. after a search was interrupted by a SearchTimeout.
+        """
+        while self.move_stack:
+            self.cancel_move(self.move_stack[-1])
+
+    def evaluate(self, move: Move, points: int) -> float:
+        """
+        The evaluation hook: the score of a move that has just been made, from the perspective of the player that made
+        it.
+        @param move: The move that has just been made.
+        @param points: The points gotten for the move.
+        @return: The score of the move.
+        """
+        if not self.using_heuristics:
+            return self.points_weight * points
+        empties = self.empties_each_region(move.i, move.j)
+        h_score = (calculate_heuristic_score(empties[0]) +
+                   calculate_heuristic_score(empties[1]) +
+                   calculate_heuristic_score(empties[2])) / 3
+        return h_score + self.points_weight * points
+
+    def move_and_calculate_score(self, move: Move, maximizing: bool) -> float:
+        """
+        Takes the move and gives a score for it.
+        @param move: The move to be taken and scored.
+        @param maximizing: For maximizer or minimizer.
+        @return: The score of the move, negated for the minimizer.
+        """
+        score = self.evaluate(move, self.make_move(move))
+        return score if maximizing else -score
+
+    def get_all_legal_moves(self, using_heuristic_move: bool = False) -> List[Move]:
+        """
+        Generates all moves that do not conflict with a filled cell and that have not been declared taboo.
+        @param using_heuristic_move: If True, only the single possibility moves are returned if there are any.
+        @return: A list of possible moves.
+        """
+        m, n = self.m, self.n
+        rows, cols, blks = self.numbers_missing_for_rows, self.numbers_missing_for_cols, self.numbers_missing_for_blks
+        taboo_moves = self.taboo_moves
+        values_of = self.values_of
+        candidates, N = self.candidate_bitsets(), self.N
+        legal_moves = []
+        single_possibility_moves = []
+        for (x, y) in self.positions_of_empty_cells:
+            # legal values should be at least the intersection of the missing number of corresponding three regions
+            if candidates is None:
+                possible_values = values_of(rows[x] & cols[y] & blks[(x // m) * m + y // n])
+            else:
+                possible_values = values_of(candidates[x * N + y])
+            # should has not been declared taboo
+            if taboo_moves:
+                possible_moves = [Move(x, y, val) for val in possible_values if (x, y, val) not in taboo_moves]
+            else:
+                possible_moves = [Move(x, y, val) for val in possible_values]
+            legal_moves.extend(possible_moves)
+            # only one possible move means "single possibility move" is found
+            if len(possible_moves) == 1:
+                single_possibility_moves.append(possible_moves[0])
+
+        # single_possibility_moves as heuristic possible moves is prior to normal moves
+        if using_heuristic_move and single_possibility_moves:
+            return single_possibility_moves
+        return legal_moves
+
+    def root_moves(self) -> List[Move]:
+        """
+        Generates the legal moves sorted by their score (see evaluate), the best first. If numpy is installed, the
+        moves of a position with many empty cells are scored by a CandidateTensor, unless the candidates are reduced
+        by propagation or evaluate is overridden.
+        @return: A list of possible moves.
+        """
+        if (tensor.available() and self.candidate_store is None and type(self).evaluate is SearchEngine.evaluate and
+                len(self.positions_of_empty_cells) >= self.tensor_min_empties):
+            candidate_tensor = tensor.CandidateTensor(self.board, self.taboo_moves)
+            return candidate_tensor.ordered_moves(self.points_weight, self.using_heuristics)
+        scored_moves = []
+        for move in self.get_all_legal_moves():
+            scored_moves.append((self.move_and_calculate_score(move, True), move))
+            self.cancel_move(move)
+        scored_moves.sort(key=lambda scored_move: scored_move[0], reverse=True)
+        return [move for _, move in scored_moves]
+
+    def get_noisy_cells(self) -> set:
+        """
+        Finds the empty cells of the regions with at most 2 empty cells. Only a move on such a cell can complete a
+        region or leave a region with exactly one empty cell.
+        @return: A set of the positions (i, j) of the noisy cells.
+        """
+        m, n, N = self.m, self.n, self.N
+        rows, cols, blks = self.empties_in_rows, self.empties_in_cols, self.empties_in_blks
+        squares = self.board.squares
+        noisy_cells = set()
+        for i in range(N):
+            if 0 < rows[i] <= 2:
+                noisy_cells.update((i, j) for j in range(N) if squares[i * N + j] == SudokuBoard.empty)
+            if 0 < cols[i] <= 2:
+                noisy_cells.update((k, i) for k in range(N) if squares[k * N + i] == SudokuBoard.empty)
+            if 0 < blks[i] <= 2:
+                r, c = (i // m) * m, (i % m) * n
+                noisy_cells.update((k, l) for k in range(r, r + m) for l in range(c, c + n) if squares[k * N + l] == SudokuBoard.empty)
+        return noisy_cells
+
+    def get_noisy_moves(self, noisy_cells: set) -> List[Move]:
+        """
+        Generates the noisy moves, i.e. the moves that complete a region or leave a region with exactly one empty cell.
+        The moves that complete a region come first.
+        @param noisy_cells: The output of get_noisy_cells.
+        @return: A list of noisy moves.
+        """
+        m, n = self.m, self.n
+        rows, cols, blks = self.numbers_missing_for_rows, self.numbers_missing_for_cols, self.numbers_missing_for_blks
+        taboo_moves = self.taboo_moves
+        candidates, N = self.candidate_bitsets(), self.N
+        completing_moves = []
+        other_moves = []
+        for (x, y) in noisy_cells:
+            b = (x // m) * m + y // n
+            # a region with k empties before the move has k - 1 empties after it
+            empties = min(self.empties_in_rows[x], self.empties_in_cols[y], self.empties_in_blks[b])
+            moves = completing_moves if empties == 1 else other_moves
+            bitset = rows[x] & cols[y] & blks[b] if candidates is None else candidates[x * N + y]
+            moves.extend(Move(x, y, val) for val in self.values_of(bitset) if (x, y, val) not in taboo_moves)
+        return completing_moves + other_moves
+
+    def quiescence(self, q_depth: int, node_limit: int, alpha, beta, maximizer: bool) -> float:
+        """
+        Quiescence search that only follows noisy moves until the position is quiet.
+        @param q_depth: The remaining plies of the quiescence search.
+        @param node_limit: The quiescence node count at which the extension stops.
+        @param alpha: Best already explored option along path to the root for maximizer.
+        @param beta: Best already explored option along path to the root for minimizer.
+        @param maximizer: If it is maximizer.
+        @return: The aggregated score of the noisy moves that follow.
+        """
+        self.node_counts['quiescence'] += 1
+        self.controller.tick()
+        if q_depth == 0 or self.node_counts['quiescence'] >= node_limit:
+            return 0
+
+        noisy_cells = self.get_noisy_cells()
+        if not noisy_cells:
+            return 0
+        # stand pat: as long as a quiet move exists, the side to move is not forced to play a noisy move
+        # an empty cell outside the noisy regions is assumed to have a legal value, otherwise the sudoku would have no
+        # solution anymore
+        stand_pat = 0 if len(self.positions_of_empty_cells) > len(noisy_cells) else None
+        if stand_pat is not None and (stand_pat >= beta if maximizer else stand_pat <= alpha):
+            return stand_pat
+        noisy_moves = self.get_noisy_moves(noisy_cells)
+        if not noisy_moves:
+            return 0
+        if maximizer:
+            # without a stand pat a noisy move must be played, so the first move is searched even if the window is
+            # closed, an infinite value would otherwise be returned
+            max_eval = -float('inf') if stand_pat is None else stand_pat
+            alpha = max(alpha, max_eval)
+            for move in noisy_moves:
+                cur_move_score = self.move_and_calculate_score(move, True)
+                eval = cur_move_score + self.quiescence(q_depth - 1, node_limit, alpha - cur_move_score, beta - cur_move_score, False)
+                max_eval = max(max_eval, eval)
+                self.cancel_move(move)
+                alpha = max(alpha, max_eval)
+                if beta <= alpha:
+                    break
+            return max_eval
+
+        else:
+            min_eval = float('inf') if stand_pat is None else stand_pat
+            beta = min(beta, min_eval)
+            for move in noisy_moves:
+                cur_move_score = self.move_and_calculate_score(move, False)
+                eval = cur_move_score + self.quiescence(q_depth - 1, node_limit, alpha - cur_move_score, beta - cur_move_score, True)
+                min_eval = min(min_eval, eval)
+                self.cancel_move(move)
+                beta = min(beta, min_eval)
+                if beta <= alpha:
+                    break
+            return min_eval
+
+    def order_moves(self, moves: List[Move], tt_move: Optional[Tuple[int, int, int]]) -> None:
+        """
+        Sorts the moves in place: the best move of the transposition table first, then by the history table.
+        @param moves: A list of moves.
+        @param tt_move: The best move stored in the transposition table, or None.
+        """
+        history = self.history
+        if history:
+            moves.sort(key=lambda move: history.get((move.i, move.j, move.value), 0), reverse=True)
+        if tt_move is not None:
+            for index, move in enumerate(moves):
+                if (move.i, move.j, move.value) == tt_move:
+                    moves.insert(0, moves.pop(index))
+                    break
+
+    @staticmethod
+    def bound_flag(value: float, alpha, beta) -> int:
+        """
+        @return: The kind of value that a search with window (alpha, beta) returned.
+        """
+        if value <= alpha:
+            return UPPER
+        if value >= beta:
+            return LOWER
+        return EXACT
+
+    def store(self, maximizer: bool, depth: int, value: float, flag: int, best_move: Optional[Move]) -> None:
+        """
+        Stores the result of a search of the current position in the transposition table. When the table is full,
+        only existing entries are replaced.
+        """
+        key = (self.hash, maximizer)
+        table = self.transposition_table
+        if len(table) >= self.max_table_size and key not in table:
+            return
+        move = None if best_move is None else (best_move.i, best_move.j, best_move.value)
+        table[key] = (depth, value, flag, move, len(self.positions_of_empty_cells))
+
+    def minimax(self, depth: int, alpha, beta, maximizer: bool) -> float:
+        """
+        Minimax search with alpha-beta pruning, a transposition table and history move ordering.
+        @param depth: The depth of the minimax tree.
+        @param alpha: Best already explored option along path to the root for maximizer.
+        @param beta: Best already explored option along path to the root for minimizer.
+        @param maximizer: If it is maximizer.
+        @return: The aggregated score if choose this move considering possible future moves.
+        """
+        alpha_original, beta_original = alpha, beta
+        tt_move = None
+        self.tt_probes += 1
+        entry = self.transposition_table.get((self.hash, maximizer))
+        if entry is not None:
+            self.tt_hits += 1
+            entry_depth, value, flag, tt_move, _ = entry
+            if entry_depth >= depth:
+                if flag == EXACT:
+                    return value
+                if flag == LOWER:
+                    alpha = max(alpha, value)
+                elif flag == UPPER:
+                    beta = min(beta, value)
+                if beta <= alpha:
+                    return value
+
+        if depth == 0:
+            # extend the horizon with the noisy moves instead of cutting off at a forced region completion
+            node_limit = self.node_counts['quiescence'] + self.max_quiescence_nodes
+            value = self.quiescence(self.max_quiescence_depth, node_limit, alpha, beta, maximizer)
+            # leaves are stored as well, since the same position is reached by many move orders
+            self.store(maximizer, 0, value, self.bound_flag(value, alpha_original, beta_original), None)
+            return value
+
+        self.node_counts['search'] += 1
+        self.controller.tick()
+        moves = self.get_all_legal_moves()
+        if not moves:
+            return 0
+        self.order_moves(moves, tt_move)
+        best_move = None
+        if maximizer:
+            best_eval = -float('inf')
+            for move in moves:
+                # take this move and calculate the score for this move
+                cur_move_score = self.move_and_calculate_score(move, True)
+                # consider the score that future moves will get, the window is shifted by the score of this move
+                eval = cur_move_score + self.minimax(depth - 1, alpha - cur_move_score, beta - cur_move_score, False)
+                # cancel this move on the board before try other moves
+                self.cancel_move(move)
+                # update the max score among moves
+                if eval > best_eval:
+                    best_eval = eval
+                    best_move = move
+                alpha = max(alpha, best_eval)
+                if beta <= alpha:
+                    break
+
+        else:
+            best_eval = float('inf')
+            for move in moves:
+                cur_move_score = self.move_and_calculate_score(move, False)
+                eval = cur_move_score + self.minimax(depth - 1, alpha - cur_move_score, beta - cur_move_score, True)
+                self.cancel_move(move)
+                if eval < best_eval:
+                    best_eval = eval
+                    best_move = move
+                beta = min(beta, best_eval)
+                if beta <= alpha:
+                    break
+
+        if beta <= alpha:
+            self.cutoffs += 1
+            key = (best_move.i, best_move.j, best_move.value)
+            self.history[key] = self.history.get(key, 0) + depth * depth
+        self.store(maximizer, depth, best_eval, self.bound_flag(best_eval, alpha_original, beta_original), best_move)
+        return best_eval
+
+    def check_interval(self) -> int:
+        """
+        @return: The number of nodes after which the search controller should read the clock. On large boards a single
+        node generates thousands of moves, so the clock is read in every node.
+        """
+        return 16 if len(self.positions_of_empty_cells) <= 81 else 1
+
+    def reset_statistics(self) -> None:
+        """
+        Resets the node counts and the other counters, which is done at the start of every move.
+        """
+        self.node_counts = {'search': 0, 'quiescence': 0}
+        self.cutoffs = 0
+        self.tt_probes = 0
+        self.tt_hits = 0
+
+    def statistics(self, depth: Optional[int] = None) -> dict:
+        """
+        @param depth: The depth of the last completed iteration. By default the depth recorded by the controller is
+        used, which is only updated when the next iteration starts.
+        @return: The work done since the last call to reset_statistics, in the form that SudokuAI.report_stats expects.
+        """
+        return {
+            'nodes': self.node_counts['search'] + self.node_counts['quiescence'],
+            'quiescence_nodes': self.node_counts['quiescence'],
+            'depth': self.controller.completed_depth if depth is None else depth,
+            'cutoffs': self.cutoffs,
+            'tt_probes': self.tt_probes,
+            'tt_hits': self.tt_hits,
+            'time': self.controller.elapsed(),
+        }
+
+    def searched_depth(self, maximizer: bool = True) -> int:
+        """
+        @return: The depth with which the current position is stored in the transposition table, or 0.
+        """
+        entry = self.transposition_table.get((self.hash, maximizer))
+        return 0 if entry is None else entry[0]
+
+    def best_stored_move(self, maximizer: bool = True) -> Optional[Move]:
+        """
+        @return: The best move of the current position according to the transposition table, or None.
+        """
+        entry = self.transposition_table.get((self.hash, maximizer))
+        if entry is None or entry[3] is None:
+            return None
+        i, j, value = entry[3]
+        if (i, j) not in self.positions_of_empty_cells:
+            return None
+        return Move(i, j, value)
+
+    def update_principal_variation(self, best_move: Move, max_length: int = 16) -> None:
+        """
+        Computes the principal variation by following the best moves of the transposition table.
+        @param best_move: The best move in the current position, i.e. the root of the last search.
+        @param max_length: The maximal length of the principal variation.
+        """
+        pv = []
+        move = best_move
+        maximizer = True
+        while move is not None and len(pv) < max_length:
+            pv.append((move.i, move.j, move.value))
+            self.make_move(move)
+            maximizer = not maximizer
+            move = self.best_stored_move(maximizer)
+        for _ in pv:
+            self.cancel_move(self.move_stack[-1])
+        self.principal_variation = pv
+
+    def predicted_replies(self, count: int) -> List[Move]:
+        """
+        Predicts the moves of the side to move, i.e. the opponent when pondering. The best move stored for the minimizer,
+        which the search of the last move found, comes first, the other moves are ranked by their score.
+        @param count: The maximal number of moves.
+        @return: The moves that are most likely played.
+        """
+        # the score from the point of view of the side to move
+        replies = self.root_moves()
+        stored_move = self.best_stored_move(False)
+        if stored_move is not None and stored_move in replies:
+            replies.remove(stored_move)
+            replies.insert(0, stored_move)
+        return replies[:count]
+
+    def ponder(self, replies: List[Move], depth: int) -> None:
+        """
+        Searches the positions after the replies with the given depth. The results are stored in the transposition
+        table, where the search of the next move finds them: the position after the actual reply is then already
+        searched to this depth, and its best move is known.
+        @param replies: Moves of the side to move.
+        @param depth: The depth of the searches.
+        """
+        for reply in replies:
+            self.make_move(reply)
+            self.minimax(depth, -float('inf'), float('inf'), True)
+            self.cancel_move(reply)
+
+    def fingerprint(self, game_state: GameState) -> Tuple:
+        """
+        @return: A value that identifies the start position, the agent and the evaluation. Search state of another
+        agent or another evaluation is not reused.
+        """
+        return (ZobristKeys.for_size(self.N).hash(game_state.initial_board), self.N, self.owner, self.using_heuristics,
+                self.points_weight, self.propagation)
+
+    def export_state(self, game_state: GameState) -> dict:
+        """
+        @return: The search state that is carried over to the next turn.
+        """
+        return {
+            'fingerprint': self.fingerprint(game_state),
+            'moves': [(move.i, move.j, move.value) for move in game_state.moves],
+            'taboo_moves': sorted(self.taboo_moves),
+            'transposition_table': self.transposition_table,
+            'history': self.history,
+            'principal_variation': self.principal_variation,
+        }
+
+    def import_state(self, state: Optional[dict], game_state: GameState) -> None:
+        """
+        Seeds the search with the state of a previous turn of the same game. The game is identified by its moves: the
+        moves of the previous turn must be the start of the moves of the current game, otherwise the state belongs to
+        an earlier game, e.g. on the same board. Entries of positions with more empty cells than the current position
+        can not be reached anymore and are dropped.
+        @param state: The output of export_state, or None.
+        @param game_state: The current Game state.
+        """
+        if not state or tuple(state['fingerprint']) != self.fingerprint(game_state):
+            return
+        saved_moves = [tuple(move) for move in state['moves']]
+        played = [(move.i, move.j, move.value) for move in game_state.moves]
+        if played[:len(saved_moves)] != saved_moves:
+            return
+        # the cutoffs of earlier turns are aged, otherwise they outweigh the cutoffs of the current search
+        self.history = {key: value // self.history_decay for key, value in state['history'].items() if value >= self.history_decay}
+        empties = len(self.positions_of_empty_cells)
+        # the legal moves depend on the taboo moves, so stored values are only reused if the taboo moves are the same
+        if set(tuple(move) for move in state['taboo_moves']) == self.taboo_moves:
+            self.transposition_table = {key: entry for key, entry in state['transposition_table'].items() if entry[4] <= empties}
+        pv = [tuple(move) for move in state['principal_variation']]
+        # the principal variation is only useful if the game followed it
+        self.principal_variation = pv[2:] if pv[:2] == played[-2:] else []
+
+    def root_move_hint(self) -> Optional[Move]:
+        """
+        @return: The move that is expected to be best in the current position, according to the principal variation
+        or the transposition table of a previous turn.
+        """
+        if self.principal_variation:
+            i, j, value = self.principal_variation[0]
+            if (i, j) in self.positions_of_empty_cells:
+                return Move(i, j, value)
+        return self.best_stored_move(True)
+
+
+def best_move_first(last_moves: List[list]) -> List[Move]:
+    """
+    Orders the root moves for the next iteration: the best move of the iteration first, the others in the same order.
+    @param last_moves: The [evaluation, move] pairs of all root moves of a completed iteration, in the searched order.
+    """
+    moves = [move for _, move in last_moves]
+    best = max(range(len(last_moves)), key=lambda index: last_moves[index][0])
+    moves.insert(0, moves.pop(best))
+    return moves
+
+
+def search_best_move(ai: SudokuAI, game_state: GameState, create_engine: Callable[[GameState], SearchEngine],
+                     order_moves: Callable[[List[list]], List[Move]] = best_move_first) -> None:
+    """
+    The compute_best_move of the search based agents. A small endgame is solved exactly. Otherwise the root moves are
+    screened for taboo moves and searched with iterative deepening, seeded with the search state of the previous turn,
+    and the search state of this turn is saved for the next one.
+    @param ai: The agent, with the parameters safety_margin, partial_usage, screened_moves and screening_share.
+    @param game_state: A Game state.
+    @param create_engine: Creates the search engine of the agent for a position, it decides the evaluation.
+    @param order_moves: Orders the root moves for the next iteration, see best_move_first. The best move of the
+    iteration must come first.
+    """
+    start_time = time.perf_counter()
+    # a small endgame is solved exactly, there is no need to search it
+    if ai.propose_proved_move(game_state):
+        return
+
+    # every move is computed in a new process, the search state of earlier turns is carried over by save and load
+    engine = create_engine(game_state)
+    engine.reset_statistics()
+    # seed the search with the transposition table, history table and principal variation of the previous turn
+    saved_state = ai.load(fast=True)
+    engine.import_state(saved_state, game_state)
+    ai.taboo_predictor.import_state(saved_state and saved_state.get('taboo_predictor'))
+
+    # the candidate moves the agent needs to choose from, sorted by their score
+    candidate_moves = engine.root_moves()
+
+    # the move predicted by the previous turn is searched first
+    hint = engine.root_move_hint()
+    if hint is not None and hint in candidate_moves:
+        candidate_moves.remove(hint)
+        candidate_moves.insert(0, hint)
+
+    # a move that leaves the sudoku without a solution wastes the turn, the first candidates are checked for that
+    time_budget = ai.allocate_time(game_state, len(candidate_moves))
+    if time_budget:
+        candidate_moves = ai.remove_taboo_moves(engine.board, candidate_moves, ai.screened_moves,
+                                                ai.screening_share * time_budget, engine.hash)
+
+    # take the first as the best move before searching to avoid lose immediately when time_limit == 0.1
+    best_move = candidate_moves[0]
+    ai.propose_move(best_move)
+
+    # Iterative deepening depth-first search, stopped by the controller before the time budget is used up
+    controller = engine.controller = IterativeDeepening(time_budget, safety_margin=ai.safety_margin, check_interval=engine.check_interval(),
+                                                       partial_usage=ai.partial_usage, start_time=start_time)
+    # the depths that were already searched in the previous turn are answered by the transposition table
+    first_depth = max(1, engine.searched_depth())
+    for depth in controller.depths(first_depth, len(engine.positions_of_empty_cells)):
+        last_moves = []
+        max_eval = -float('inf')
+        try:
+            for candidate_move in candidate_moves:
+                cur_move_score = engine.move_and_calculate_score(candidate_move, True)
+                # only a move that is better than the best move so far is of interest, the other moves get an upper
+                # bound of their evaluation, which is still good enough for ordering them
+                eval = cur_move_score + engine.minimax(depth - 1, max_eval - cur_move_score, float('inf'), False)
+                engine.cancel_move(candidate_move)
+                if eval > max_eval:
+                    max_eval = eval
+                    best_move = candidate_move
+                    # the best move of the previous iteration is searched first, so a better move is safe to play
+                    # even if this iteration is not finished
+                    ai.propose_move(best_move)
+                last_moves.append([eval, candidate_move])
+        except SearchTimeout:
+            engine.unwind()
+            break
+        candidate_moves = order_moves(last_moves)
+        engine.update_principal_variation(best_move)
+        ai.report_stats(**engine.statistics(depth))
+    # the node counts live in this process, the nodes of an interrupted iteration are reported to the runner as well
+    ai.report_stats(**engine.statistics())
+    saved_state = engine.export_state(game_state)
+    saved_state['taboo_predictor'] = ai.taboo_predictor.export_state()
+    ai.save(saved_state, fast=True)
+
+
+def ponder_predicted_replies(ai: SudokuAI, game_state: GameState, create_engine: Callable[[GameState], SearchEngine]) -> None:
+    """
+    The ponder of the search based agents. The positions after the predicted replies of the opponent are searched with
+    iterative deepening, and the transposition table is saved for the next search_best_move. A completed depth is
+    saved if ai.ponder_save_interval seconds have passed since the last save, and the work that is not saved yet is
+    saved when the pondering stops before the opponent has moved, see SudokuAI.ponder_time.
+    @param ai: The agent, with the parameter ponder_replies.
+    @param game_state: A Game state, in which the opponent is to move.
+    @param create_engine: Creates the search engine of the agent for a position.
+    """
+    start_time = time.perf_counter()
+    engine = create_engine(game_state)
+    saved_state = ai.load(fast=True)
+    engine.import_state(saved_state, game_state)
+    replies = engine.predicted_replies(ai.ponder_replies)
+    if not replies:
+        return
+
+    def save() -> None:
+        pondered_state = engine.export_state(game_state)
+        if saved_state:
+            # the principal variation and the taboo predictions of the last move remain valid
+            pondered_state['principal_variation'] = saved_state.get('principal_variation', [])
+            pondered_state['taboo_predictor'] = saved_state.get('taboo_predictor')
+        ai.save(pondered_state, fast=True)
+
+    engine.controller = IterativeDeepening(ai.ponder_time(game_state), check_interval=engine.check_interval(),
+                                           throttle=CpuThrottle(ai.ponder_share), start_time=start_time)
+    last_save = start_time
+    unsaved = False
+    for depth in engine.controller.depths(1, len(engine.positions_of_empty_cells) - 1):
+        unsaved = True
+        try:
+            # the positions after the replies are searched as deep as the next move will search them
+            engine.ponder(replies, depth)
+        except SearchTimeout:
+            # the positions that were completed are stored in the transposition table
+            engine.unwind()
+            break
+        if time.perf_counter() - last_save >= ai.ponder_save_interval:
+            save()
+            last_save = time.perf_counter()
+            unsaved = False
+    if unsaved:
+        save()
@@ -0,0 +1,123 @@
+#  (C) Copyright Wieger Wesselink 2021. Distributed under the GPL-3.0-or-later
+#  Software License, (See accompanying file LICENSE or copy at
+#  https://www.gnu.org/licenses/gpl-3.0.txt)
+
+"""
+The events of a simulated game, and the sinks that consume them. The game runner emits the following events, each of
+them a dictionary with an 'event' field:
+
+    start   board, players, calculation_time, clock
+    turn    player
+    move    player, move, reward, taboo, time, oracle_time, stats, clock
+    end     result, winner, scores, oracle
+
+The winner is 1 or 2, or 0 for a draw, and oracle contains the statistics of the oracle (see Oracle.statistics). In a
+game with a game clock, clock is [total time, increment] in the start event, and the time left on the clocks of both
+players after the move in the move events; otherwise it is None.
+Rendering a board with print_board is expensive compared to a move of a fast agent, so boards are only rendered if a
+sink asks for them. The rendering is passed to those sinks in the 'state' field, the other sinks never see it.
+"""
+
+import json
+from typing import Callable, List, Optional
+
+
+class EventSink(object):
+    """
+    Consumes the events of games. The attributes tell the runner which optional data the sink needs.
+    """
+    wants_boards = False  # receive a rendering of the game state with the start and move events
+    wants_stats = False   # receive the statistics that the agents report
+
+    def emit(self, event: dict) -> None:
+        pass
+
+    def close(self) -> None:
+        pass
+
+
+class NullSink(EventSink):
+    """
+    Discards all events.
+    """
+    pass
+
+
+class JsonlSink(EventSink):
+    """
+    Appends every event as a single line of JSON to a file.
+    """
+    wants_stats = True
+
+    def __init__(self, path: str):
+        """
+        @param path: The location of the log file.
+        """
+        self.handle = open(path, 'a')
+
+    def emit(self, event: dict) -> None:
+        self.handle.write(json.dumps(event) + '\n')
+
+    def close(self) -> None:
+        self.handle.close()
+
+
+class ConsoleSink(EventSink):
+    """
+    Prints the events in a human readable form, with the board after every move.
+    """
+    wants_boards = True
+
+    def emit(self, event: dict) -> None:
+        kind = event['event']
+        if kind == 'start':
+            print('Initial state')
+            print(event['state'])
+        elif kind == 'turn':
+            print(f"-----------------------------\nCalculate a move for player {event['player']}")
+        elif kind == 'move':
+            i, j, value = event['move']
+            print(f'Best move: ({i},{j}) -> {value}')
+            if event['taboo']:
+                print(f'The sudoku has no solution after the move ({i},{j}) -> {value}.')
+            print(f"Reward: {event['reward']}")
+            if event.get('clock'):
+                print(f"Clock: {event['clock'][0]:.2f}s - {event['clock'][1]:.2f}s")
+            print(event['state'])
+        elif kind == 'end':
+            print(event['result'])
+            oracle = event.get('oracle')
+            if oracle and 'hit_rate' in oracle:
+                print(f"Oracle cache: {oracle['hits']} hits, {oracle['misses']} misses, hit rate {oracle['hit_rate']:.1%}")
+
+
+class EventStream(object):
+    """
+    Distributes the events of the game runner over a number of sinks.
+    """
+
+    def __init__(self, sinks: List[EventSink]):
+        self.sinks = sinks
+        self.wants_boards = any(sink.wants_boards for sink in sinks)
+        self.wants_stats = any(sink.wants_stats for sink in sinks)
+
+    def emit(self, kind: str, render: Optional[Callable[[], str]] = None, **fields) -> None:
+        """
+        Sends an event to all sinks.
+        @param kind: The kind of the event.
+        @param render: A function that renders the game state. It is only called if a sink wants boards.
+        @param fields: The fields of the event.
+        """
+        event = dict(event=kind, **fields)
+        rendered_event = None
+        for sink in self.sinks:
+            if sink.wants_boards and render is not None:
+                if rendered_event is None:
+                    rendered_event = dict(event, state=render())
+                sink.emit(rendered_event)
+            else:
+                sink.emit(event)
+
+    def close(self) -> None:
+        for sink in self.sinks:
+            sink.close()
@@ -3,14 +3,20 @@
 #  https://www.gnu.org/licenses/gpl-3.0.txt)
 
 import os
-from pathlib import Path
+import shlex
+import subprocess
 import tempfile
+from typing import List
 
 
-def execute_command(command: str) -> str:
-    import subprocess
+def execute_command(command: List[str]) -> str:
+    """
+    Runs a command without a shell.
+    @param command: The program and its arguments.
+    @return: The output of the command.
+    """
     try:
-        output = subprocess.check_output(command, stderr=subprocess.STDOUT, shell=True)
+        output = subprocess.check_output(command, stderr=subprocess.STDOUT)
     except subprocess.CalledProcessError as proc:
         output = proc.output
     return output.decode("utf-8").strip()
@@ -26,7 +32,10 @@ def solve_sudoku(solve_sudoku_path: str, board_text: str, options: str='') -> st
     """
     if not os.path.exists(solve_sudoku_path):
         raise RuntimeError(f'No oracle found at location "{solve_sudoku_path}"')
-    filename = tempfile.NamedTemporaryFile(prefix='solve_sudoku_').name
-    Path(filename).write_text(board_text)
-    command = f'{solve_sudoku_path} {filename} {options}'
-    return execute_command(command)
+    handle, filename = tempfile.mkstemp(prefix='solve_sudoku_')
+    try:
+        with os.fdopen(handle, 'w') as file:
+            file.write(board_text)
+        return execute_command([solve_sudoku_path, filename] + shlex.split(options))
+    finally:
+        os.remove(filename)
@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+
+#  (C) Copyright Wieger Wesselink 2021. Distributed under the GPL-3.0-or-later
+#  Software License, (See accompanying file LICENSE or copy at
+#  https://www.gnu.org/licenses/gpl-3.0.txt)
+
+"""
+Generator of random starting positions with arbitrary block shapes. A position is made by creating a random solution
+of the empty grid and then emptying squares until the requested fill ratio is reached. Since the remaining squares
+agree with that solution, the position always has a solution. The generator is deterministic given a seed.
+
+Typical usage:
+
+    python -m competitive_sudoku.generator --m 4 --n 5 --fill 0.3 --count 1000 --seed 1 --output boards/generated
+    python -m competitive_sudoku.generator --m 4 --n 5 --fill 0.3 --count 100000 --seed 1 --corpus boards.sdkc
+"""
+
+import argparse
+import random
+from pathlib import Path
+from typing import Iterator, List, Optional
+from competitive_sudoku.records import board_to_bytes, write_corpus
+from competitive_sudoku.sudoku import SudokuBoard, save_sudoku
+
+
+def pattern_solution(m: int, n: int, rng: random.Random) -> List[int]:
+    """
+    Creates a random solution by shuffling a regular pattern: the values, the rows within a band of blocks, the bands,
+    the columns within a stack of blocks and the stacks are permuted randomly. This takes O(N^2) time for any N.
+    @param m: The number of rows in a block.
+    @param n: The number of columns in a block.
+    @param rng: The random generator.
+    @return: The N * N squares of the solution.
+    """
+    N = m * n
+    values = list(range(1, N + 1))
+    rng.shuffle(values)
+    bands = rng.sample(range(n), n)  # there are n bands of m rows
+    stacks = rng.sample(range(m), m)  # there are m stacks of n columns
+    rows = [band * m + i for band in bands for i in rng.sample(range(m), m)]
+    cols = [stack * n + j for stack in stacks for j in rng.sample(range(n), n)]
+    # row r of the pattern contains the values shifted by n * (r % m) + r // m
+    return [values[(n * (r % m) + r // m + c) % N] for r in rows for c in cols]
+
+
+def search_solution(m: int, n: int, rng: random.Random, max_nodes: int) -> Optional[List[int]]:
+    """
+    Creates a random solution with a randomized backtracking search over bitmasks. The square with the fewest candidates
+    is filled first, and the candidates are tried in a random order.
+    @param m: The number of rows in a block.
+    @param n: The number of columns in a block.
+    @param rng: The random generator.
+    @param max_nodes: The search gives up after trying this many values.
+    @return: The N * N squares of the solution, or None if the search gave up.
+    """
+    N = m * n
+    full = ((1 << (N + 1)) - 1) & ~1
+    squares = [SudokuBoard.empty] * (N * N)
+    row_masks = [0] * N
+    col_masks = [0] * N
+    blk_masks = [0] * N
+    regions = [(k // N, k % N, (k // N // m) * m + k % N // n) for k in range(N * N)]
+    empties = list(range(N * N))
+    rng.shuffle(empties)
+    stack = []  # (square, the candidates that have not been tried yet)
+    nodes = 0
+
+    while empties:
+        # pick the square with the fewest candidates
+        best_index, best_candidates, best_size = 0, 0, N + 1
+        for index, k in enumerate(empties):
+            i, j, b = regions[k]
+            candidates = full & ~(row_masks[i] | col_masks[j] | blk_masks[b])
+            size = bin(candidates).count('1')
+            if size < best_size:
+                best_index, best_candidates, best_size = index, candidates, size
+                if size <= 1:
+                    break
+        k = empties[best_index]
+        empties[best_index] = empties[-1]
+        empties.pop()
+        values = [value for value in range(1, N + 1) if best_candidates >> value & 1]
+        rng.shuffle(values)
+        stack.append((k, values))
+
+        # assign the next candidate of the top of the stack, backtracking over squares without candidates
+        while stack:
+            k, values = stack[-1]
+            i, j, b = regions[k]
+            value = squares[k]
+            if value != SudokuBoard.empty:
+                bit = ~(1 << value)
+                row_masks[i] &= bit
+                col_masks[j] &= bit
+                blk_masks[b] &= bit
+                squares[k] = SudokuBoard.empty
+            if values:
+                value = values.pop()
+                bit = 1 << value
+                row_masks[i] |= bit
+                col_masks[j] |= bit
+                blk_masks[b] |= bit
+                squares[k] = value
+                nodes += 1
+                break
+            stack.pop()
+            empties.append(k)
+        if not stack or nodes > max_nodes:
+            return None
+    return squares
+
+
+def random_solution(m: int, n: int, rng: random.Random, max_search_size: int = 16, max_nodes: int = 1000, max_restarts: int = 20) -> List[int]:
+    """
+    Creates a random solution of the empty m x n grid. Up to N = max_search_size a randomized search is used, which
+    samples the solutions more evenly. It is restarted when it gets stuck. For larger grids the search becomes too
+    expensive, and a shuffled pattern is used instead.
+    @param m: The number of rows in a block.
+    @param n: The number of columns in a block.
+    @param rng: The random generator.
+    @param max_search_size: The largest N for which the randomized search is used.
+    @param max_nodes: The number of values a single search may try before it is restarted.
+    @param max_restarts: The number of restarts, after which the shuffled pattern is used.
+    @return: The N * N squares of the solution.
+    """
+    if m * n <= max_search_size:
+        for _ in range(max_restarts):
+            squares = search_solution(m, n, rng, max_nodes)
+            if squares is not None:
+                return squares
+    return pattern_solution(m, n, rng)
+
+
+def generate_board(m: int, n: int, fill_ratio: float, seed) -> SudokuBoard:
+    """
+    Generates a random starting position that has a solution.
+    @param m: The number of rows in a block.
+    @param n: The number of columns in a block.
+    @param fill_ratio: The fraction of the squares that is filled.
+    @param seed: The seed of the random generator, an int or a string.
+    @return: The generated board.
+    """
+    rng = random.Random(seed)
+    board = SudokuBoard(m, n)
+    N = board.N
+    solution = random_solution(m, n, rng)
+    for k in rng.sample(range(N * N), round(fill_ratio * N * N)):
+        board.squares[k] = solution[k]
+    return board
+
+
+def generate_boards(m: int, n: int, fill_ratio: float, count: int, seed: int = 0) -> Iterator[SudokuBoard]:
+    """
+    Generates a number of random starting positions. Board number k only depends on the seed and on k, so a subset of
+    the boards can be regenerated without generating the others.
+    @param m: The number of rows in a block.
+    @param n: The number of columns in a block.
+    @param fill_ratio: The fraction of the squares that is filled.
+    @param count: The number of boards.
+    @param seed: The seed of the generator.
+    """
+    for index in range(count):
+        yield generate_board(m, n, fill_ratio, f'{seed}:{index}')
+
+
+def main():
+    cmdline_parser = argparse.ArgumentParser(description='Generator of random sudoku starting positions.')
+    cmdline_parser.add_argument('--m', type=int, default=3, help='the number of rows in a block (default: 3)')
+    cmdline_parser.add_argument('--n', type=int, default=3, help='the number of columns in a block (default: 3)')
+    cmdline_parser.add_argument('--fill', type=float, default=0.3, help='the fraction of the squares that is filled (default: 0.3)')
+    cmdline_parser.add_argument('--count', type=int, default=1, help='the number of boards (default: 1)')
+    cmdline_parser.add_argument('--seed', type=int, default=0, help='the seed of the generator (default: 0)')
+    cmdline_parser.add_argument('--output', metavar='DIR', help='write the boards to this directory instead of printing them')
+    cmdline_parser.add_argument('--corpus', metavar='FILE', help='write the boards to a binary corpus file instead of printing them')
+    args = cmdline_parser.parse_args()
+
+    if args.corpus:
+        boards = generate_boards(args.m, args.n, args.fill, args.count, args.seed)
+        write_corpus(args.corpus, (board_to_bytes(board) for board in boards))
+        return
+
+    if args.output:
+        Path(args.output).mkdir(parents=True, exist_ok=True)
+    for index, board in enumerate(generate_boards(args.m, args.n, args.fill, args.count, args.seed)):
+        if args.output:
+            save_sudoku(str(Path(args.output) / f'random-{args.m}x{args.n}-{args.fill}-{args.seed}-{index}.txt'), board)
+        else:
+            print(board)
+
+
+if __name__ == '__main__':
+    main()
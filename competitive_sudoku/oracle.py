@@ -0,0 +1,404 @@
+#!/usr/bin/env python3
+
+#  (C) Copyright Wieger Wesselink 2021. Distributed under the GPL-3.0-or-later
+#  Software License, (See accompanying file LICENSE or copy at
+#  https://www.gnu.org/licenses/gpl-3.0.txt)
+
+"""
+Oracles answer the same queries as the solve_sudoku program: a board in the textual format, and the options --move,
+--random, --greedy and --taboo. The answer is the output of solve_sudoku. There are three implementations:
+
+    ExecutableOracle   runs solve_sudoku for every query
+    LocalOracle        a stand-in for solve_sudoku that is implemented in Python and runs in the calling process
+    OracleService      a pool of long-lived worker processes, each running one of the other oracles, that answer
+                       queries over pipes
+
+A CachedOracle can be put in front of any of them, it remembers the answers of queries that do not involve chance.
+
+Besides that, the LocalOracle answers the query --safe-moves, which solve_sudoku does not know: for every empty square
+the values that keep the sudoku solvable, except for the taboo moves. Use Oracle.safe_moves to ask it. An
+ExecutableOracle answers it in the calling process instead of running solve_sudoku, so the query also works through
+a CachedOracle and an OracleService.
+
+The workers of an OracleService read requests from stdin and write answers to stdout. Every message is a frame: the
+length of the payload as a little endian uint32, followed by the payload. A request is a JSON object with the fields
+board and options, an answer is the UTF-8 encoded output. A worker is started with
+
+    python -m competitive_sudoku.oracle --serve local
+    python -m competitive_sudoku.oracle --serve bin/solve_sudoku
+"""
+
+import argparse
+import hashlib
+import json
+import marshal
+import os
+import queue
+import random
+import re
+import shlex
+import struct
+import subprocess
+import sys
+from collections import OrderedDict
+from pathlib import Path
+from typing import BinaryIO, Dict, List, Optional
+from competitive_sudoku.baseline import generate_move
+from competitive_sudoku.execute import solve_sudoku
+from competitive_sudoku.solver import SolutionWitness, solution_support
+from competitive_sudoku.sudoku import SudokuBoard, load_sudoku_from_text
+
+frame_header = struct.Struct('<I')
+
+
+def write_frame(stream: BinaryIO, payload: bytes) -> None:
+    stream.write(frame_header.pack(len(payload)) + payload)
+    stream.flush()
+
+
+def read_frame(stream: BinaryIO) -> Optional[bytes]:
+    """
+    @return: The payload of the next frame, or None if the stream is closed.
+    """
+    header = stream.read(frame_header.size)
+    if len(header) < frame_header.size:
+        return None
+    size, = frame_header.unpack(header)
+    payload = stream.read(size)
+    if len(payload) < size:
+        return None
+    return payload
+
+
+def taboo_option(taboo_moves: list) -> str:
+    """
+    @param taboo_moves: A list of TabooMove objects.
+    @return: The --taboo option of solve_sudoku for the moves, or an empty string if there are none.
+    """
+    taboo_text = ' '.join(f'{move.i} {move.j} {move.value}' for move in taboo_moves)
+    return f' --taboo="{taboo_text}"' if taboo_text else ''
+
+
+def format_safe_moves(board: SudokuBoard, taboo: set) -> str:
+    """
+    @return: The answer to a --safe-moves query: 'Safe moves:' followed by k:values for every empty square k, where
+    values is a comma separated list that is empty if the square has no safe values.
+    """
+    support = solution_support(board, taboo)
+    if support is None:
+        return 'The sudoku has no solution.'
+    N = board.N
+    cells = [f"{k}:{','.join(str(value) for value in range(1, N + 1) if support[k] >> value & 1)}"
+             for k in range(N * N) if board.squares[k] == SudokuBoard.empty]
+    return 'Safe moves: ' + ' '.join(cells)
+
+
+def taboo_moves_of(arguments: List[str]) -> set:
+    """
+    @param arguments: The command line options of solve_sudoku, split with shlex.
+    @return: The moves (i, j, value) of the --taboo option.
+    """
+    taboo = set()
+    for argument in arguments:
+        if argument.startswith('--taboo='):
+            values = [int(value) for value in argument[len('--taboo='):].split()]
+            taboo = {tuple(values[t:t + 3]) for t in range(0, len(values), 3)}
+    return taboo
+
+
+def parse_safe_moves(output: str) -> Optional[Dict[int, List[int]]]:
+    """
+    @return: The safe values of the empty squares in an answer of format_safe_moves, or None if the sudoku has no
+    solution.
+    """
+    if output.startswith('The sudoku has no solution'):
+        return None
+    if not output.startswith('Safe moves:'):
+        raise RuntimeError('Could not parse the safe moves:\n' + output)
+    return {int(k): [int(value) for value in values.split(',') if value] for k, values in re.findall(r'(\d+):([\d,]*)', output)}
+
+
+class Oracle(object):
+    """
+    Answers solve_sudoku queries.
+    """
+
+    def solve(self, board_text: str, options: str = '') -> str:
+        """
+        @param board_text: A string representation of a sudoku board.
+        @param options: The command line options of solve_sudoku.
+        @return: The output of solve_sudoku.
+        """
+        raise NotImplementedError
+
+    def safe_moves(self, board: SudokuBoard, taboo_moves: list = ()) -> Optional[Dict[int, List[int]]]:
+        """
+        Computes all moves that keep the sudoku solvable in a single query.
+        @param board: A sudoku board.
+        @param taboo_moves: A list of TabooMove objects, they are excluded.
+        @return: For every empty square k the values that are safe, or None if the board has no solution.
+        """
+        return parse_safe_moves(self.solve(str(board), '--safe-moves' + taboo_option(taboo_moves)))
+
+    def statistics(self) -> Dict[str, float]:
+        """
+        @return: Statistics about the queries that were answered, e.g. cache hit rates.
+        """
+        return {}
+
+    def close(self) -> None:
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+class ExecutableOracle(Oracle):
+    """
+    Runs the solve_sudoku program for every query.
+    """
+
+    def __init__(self, solve_sudoku_path: str):
+        self.solve_sudoku_path = solve_sudoku_path
+
+    def solve(self, board_text: str, options: str = '') -> str:
+        arguments = shlex.split(options)
+        if '--safe-moves' in arguments:
+            # solve_sudoku does not know this query, so it is answered in the calling process
+            return format_safe_moves(load_sudoku_from_text(board_text), taboo_moves_of(arguments))
+        return solve_sudoku(self.solve_sudoku_path, board_text, options)
+
+
+class LocalOracle(Oracle):
+    """
+    A stand-in for the solve_sudoku program. The random and greedy moves are drawn from the moves that do not conflict
+    with a filled square and that are not taboo; the greedy move is one with the most points, ties are broken randomly.
+    The solvability of a board is checked with a SolutionWitness, so a move only costs a search if it contradicts the
+    solution that was found for an earlier position.
+    """
+
+    def __init__(self, seed=None):
+        self.rng = random.Random(seed)
+        self.witness = SolutionWitness()
+
+    @staticmethod
+    def is_legal(board: SudokuBoard, k: int, value: int) -> bool:
+        """
+        @return: True if value does not occur in the row, the column and the block of square k.
+        """
+        m, n, N = board.m, board.n, board.N
+        i, j = board.f2rc(k)
+        squares = board.squares
+        if any(squares[i * N + c] == value for c in range(N)) or any(squares[r * N + j] == value for r in range(N)):
+            return False
+        i0, j0 = i // m * m, j // n * n
+        return not any(squares[r * N + c] == value for r in range(i0, i0 + m) for c in range(j0, j0 + n))
+
+    @staticmethod
+    def points(board: SudokuBoard, k: int) -> int:
+        """
+        @return: The points of filling square k, assuming that it is the only empty square that is filled.
+        """
+        m, n, N = board.m, board.n, board.N
+        i, j = board.f2rc(k)
+        squares = board.squares
+        empty = SudokuBoard.empty
+        row = sum(squares[i * N + c] == empty for c in range(N)) == 1
+        col = sum(squares[r * N + j] == empty for r in range(N)) == 1
+        i0, j0 = i // m * m, j // n * n
+        blk = sum(squares[r * N + c] == empty for r in range(i0, i0 + m) for c in range(j0, j0 + n)) == 1
+        return {0: 0, 1: 1, 2: 3, 3: 7}[row + col + blk]
+
+    def play(self, board: SudokuBoard, k: int, value: int) -> str:
+        move_text = f"'{k} {value}'"
+        if not 0 <= k < board.N * board.N or not 1 <= value <= board.N or board.squares[k] != SudokuBoard.empty:
+            return f'Invalid move {move_text}'
+        if not self.is_legal(board, k, value):
+            return f'Illegal move {move_text}'
+        if not self.witness.is_solvable_after(board, k, value):
+            return f'The sudoku has no solution after move {move_text}.'
+        return f'The score is {self.points(board, k)}'
+
+    def generate(self, board: SudokuBoard, taboo: set, greedy: bool) -> str:
+        move = generate_move(board, taboo, greedy, self.rng)
+        if move is None:
+            return 'Error: could not find a greedy move.' if greedy else 'Error: could not find a legal move.'
+        k, value = move
+        return f'Generated move ({k},{value})'
+
+    def solve(self, board_text: str, options: str = '') -> str:
+        board = load_sudoku_from_text(board_text)
+        arguments = shlex.split(options)
+        move = None
+        taboo = taboo_moves_of(arguments)
+        generate = None
+        safe_moves = False
+        for index, argument in enumerate(arguments):
+            if argument == '--move':
+                move = arguments[index + 1]
+            elif argument.startswith('--move='):
+                move = argument[len('--move='):]
+            elif argument in ('--random', '--greedy'):
+                generate = argument
+            elif argument == '--safe-moves':
+                safe_moves = True
+        if move is not None:
+            try:
+                k, value = (int(value) for value in move.split())
+            except ValueError:
+                return f"Could not parse a move from '{move}'"
+            return self.play(board, k, value)
+        if generate is not None:
+            return self.generate(board, taboo, generate == '--greedy')
+        if safe_moves:
+            return format_safe_moves(board, taboo)
+        return 'The sudoku has a solution.' if self.witness.is_solvable(board) else 'The sudoku has no solution.'
+
+    def statistics(self) -> Dict[str, float]:
+        return {'witness_hits': self.witness.hits, 'searches': self.witness.searches}
+
+
+class OracleService(Oracle):
+    """
+    Keeps a pool of worker processes that answer queries. The workers are started once, so a query only costs the
+    round trip over the pipes and the work of the oracle. A query waits until a worker is free, so the service can be
+    used from several threads. It must not be used from another process than the one that created it.
+    """
+
+    def __init__(self, backend: str = 'local', workers: int = 1):
+        """
+        @param backend: The oracle of the workers: 'local' for a LocalOracle, or the location of the solve_sudoku
+        executable.
+        @param workers: The number of worker processes.
+        """
+        package_dir = str(Path(__file__).resolve().parent.parent)
+        environment = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [package_dir, os.environ.get('PYTHONPATH')])))
+        self.workers = [subprocess.Popen([sys.executable, '-m', 'competitive_sudoku.oracle', '--serve', backend],
+                                         stdin=subprocess.PIPE, stdout=subprocess.PIPE, env=environment) for _ in range(workers)]
+        self.idle_workers = queue.Queue()
+        for worker in self.workers:
+            self.idle_workers.put(worker)
+
+    def solve(self, board_text: str, options: str = '') -> str:
+        worker = self.idle_workers.get()
+        try:
+            write_frame(worker.stdin, json.dumps({'board': board_text, 'options': options}).encode('utf-8'))
+            answer = read_frame(worker.stdout)
+        finally:
+            self.idle_workers.put(worker)
+        if answer is None:
+            raise RuntimeError('The oracle worker stopped unexpectedly.')
+        return answer.decode('utf-8')
+
+    def close(self) -> None:
+        for worker in self.workers:
+            worker.stdin.close()
+        for worker in self.workers:
+            worker.wait()
+            worker.stdout.close()
+        self.workers = []
+
+
+class CachedOracle(Oracle):
+    """
+    A bounded cache in front of an oracle. The answers are stored by the hash of the board and the options. Queries
+    for a random or a greedy move are not cached, since their answers are random. When the cache is full, the least
+    recently used answer is dropped. Optionally the cache is loaded from a file, and saved to it by close.
+    """
+
+    def __init__(self, oracle: Oracle, max_size: int = 100000, path: Optional[str] = None):
+        """
+        @param oracle: The oracle that answers the queries that are not in the cache.
+        @param max_size: The maximal number of answers in the cache.
+        @param path: If set, the location of the file in which the cache is kept between runs.
+        """
+        self.oracle = oracle
+        self.max_size = max_size
+        self.path = path
+        self.cache = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        if path and os.path.isfile(path):
+            with open(path, 'rb') as handle:
+                self.cache.update(marshal.load(handle)[-max_size:])
+
+    @staticmethod
+    def key(board_text: str, options: str) -> bytes:
+        return hashlib.blake2b(f'{board_text}\0{options}'.encode('utf-8'), digest_size=16).digest()
+
+    def solve(self, board_text: str, options: str = '') -> str:
+        if '--random' in options or '--greedy' in options:
+            return self.oracle.solve(board_text, options)
+        key = self.key(board_text, options)
+        answer = self.cache.get(key)
+        if answer is not None:
+            self.hits += 1
+            self.cache.move_to_end(key)
+            return answer
+        self.misses += 1
+        answer = self.oracle.solve(board_text, options)
+        self.cache[key] = answer
+        if len(self.cache) > self.max_size:
+            self.cache.popitem(last=False)
+        return answer
+
+    def statistics(self) -> Dict[str, float]:
+        """
+        @return: The number of hits and misses, the hit rate and the size of the cache, and the statistics of the oracle
+        behind the cache.
+        """
+        queries = self.hits + self.misses
+        return {**self.oracle.statistics(), 'hits': self.hits, 'misses': self.misses, 'hit_rate': self.hits / queries if queries else 0.0, 'size': len(self.cache)}
+
+    def close(self) -> None:
+        if self.path:
+            # the items are saved from least to most recently used, such that loading preserves the order
+            with open(self.path, 'wb') as handle:
+                marshal.dump(list(self.cache.items()), handle)
+        self.oracle.close()
+
+
+def create_oracle(kind: str, solve_sudoku_path: str, workers: int = 1) -> Oracle:
+    """
+    Creates the oracle of a game runner.
+    @param kind: 'executable', 'local', 'service' (workers that run solve_sudoku) or 'local-service' (workers that
+    run a LocalOracle).
+    @param solve_sudoku_path: The location of the solve_sudoku executable.
+    @param workers: The number of workers of a service.
+    """
+    if kind == 'executable':
+        return ExecutableOracle(solve_sudoku_path)
+    if kind == 'local':
+        return LocalOracle()
+    if kind == 'service':
+        return OracleService(solve_sudoku_path, workers)
+    if kind == 'local-service':
+        return OracleService('local', workers)
+    raise RuntimeError(f'Unknown oracle "{kind}".')
+
+
+def serve(oracle: Oracle, input: BinaryIO, output: BinaryIO) -> None:
+    """
+    Answers the requests that are read from input, until input is closed.
+    """
+    while True:
+        request = read_frame(input)
+        if request is None:
+            break
+        request = json.loads(request)
+        write_frame(output, oracle.solve(request['board'], request['options']).encode('utf-8'))
+
+
+def main():
+    cmdline_parser = argparse.ArgumentParser(description='Worker process of an oracle service.')
+    cmdline_parser.add_argument('--serve', metavar='BACKEND', required=True, help="'local', or the location of the solve_sudoku executable")
+    args = cmdline_parser.parse_args()
+    with LocalOracle() if args.serve == 'local' else ExecutableOracle(args.serve) as oracle:
+        serve(oracle, sys.stdin.buffer, sys.stdout.buffer)
+
+
+if __name__ == '__main__':
+    main()
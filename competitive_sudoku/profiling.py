@@ -0,0 +1,99 @@
+#  (C) Copyright Wieger Wesselink 2021. Distributed under the GPL-3.0-or-later
+#  Software License, (See accompanying file LICENSE or copy at
+#  https://www.gnu.org/licenses/gpl-3.0.txt)
+
+import cProfile
+import os
+import pstats
+import signal
+from pathlib import Path
+from typing import Callable, List, Optional
+
+
+def run_profiled(target: Callable, args: tuple, profile_path: str) -> None:
+    """
+    Calls target(*args) under cProfile, and writes the profile to profile_path. This function is meant to be the target
+    of the process that computes a move. The process is stopped with terminate(), which sends SIGTERM. That signal is
+    used as a cooperative stop signal: the profile is written before the process exits. On platforms without SIGTERM
+    handling (Windows), a profile is only written if target returns by itself.
+    @param target: The function to be profiled, typically the compute_best_move of a SudokuAI.
+    @param args: The arguments of target.
+    @param profile_path: The location of the profile.
+    """
+    profiler = cProfile.Profile()
+
+    def flush(signum=None, frame=None):
+        profiler.disable()
+        if hasattr(signal, 'SIGTERM'):
+            # the process must not be stopped while the profile is being written
+            signal.signal(signal.SIGTERM, signal.SIG_IGN)
+        profiler.dump_stats(profile_path)
+        if signum is not None:
+            os._exit(0)
+
+    if hasattr(signal, 'SIGTERM'):
+        signal.signal(signal.SIGTERM, flush)
+    profiler.enable()
+    try:
+        target(*args)
+    finally:
+        flush()
+
+
+def merge_profiles(profile_paths: List[str], output_path: str) -> Optional[pstats.Stats]:
+    """
+    Merges a number of profiles into a single one.
+    @param profile_paths: The locations of the profiles. Missing files are skipped, since a process may have been killed
+    before it could write its profile.
+    @param output_path: The location of the merged profile.
+    @return: The merged statistics, or None if none of the profiles exists.
+    """
+    existing = [path for path in profile_paths if os.path.isfile(path) and os.path.getsize(path) > 0]
+    if not existing:
+        return None
+    stats = pstats.Stats(existing[0])
+    for path in existing[1:]:
+        stats.add(path)
+    stats.dump_stats(output_path)
+    return stats
+
+
+class GameProfiler(object):
+    """
+    Keeps track of the profiles of the moves of a game, and merges them per player at the end of the game.
+
+    The layout of the profile directory is:
+
+        <profile_dir>/moves/player<p>-move<k>.prof   the profile of a single move
+        <profile_dir>/player<p>.prof                 the merged profile of all moves of player p
+    """
+
+    def __init__(self, profile_dir: str):
+        """
+        @param profile_dir: The directory in which the profiles are stored. It is created if it does not exist.
+        """
+        self.profile_dir = Path(profile_dir)
+        self.move_dir = self.profile_dir / 'moves'
+        self.move_dir.mkdir(parents=True, exist_ok=True)
+        self.profile_paths = {1: [], 2: []}
+
+    def move_profile_path(self, player_number: int, move_number: int) -> str:
+        """
+        @return: The location of the profile of a move, which is remembered for merging.
+        """
+        path = str(self.move_dir / f'player{player_number}-move{move_number}.prof')
+        self.profile_paths[player_number].append(path)
+        return path
+
+    def merge(self, top: int = 15) -> None:
+        """
+        Merges the profiles of the moves per player, and prints the functions with the largest cumulative time.
+        @param top: The number of functions that is printed per player.
+        """
+        for player_number, paths in self.profile_paths.items():
+            output_path = str(self.profile_dir / f'player{player_number}.prof')
+            stats = merge_profiles(paths, output_path)
+            if stats is None:
+                continue
+            print(f'Profile of player {player_number} ({len(paths)} moves): {output_path}')
+            stats.sort_stats('cumulative').print_stats(top)
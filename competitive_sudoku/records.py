@@ -0,0 +1,227 @@
+#  (C) Copyright Wieger Wesselink 2021. Distributed under the GPL-3.0-or-later
+#  Software License, (See accompanying file LICENSE or copy at
+#  https://www.gnu.org/licenses/gpl-3.0.txt)
+
+"""
+A compact binary format for boards and game records, and a corpus container that stores many of them in one file.
+
+A board is stored as:
+
+    magic 'SDKB', version (uint8), m (uint8), n (uint8), cell size in bytes (uint8), N * N cells
+
+The cells are uint8 if N < 128 and uint16 otherwise, so that the highest bit of a cell is free to mark taboo moves. A game record is stored as:
+
+    magic 'SDKG', version (uint8), m (uint8), n (uint8), cell size in bytes (uint8), number of moves (uint32),
+    final scores (2 x int32), N * N cells of the initial board, the moves, the rewards
+
+Every move consists of three cells i, j and value, the value of a taboo move is stored with its highest bit set.
+Every reward is an int16. A corpus is stored as:
+
+    magic 'SDKC', version (uint8), padding (3 bytes), number of records (uint64), offsets (count + 1 x uint64),
+    the records
+
+All numbers are little endian. A corpus is read through mmap, so opening it takes constant time, and a record is only
+decoded when it is accessed.
+"""
+
+import mmap
+import struct
+import sys
+from array import array
+from typing import Iterable, Iterator, List, Sequence, Union
+from competitive_sudoku.sudoku import Move, SudokuBoard, TabooMove
+
+version = 1
+board_header = struct.Struct('<4sBBBB')
+game_header = struct.Struct('<4sBBBBIii')
+corpus_header = struct.Struct('<4sB3xQ')
+cell_types = {1: 'B', 2: 'H'}  # cell size in bytes -> array type code
+
+
+def _cell_type(N: int) -> str:
+    """
+    @return: The array type code of the cells of a board with values up to N.
+    """
+    return 'B' if N < 128 else 'H'
+
+
+def _pack(type_code: str, values: Sequence[int]) -> bytes:
+    data = array(type_code, values)
+    if sys.byteorder == 'big':
+        data.byteswap()
+    return data.tobytes()
+
+
+def _unpack(type_code: str, buffer, offset: int, count: int) -> array:
+    data = array(type_code)
+    data.frombytes(buffer[offset:offset + count * data.itemsize])
+    if sys.byteorder == 'big':
+        data.byteswap()
+    return data
+
+
+def board_to_bytes(board: SudokuBoard) -> bytes:
+    """
+    Encodes a board in the binary format.
+    @param board: A sudoku board.
+    @return: The encoded board.
+    """
+    type_code = _cell_type(board.N)
+    header = board_header.pack(b'SDKB', version, board.m, board.n, array(type_code).itemsize)
+    return header + _pack(type_code, board.squares)
+
+
+def board_from_bytes(buffer, offset: int = 0) -> SudokuBoard:
+    """
+    Decodes a board that was encoded by board_to_bytes.
+    @param buffer: A bytes-like object, e.g. a memory mapped corpus.
+    @param offset: The position of the board in buffer.
+    @return: The decoded board.
+    """
+    magic, _, m, n, cell_size = board_header.unpack_from(buffer, offset)
+    if magic != b'SDKB':
+        raise RuntimeError('The data does not contain a binary sudoku board.')
+    board = SudokuBoard(m, n)
+    N = board.N
+    board.squares = _unpack(cell_types[cell_size], buffer, offset + board_header.size, N * N).tolist()
+    return board
+
+
+class GameRecord(object):
+    """
+    The history of a game: the initial position, the moves that were played (including taboo moves), the reward of
+    every move and the final scores.
+    """
+
+    def __init__(self, initial_board: SudokuBoard, moves: List[Union[Move, TabooMove]], rewards: List[int], scores: List[int]):
+        """
+        @param initial_board: The start position of the game.
+        @param moves: The moves in the order they were played.
+        @param rewards: The points that were gotten with every move.
+        @param scores: The final scores of the first and the second player.
+        """
+        self.initial_board = initial_board
+        self.moves = moves
+        self.rewards = rewards
+        self.scores = scores
+
+    def to_bytes(self) -> bytes:
+        """
+        @return: The game record in the binary format.
+        """
+        board = self.initial_board
+        N = board.N
+        type_code = _cell_type(N)
+        taboo_bit = 1 << (8 * array(type_code).itemsize - 1)
+        header = game_header.pack(b'SDKG', version, board.m, board.n, array(type_code).itemsize, len(self.moves), self.scores[0], self.scores[1])
+        cells = []
+        for move in self.moves:
+            cells.extend((move.i, move.j, move.value | taboo_bit if isinstance(move, TabooMove) else move.value))
+        return header + _pack(type_code, board.squares) + _pack(type_code, cells) + _pack('h', self.rewards)
+
+    @staticmethod
+    def from_bytes(buffer, offset: int = 0) -> 'GameRecord':
+        """
+        Decodes a game record that was encoded by to_bytes.
+        @param buffer: A bytes-like object, e.g. a memory mapped corpus.
+        @param offset: The position of the record in buffer.
+        @return: The decoded game record.
+        """
+        magic, _, m, n, cell_size, number_of_moves, score1, score2 = game_header.unpack_from(buffer, offset)
+        if magic != b'SDKG':
+            raise RuntimeError('The data does not contain a binary game record.')
+        board = SudokuBoard(m, n)
+        N = board.N
+        type_code = cell_types[cell_size]
+        taboo_bit = 1 << (8 * cell_size - 1)
+        offset += game_header.size
+        board.squares = _unpack(type_code, buffer, offset, N * N).tolist()
+        offset += N * N * cell_size
+        cells = _unpack(type_code, buffer, offset, 3 * number_of_moves)
+        offset += 3 * number_of_moves * cell_size
+        moves = []
+        for k in range(0, len(cells), 3):
+            i, j, value = cells[k], cells[k + 1], cells[k + 2]
+            moves.append(TabooMove(i, j, value & ~taboo_bit) if value & taboo_bit else Move(i, j, value))
+        rewards = _unpack('h', buffer, offset, number_of_moves).tolist()
+        return GameRecord(board, moves, rewards, [score1, score2])
+
+
+def write_corpus(filename: str, records: Iterable[bytes]) -> int:
+    """
+    Writes encoded boards or game records to a corpus file.
+    @param filename: A file name.
+    @param records: The encoded records, e.g. the output of board_to_bytes or GameRecord.to_bytes.
+    @return: The number of records.
+    """
+    records = list(records)
+    offsets = [0]
+    for record in records:
+        offsets.append(offsets[-1] + len(record))
+    start = corpus_header.size + 8 * len(offsets)
+    with open(filename, 'wb') as handle:
+        handle.write(corpus_header.pack(b'SDKC', version, len(records)))
+        handle.write(_pack('Q', [start + offset for offset in offsets]))
+        for record in records:
+            handle.write(record)
+    return len(records)
+
+
+class Corpus(object):
+    """
+    Read access to a corpus file through mmap. Typical usage:
+
+        with Corpus('boards.sdkc') as corpus:
+            for board in corpus.boards():
+                ...
+    """
+
+    def __init__(self, filename: str):
+        """
+        @param filename: The name of a file that was written by write_corpus.
+        """
+        self.file = open(filename, 'rb')
+        self.buffer = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, _, count = corpus_header.unpack_from(self.buffer, 0)
+        if magic != b'SDKC':
+            self.close()
+            raise RuntimeError(f'The file {filename} is not a sudoku corpus.')
+        self.offsets = _unpack('Q', self.buffer, corpus_header.size, count + 1)
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def raw(self, index: int) -> bytes:
+        """
+        @return: A copy of the encoded record with the given index. A view of the mapped file would keep close from
+        releasing it.
+        """
+        return self.buffer[self.offsets[index]:self.offsets[index + 1]]
+
+    def board(self, index: int) -> SudokuBoard:
+        """
+        @return: The board with the given index.
+        """
+        return board_from_bytes(self.buffer, self.offsets[index])
+
+    def game(self, index: int) -> GameRecord:
+        """
+        @return: The game record with the given index.
+        """
+        return GameRecord.from_bytes(self.buffer, self.offsets[index])
+
+    def boards(self) -> Iterator[SudokuBoard]:
+        return (self.board(index) for index in range(len(self)))
+
+    def games(self) -> Iterator[GameRecord]:
+        return (self.game(index) for index in range(len(self)))
+
+    def close(self) -> None:
+        self.buffer.close()
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
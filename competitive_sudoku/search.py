@@ -0,0 +1,165 @@
+#  (C) Copyright Wieger Wesselink 2021. Distributed under the GPL-3.0-or-later
+#  Software License, (See accompanying file LICENSE or copy at
+#  https://www.gnu.org/licenses/gpl-3.0.txt)
+
+import time
+from typing import Iterator, List, Optional
+
+
+class SearchTimeout(Exception):
+    """
+    Raised from inside a search when the time budget of the current move is used up.
+    """
+    pass
+
+
+class CpuThrottle(object):
+    """
+    Limits the share of a CPU that a computation uses, by sleeping after every slice of work. It is used by a search
+    that runs next to the search of the other player, e.g. while pondering.
+    """
+
+    def __init__(self, share: float, slice_time: float = 0.01):
+        """
+        @param share: The fraction of the time that is spent working, between 0 and 1.
+        @param slice_time: The minimal time in seconds of a slice of work.
+        """
+        self.share = share
+        self.slice_time = slice_time
+        self.slice_start = time.perf_counter()
+
+    def pause(self) -> None:
+        """
+        Is called regularly by the computation. If the current slice of work is over, it sleeps such that the share of
+        the time spent working equals self.share.
+        """
+        if self.share >= 1:
+            return
+        work = time.perf_counter() - self.slice_start
+        if work >= self.slice_time:
+            time.sleep(work * (1 - self.share) / max(self.share, 0.01))
+            self.slice_start = time.perf_counter()
+
+
+class IterativeDeepening(object):
+    """
+    Controls an iterative deepening search within a time budget. It measures the nodes and the time of every completed
+    iteration, and starts the next depth if the predicted time of that iteration fits in the remaining time, or if
+    enough time is left to make a partial iteration worthwhile.
+
+    Typical usage:
+
+        controller = IterativeDeepening(self.time_budget)
+        for depth in controller.depths(1, 50):
+            try:
+                ...  # search with the given depth, calling controller.tick() in every node
+            except SearchTimeout:
+                break
+
+    The best root move of the previous iteration should be searched first. Then the best move found so far in an
+    unfinished iteration is at least as good as the previous best move, and it can be proposed safely.
+    """
+
+    def __init__(self, time_budget: Optional[float], safety_margin: float = 0.1, minimum_margin: float = 0.05, check_interval: int = 16, partial_usage: float = 0.5, start_time: Optional[float] = None, throttle: Optional[CpuThrottle] = None):
+        """
+        @param time_budget: The time in seconds available for the move, or None if the search is stopped from outside.
+        @param safety_margin: The fraction of the time budget that is kept in reserve.
+        @param minimum_margin: The minimal time in seconds that is kept in reserve.
+        @param check_interval: The clock is read once every check_interval nodes.
+        @param partial_usage: An iteration that is not predicted to finish is still started if less than this fraction
+        of the time until the deadline has been used, because its partial result is still an improvement.
+        @param start_time: The time.perf_counter() at which the computation of the move started, by default now. The
+        time that is spent before the search, e.g. to set up the board, is counted against the budget this way.
+        @param throttle: If set, the search is slowed down to the CPU share of the throttle.
+        """
+        self.start_time = time.perf_counter() if start_time is None else start_time
+        self.deadline = None
+        if time_budget is not None:
+            self.deadline = self.start_time + time_budget - max(time_budget * safety_margin, minimum_margin)
+        self.partial_usage = partial_usage
+        self.check_interval = check_interval
+        self.throttle = throttle
+        self.nodes = 0
+        # the depth of the last completed iteration, N.B. it is updated when the loop body returns to the generator, so
+        # inside the body it is still the depth of the previous iteration
+        self.completed_depth = 0
+        self.iteration_nodes: List[int] = []
+        self.iteration_times: List[float] = []
+        self._countdown = check_interval
+
+    def tick(self) -> None:
+        """
+        Counts a node of the search. Raises SearchTimeout if the deadline has passed.
+        """
+        self.nodes += 1
+        self._countdown -= 1
+        if self._countdown <= 0:
+            self._countdown = self.check_interval
+            if self.deadline is not None and time.perf_counter() >= self.deadline:
+                raise SearchTimeout()
+            if self.throttle is not None:
+                self.throttle.pause()
+
+    def elapsed(self) -> float:
+        """
+        @return: The time in seconds since the controller was created.
+        """
+        return time.perf_counter() - self.start_time
+
+    def remaining(self) -> float:
+        """
+        @return: The time in seconds until the deadline, or infinity if there is no deadline.
+        """
+        if self.deadline is None:
+            return float('inf')
+        return self.deadline - time.perf_counter()
+
+    def branching_factor(self) -> Optional[float]:
+        """
+        @return: The effective branching factor, i.e. the ratio of the nodes of the last two completed iterations, or
+        None if fewer than two iterations have been completed.
+        """
+        if len(self.iteration_nodes) < 2 or self.iteration_nodes[-2] == 0:
+            return None
+        return max(1.0, self.iteration_nodes[-1] / self.iteration_nodes[-2])
+
+    def predicted_time(self) -> float:
+        """
+        @return: The predicted time in seconds of the next iteration.
+        """
+        if not self.iteration_times:
+            return 0.0
+        factor = self.branching_factor()
+        if factor is None:
+            # a deeper iteration takes at least as long as the previous one
+            factor = 1.0
+        return self.iteration_times[-1] * factor
+
+    def can_start_iteration(self) -> bool:
+        """
+        @return: True if the next iteration is predicted to finish before the deadline, or if it is worth starting it
+        for a partial result.
+        """
+        remaining = self.remaining()
+        if remaining <= 0:
+            return False
+        if self.predicted_time() <= remaining:
+            return True
+        return self.elapsed() < self.partial_usage * (self.deadline - self.start_time)
+
+    def depths(self, first_depth: int, max_depth: int) -> Iterator[int]:
+        """
+        Generates the depths of the iterations, as long as they are predicted to finish in time. An iteration counts as
+        completed when the loop body returns to the generator, so an iteration that is left with break is not measured.
+        @param first_depth: The depth of the first iteration.
+        @param max_depth: The maximal depth.
+        """
+        depth = first_depth
+        while depth <= max_depth and self.can_start_iteration():
+            start_time = time.perf_counter()
+            start_nodes = self.nodes
+            yield depth
+            self.iteration_times.append(time.perf_counter() - start_time)
+            self.iteration_nodes.append(self.nodes - start_nodes)
+            self.completed_depth = depth
+            depth += 1
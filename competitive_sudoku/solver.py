@@ -0,0 +1,354 @@
+#  (C) Copyright Wieger Wesselink 2021. Distributed under the GPL-3.0-or-later
+#  Software License, (See accompanying file LICENSE or copy at
+#  https://www.gnu.org/licenses/gpl-3.0.txt)
+
+from typing import Iterable, Iterator, List, Optional, Tuple
+import random
+import time
+from competitive_sudoku.sudoku import SudokuBoard
+
+
+def region_masks(board: SudokuBoard):
+    """
+    Computes for every row, column and block a bitmask of the values it contains. Value v corresponds to bit v.
+    Blocks are numbered from left to right, from top to bottom.
+    @param board: A sudoku board.
+    @return: The lists row_masks, col_masks and blk_masks, each of length N.
+    """
+    m, n, N = board.m, board.n, board.N
+    row_masks = [0] * N
+    col_masks = [0] * N
+    blk_masks = [0] * N
+    for k, value in enumerate(board.squares):
+        if value != SudokuBoard.empty:
+            i, j = divmod(k, N)
+            bit = 1 << value
+            row_masks[i] |= bit
+            col_masks[j] |= bit
+            blk_masks[(i // m) * m + j // n] |= bit
+    return row_masks, col_masks, blk_masks
+
+
+def iter_solutions(board: SudokuBoard, limit: Optional[int] = None, rng: Optional[random.Random] = None, hint: Optional[List[int]] = None) -> Iterator[List[int]]:
+    """
+    Enumerates the solutions of a sudoku board using backtracking over bitmasks of candidate values. In every step
+    the empty square with the fewest candidates is filled first. The backtracking uses an explicit stack, so boards
+    with more empty squares than the recursion limit (e.g. N = 36) can be solved as well.
+    @param board: A sudoku board. It is not modified.
+    @param limit: The maximal number of solutions that is generated, or None for all solutions.
+    @param rng: If set, the candidates of a square are tried in a random order.
+    @param hint: If set, a list of N * N values, e.g. a solution of a similar board. The value of a square in hint is
+    tried before the other candidates.
+    @return: An iterator over the solutions, each given as a list of the N * N squares.
+    """
+    if limit is not None and limit <= 0:
+        return
+    m, n, N = board.m, board.n, board.N
+    squares = list(board.squares)
+    row_masks, col_masks, blk_masks = region_masks(board)
+    full = ((1 << (N + 1)) - 1) & ~1
+    remaining = [(k, k // N, k % N, (k // N // m) * m + k % N // n) for k, value in enumerate(squares) if value == SudokuBoard.empty]
+    stack = []  # (square, the candidates that have not been tried yet, in reverse order)
+    count = 0
+
+    while True:
+        if not remaining:
+            count += 1
+            yield list(squares)
+            if limit is not None and count >= limit:
+                return
+        else:
+            # pick the square with the fewest candidates
+            best_index = -1
+            best_candidates = 0
+            best_size = N + 1
+            for index, (k, i, j, b) in enumerate(remaining):
+                candidates = full & ~(row_masks[i] | col_masks[j] | blk_masks[b])
+                size = bin(candidates).count('1')
+                if size < best_size:
+                    best_index, best_candidates, best_size = index, candidates, size
+                    if size <= 1:
+                        break
+            values = [value for value in range(N, 0, -1) if best_candidates >> value & 1]
+            if rng is not None:
+                rng.shuffle(values)
+            if hint is not None:
+                k = remaining[best_index][0]
+                if best_candidates >> hint[k] & 1:
+                    # the candidates are tried from the end of the list
+                    values.remove(hint[k])
+                    values.append(hint[k])
+            stack.append((remaining[best_index], values))
+            remaining[best_index] = remaining[-1]
+            remaining.pop()
+
+        # cancel the value of the square on top of the stack and try its next candidate, a square without candidates
+        # left is put back
+        while stack:
+            (k, i, j, b), values = stack[-1]
+            value = squares[k]
+            if value != SudokuBoard.empty:
+                bit = ~(1 << value)
+                row_masks[i] &= bit
+                col_masks[j] &= bit
+                blk_masks[b] &= bit
+                squares[k] = SudokuBoard.empty
+            if values:
+                value = values.pop()
+                bit = 1 << value
+                row_masks[i] |= bit
+                col_masks[j] |= bit
+                blk_masks[b] |= bit
+                squares[k] = value
+                break
+            remaining.append(stack.pop()[0])
+        if not stack:
+            return
+
+
+def has_solution(board: SudokuBoard) -> bool:
+    """
+    Checks if a sudoku board has a solution.
+    @param board: A sudoku board.
+    @return: True if the board has at least one solution.
+    """
+    return next(iter_solutions(board, limit=1), None) is not None
+
+
+class SolutionWitness(object):
+    """
+    Keeps a solution of the current position of a game. A move that agrees with the solution leaves a solvable board,
+    so most moves are validated without a search. Only a move that contradicts the solution needs a search, which
+    starts with the values of the old solution. Checking that the solution still belongs to the position takes a single
+    pass over the squares, so a witness can be shared by the positions of several games.
+    """
+
+    def __init__(self):
+        self.solution: Optional[List[int]] = None
+        self.hits = 0  # the number of questions that were answered by the solution
+        self.searches = 0  # the number of questions that needed a search
+
+    def agrees_with(self, board: SudokuBoard) -> bool:
+        """
+        @return: True if the solution agrees with the filled squares of board.
+        """
+        solution = self.solution
+        if solution is None or len(solution) != len(board.squares):
+            return False
+        empty = SudokuBoard.empty
+        return all(value == empty or value == solution[k] for k, value in enumerate(board.squares))
+
+    def is_solvable_after(self, board: SudokuBoard, k: int, value: int) -> bool:
+        """
+        Checks if a board has a solution after a move. The move must not conflict with a filled square.
+        @param board: A sudoku board, it is not modified.
+        @param k: The index of an empty square.
+        @param value: The value of the move.
+        @return: True if the board has a solution after the move.
+        """
+        if self.agrees_with(board) and self.solution[k] == value:
+            self.hits += 1
+            return True
+        self.searches += 1
+        board.squares[k] = value
+        try:
+            solution = next(iter_solutions(board, limit=1, hint=self.solution), None)
+        finally:
+            board.squares[k] = SudokuBoard.empty
+        if solution is None:
+            # a taboo move, the board without the move keeps its solution
+            return False
+        self.solution = solution
+        return True
+
+    def is_solvable(self, board: SudokuBoard) -> bool:
+        """
+        @return: True if the board has a solution.
+        """
+        if self.agrees_with(board):
+            self.hits += 1
+            return True
+        self.searches += 1
+        solution = next(iter_solutions(board, limit=1, hint=self.solution), None)
+        if solution is not None:
+            self.solution = solution
+        return solution is not None
+
+
+_units_cache = {}
+
+
+def units_and_peers(m: int, n: int) -> Tuple[List[List[int]], List[List[int]]]:
+    """
+    Computes the units of a board with m x n blocks, i.e. the rows, the columns and the blocks as lists of square
+    indices, and for every square its peers, i.e. the other squares that share a unit with it.
+    @return: The 3 * N units and the N * N lists of peers.
+    """
+    units_and_peers = _units_cache.get((m, n))
+    if units_and_peers is None:
+        N = m * n
+        rows = [[i * N + j for j in range(N)] for i in range(N)]
+        cols = [[i * N + j for i in range(N)] for j in range(N)]
+        blks = [[(r + i) * N + c + j for i in range(m) for j in range(n)] for r in range(0, N, m) for c in range(0, N, n)]
+        units = rows + cols + blks
+        peers = [set() for _ in range(N * N)]
+        for unit in units:
+            for k in unit:
+                peers[k].update(unit)
+        peers = [sorted(peers[k] - {k}) for k in range(N * N)]
+        units_and_peers = _units_cache[(m, n)] = (units, peers)
+    return units_and_peers
+
+
+def propagate(candidates: List[int], done: List[bool], units: List[List[int]], peers: List[List[int]], full: int) -> bool:
+    """
+    Applies naked singles (a square with one candidate) and hidden singles (a value with one square left in a unit) to
+    the candidate bitmasks of the squares, until nothing changes.
+    @param candidates: For every square a bitmask of its candidate values, it is modified in place. A filled square
+    has a single candidate.
+    @param done: For every square whether its single candidate has been removed from its peers, modified in place.
+    @param units: The units of the board, see units_and_peers.
+    @param peers: The peers of the squares, see units_and_peers.
+    @param full: The bitmask of all values.
+    @return: False if a contradiction was found, i.e. a square without candidates or a value without a square.
+    """
+    changed = True
+    while changed:
+        changed = False
+        for k, c in enumerate(candidates):
+            if not done[k] and c & (c - 1) == 0:
+                if c == 0:
+                    return False
+                done[k] = True
+                for p in peers[k]:
+                    if candidates[p] & c:
+                        candidates[p] &= ~c
+                        if candidates[p] == 0:
+                            return False
+                        changed = True
+        for unit in units:
+            once = 0
+            twice = 0
+            for k in unit:
+                c = candidates[k]
+                twice |= once & c
+                once |= c
+            if once != full:
+                return False
+            singles = once & ~twice
+            if singles:
+                for k in unit:
+                    c = candidates[k] & singles
+                    if c and candidates[k] != c:
+                        if c & (c - 1):
+                            # two values can only go to the same square
+                            return False
+                        candidates[k] = c
+                        changed = True
+    return True
+
+
+def solve_bounded(board: SudokuBoard, max_nodes: Optional[int], hint: Optional[List[int]] = None, deadline: Optional[float] = None) -> Tuple[Optional[bool], Optional[List[int]]]:
+    """
+    Decides if a board has a solution with constraint propagation and a bounded backtracking search.
+    @param board: A sudoku board, it is not modified.
+    @param max_nodes: The search gives up after this many branches, None for an unbounded search.
+    @param hint: If set, a list of N * N values. The value of a square in hint is tried before its other candidates.
+    @param deadline: If set, the search gives up at this time.perf_counter() value.
+    @return: (True, a solution) if the board has a solution, (False, None) if it has none, and (None, None) if the
+    search gave up.
+    """
+    m, n, N = board.m, board.n, board.N
+    units, peers = units_and_peers(m, n)
+    full = ((1 << (N + 1)) - 1) & ~1
+    candidates = [full if value == SudokuBoard.empty else 1 << value for value in board.squares]
+    done = [False] * (N * N)
+    stack = [(candidates, done)]
+    nodes = 0
+    while stack:
+        candidates, done = stack.pop()
+        if not propagate(candidates, done, units, peers, full):
+            continue
+        # branch on the square with the fewest candidates
+        best_k, best_size = -1, N + 1
+        for k, c in enumerate(candidates):
+            if c & (c - 1):
+                size = bin(c).count('1')
+                if size < best_size:
+                    best_k, best_size = k, size
+                    if size == 2:
+                        break
+        if best_k < 0:
+            return True, [c.bit_length() - 1 for c in candidates]
+        nodes += 1
+        if (max_nodes is not None and nodes > max_nodes) or (deadline is not None and time.perf_counter() > deadline):
+            return None, None
+        c = candidates[best_k]
+        values = [value for value in range(N, 0, -1) if c >> value & 1]
+        if hint is not None and c >> hint[best_k] & 1:
+            # the branches are popped from the end of the stack
+            values.remove(hint[best_k])
+            values.append(hint[best_k])
+        for value in values:
+            branch = list(candidates)
+            branch[best_k] = 1 << value
+            stack.append((branch, list(done)))
+    return False, None
+
+
+def solution_support(board: SudokuBoard, taboo_moves: Iterable[Tuple[int, int, int]] = ()) -> Optional[List[int]]:
+    """
+    Computes the support of the solutions of a board: for every square the values that it has in at least one
+    solution. These are exactly the moves that keep the sudoku solvable.
+
+    Instead of a search for every candidate move, every solution that is found marks all of its values as supported.
+    The next search is only done for a candidate that is not supported yet, and it is steered towards the other
+    unsupported candidates, such that a few solutions cover most of the moves. Candidates that are ruled out by
+    constraint propagation are never searched. The values that do not occur on the board can be exchanged in any
+    solution, so a square with one of them in a solution supports all of them.
+    @param board: A sudoku board, it is not modified.
+    @param taboo_moves: Moves (i, j, value) that are excluded from the result.
+    @return: For every square the bitmask of its supported values, or None if the board has no solution.
+    """
+    m, n, N = board.m, board.n, board.N
+    units, peers = units_and_peers(m, n)
+    full = ((1 << (N + 1)) - 1) & ~1
+    candidates = [full if value == SudokuBoard.empty else 1 << value for value in board.squares]
+    if not propagate(candidates, [False] * (N * N), units, peers, full):
+        return None
+    solvable, solution = solve_bounded(board, None)
+    if not solvable:
+        return None
+    free = full
+    for value in board.squares:
+        free &= ~(1 << value)
+    support = [0] * (N * N)
+
+    def add_solution():
+        for q, v in enumerate(solution):
+            bit = 1 << v
+            support[q] |= free if bit & free else bit
+
+    add_solution()
+    for k, value in enumerate(board.squares):
+        if value != SudokuBoard.empty:
+            continue
+        while candidates[k] & ~support[k]:
+            unsupported = candidates[k] & ~support[k]
+            value = (unsupported & -unsupported).bit_length() - 1
+            # the search prefers the unsupported values of the other squares
+            hint = [(c & ~s & -(c & ~s)).bit_length() - 1 if c & ~s else solution[q]
+                    for q, (c, s) in enumerate(zip(candidates, support))]
+            board.squares[k] = value
+            try:
+                solvable, new_solution = solve_bounded(board, None, hint)
+            finally:
+                board.squares[k] = SudokuBoard.empty
+            if solvable:
+                solution = new_solution
+                add_solution()
+            else:
+                candidates[k] &= ~(1 << value)
+    for i, j, value in taboo_moves:
+        support[i * N + j] &= ~(1 << value)
+    return support
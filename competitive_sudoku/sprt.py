@@ -0,0 +1,135 @@
+#  (C) Copyright Wieger Wesselink 2021. Distributed under the GPL-3.0-or-later
+#  Software License, (See accompanying file LICENSE or copy at
+#  https://www.gnu.org/licenses/gpl-3.0.txt)
+
+"""
+Statistics of matches between two agents: Elo estimates and the sequential probability ratio test (SPRT).
+
+The games of a match are played in pairs on the same board, where each agent moves first once. The score of a pair is
+the average of the scores of its two games (1 for a win, 0.5 for a draw, 0 for a loss). Since the advantage of moving
+first and the difficulty of the board cancel out within a pair, the pair scores vary less than the game scores, and
+the test needs fewer games.
+
+The SPRT decides between the hypotheses H0: elo = elo0 and H1: elo = elo1. It uses the normal approximation of the
+generalized SPRT: the log-likelihood ratio of n pair scores with mean mu and variance var is
+
+    LLR = n * (s1 - s0) * (2 * mu - s0 - s1) / (2 * var)
+
+where s0 and s1 are the expected scores of elo0 and elo1. The test stops with H1 if LLR >= log((1 - beta) / alpha),
+and with H0 if LLR <= log(beta / (1 - alpha)).
+"""
+
+import math
+from typing import List, Optional, Tuple
+
+
+def expected_score(elo: float) -> float:
+    """
+    @return: The expected score of a player that is elo points stronger than its opponent.
+    """
+    return 1 / (1 + 10 ** (-elo / 400))
+
+
+def elo_difference(score: float) -> float:
+    """
+    @return: The Elo difference that corresponds to an expected score, the inverse of expected_score.
+    """
+    score = min(max(score, 1e-6), 1 - 1e-6)
+    return -400 * math.log10(1 / score - 1)
+
+
+def mean_and_variance(scores: List[float]) -> Tuple[float, float]:
+    """
+    @return: The mean and the variance of the scores.
+    """
+    n = len(scores)
+    mu = sum(scores) / n
+    return mu, sum((x - mu) ** 2 for x in scores) / n
+
+
+def pair_variance(scores: List[float]) -> float:
+    """
+    @return: The variance of the pair scores, but at least the variance of a pair of two independent draw-free games
+    between equal players. A few pairs with (nearly) the same score say little about the spread, and a smaller
+    variance would make the Elo interval narrow and the log-likelihood ratio large after a handful of pairs.
+    """
+    var = mean_and_variance(scores)[1]
+    return max(var, 0.25 / 2)
+
+
+def elo_interval(scores: List[float], confidence: float = 0.95) -> Tuple[float, float, float]:
+    """
+    Estimates the Elo difference from the pair scores.
+    @param scores: The pair scores.
+    @param confidence: The confidence level of the interval.
+    @return: The estimate and the lower and upper bound of its confidence interval.
+    """
+    mu, var = sum(scores) / len(scores), pair_variance(scores)
+    margin = normal_quantile(0.5 + confidence / 2) * math.sqrt(var / len(scores))
+    return elo_difference(mu), elo_difference(mu - margin), elo_difference(mu + margin)
+
+
+def normal_quantile(p: float) -> float:
+    """
+    @return: The p-quantile of the standard normal distribution, computed by bisection of math.erf.
+    """
+    low, high = -10.0, 10.0
+    for _ in range(100):
+        middle = (low + high) / 2
+        if 0.5 * (1 + math.erf(middle / math.sqrt(2))) < p:
+            low = middle
+        else:
+            high = middle
+    return (low + high) / 2
+
+
+class SPRT(object):
+    """
+    The sequential probability ratio test of a match. Typical usage:
+
+        test = SPRT(elo0=0, elo1=50)
+        while test.result() is None:
+            test.add(play_pair())
+    """
+
+    def __init__(self, elo0: float = 0, elo1: float = 50, alpha: float = 0.05, beta: float = 0.05):
+        """
+        @param elo0: The Elo difference of the null hypothesis.
+        @param elo1: The Elo difference of the alternative hypothesis, it must be larger than elo0.
+        @param alpha: The probability of accepting H1 if H0 is true.
+        @param beta: The probability of accepting H0 if H1 is true.
+        """
+        if elo1 <= elo0:
+            raise RuntimeError('The Elo difference elo1 of the alternative hypothesis must be larger than elo0.')
+        self.elo0 = elo0
+        self.elo1 = elo1
+        self.lower_bound = math.log(beta / (1 - alpha))
+        self.upper_bound = math.log((1 - beta) / alpha)
+        self.scores = []
+
+    def add(self, score: float) -> None:
+        """
+        Adds the score of a pair of games.
+        """
+        self.scores.append(score)
+
+    def llr(self) -> float:
+        """
+        @return: The log-likelihood ratio of H1 and H0.
+        """
+        if len(self.scores) < 2:
+            return 0.0
+        mu, var = sum(self.scores) / len(self.scores), pair_variance(self.scores)
+        s0, s1 = expected_score(self.elo0), expected_score(self.elo1)
+        return len(self.scores) * (s1 - s0) * (2 * mu - s0 - s1) / (2 * var)
+
+    def result(self) -> Optional[str]:
+        """
+        @return: 'H1' if the test accepts H1, 'H0' if it accepts H0, or None if more games are needed.
+        """
+        llr = self.llr()
+        if llr >= self.upper_bound:
+            return 'H1'
+        if llr <= self.lower_bound:
+            return 'H0'
+        return None
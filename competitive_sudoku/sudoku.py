@@ -2,7 +2,7 @@
 #  Software License, (See accompanying file LICENSE or copy at
 #  https://www.gnu.org/licenses/gpl-3.0.txt)
 
-from typing import List, Tuple, Union
+from typing import List, Optional, Tuple, Union
 
 
 class Move(object):
@@ -148,7 +148,7 @@ def print_board(board: SudokuBoard) -> str:
         if i == 0:
             out.write('  ')
             for j in range(N):
-                out.write(f'   {j + 1}  ')
+                out.write(f'  {j + 1:>2}  ')
             out.write('\n')
             for j in range(N):
                 if j % n != 0:
@@ -248,19 +248,26 @@ class GameState(object):
                  board: SudokuBoard,
                  taboo_moves: List[TabooMove],
                  moves: List[Union[Move, TabooMove]],
-                 scores: List[int]):
+                 scores: List[int],
+                 clock: Optional[List[float]] = None,
+                 increment: float = 0.0):
         """
         @param initial_board: A sudoku board. It contains the start position of a game.
         @param board: A sudoku board. It contains the current position of a game.
         @param taboo_moves: A list of taboo moves. Moves in this list cannot be played.
         @param moves: The history of a sudoku game, starting in initial_board.
         @param scores: The current scores of the first and the second player.
+        @param clock: The time in seconds that is left on the clocks of the first and the second player, or None if
+        the game is played with a fixed time per move.
+        @param increment: The time in seconds that is added to the clock of a player after every move.
         """
         self.initial_board = initial_board
         self.board = board
         self.taboo_moves = taboo_moves
         self.moves = moves
         self.scores = scores
+        self.clock = clock
+        self.increment = increment
 
     def __str__(self):
         import io
@@ -2,12 +2,21 @@
 #  Software License, (See accompanying file LICENSE or copy at
 #  https://www.gnu.org/licenses/gpl-3.0.txt)
 
-from typing import List
-from competitive_sudoku.sudoku import GameState, Move
+from typing import List, Optional
+from competitive_sudoku.sudoku import GameState, Move, SudokuBoard
+from competitive_sudoku.baseline import generate_move
+from competitive_sudoku.endgame import EndgameSolver
+from competitive_sudoku.taboo import TABOO, TabooPredictor
+import marshal
 import os
 import pickle
 import math
+import random
 from datetime import datetime
+try:
+    import resource
+except ImportError:  # resource is not available on Windows
+    resource = None
 
 
 class SudokuAI(object):
@@ -15,10 +24,33 @@ class SudokuAI(object):
     Sudoku AI that computes the best move in a given sudoku configuration.
     """
 
+    # the tunable parameters of the agent, as name -> (default, lowest value, highest value), see configure
+    parameters = {}
+
     def __init__(self):
         self.best_move: List[int] = [0, 0, 0]
         self.lock = None
         self.player_number = -1
+        self.endgame_solver = EndgameSolver()
+        self.endgame_time_limit = 1.0  # the time limit in seconds of the endgame solver if there is no time budget
+        self.taboo_predictor = TabooPredictor()
+        self.time_budget: Optional[float] = None  # the time in seconds for computing a move, N.B. this is set from outside
+        # with a game clock, time_budget is the time left on the clock, and the agent decides how much of it to use, see allocate_time
+        self.stats = None  # a shared dictionary with search statistics, or None if they are not collected, N.B. this is set from outside
+        self.ponder_share = 0.5  # the share of a CPU that ponder may use, N.B. this is set from outside
+        self.ponder_save_interval = 0.25  # the minimal time in seconds between two saves of ponder
+        for name, (default, _, _) in self.parameters.items():
+            setattr(self, name, default)
+
+    def configure(self, **values) -> None:
+        """
+        Sets tunable parameters of the agent. They are stored as attributes with the same name.
+        @param values: The values of the parameters as keyword arguments.
+        """
+        for name, value in values.items():
+            if name not in self.parameters:
+                raise RuntimeError(f'{type(self).__module__} has no parameter {name}.')
+            setattr(self, name, value)
 
     def compute_best_move(self, game_state: GameState) -> None:
         """
@@ -29,6 +61,26 @@ class SudokuAI(object):
         """
         raise NotImplementedError
 
+    def ponder(self, game_state: GameState) -> None:
+        """
+        This function may search ahead during the turn of the opponent, if the game playing framework is asked to let
+        the agents ponder. In game_state the opponent is to move. The results should be saved, such that the next call
+        to compute_best_move can use them; that call finds the move that was actually played in game_state.moves[-1].
+        The function is run in a separate process that is killed when the opponent has moved, and it should not use more
+        than self.ponder_share of a CPU, see CpuThrottle. Since saving a large object takes time, the results should
+        be saved at most once per self.ponder_save_interval seconds, and once more when ponder stops by itself, see
+        ponder_time. By default it does nothing.
+        @param game_state: A Game state.
+        """
+        pass
+
+    def ponder_time(self, game_state: GameState) -> Optional[float]:
+        """
+        @return: The time in seconds until the opponent has moved, or None if it is not known. With a fixed time per
+        move the opponent gets the same time as this agent, and ponder can stop in time to save its last results.
+        """
+        return self.time_budget if game_state.clock is None else None
+
     def propose_move(self, move: Move) -> None:
         """
         Updates the best move that has been found so far.
@@ -44,32 +96,136 @@ class SudokuAI(object):
         if self.lock:
             self.lock.release()
 
-    def save(self, object):
+    def report_stats(self, **values) -> None:
+        """
+        Reports statistics about the search of the current move, e.g. nodes, depth, simulations, cutoffs, tt_probes,
+        tt_hits and time (the seconds spent so far). Later reports overwrite earlier ones, so an agent typically reports
+        the totals after every iteration. The peak memory usage is added automatically. If no statistics are collected,
+        this function returns immediately.
+        @param values: The statistics as keyword arguments with numeric values.
+        """
+        if self.stats is None:
+            return
+        if resource is not None:
+            # the maximal resident set size, in kilobytes on Linux
+            values['peak_memory'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
         if self.lock:
             self.lock.acquire()
-        save_path = os.path.join(os.getcwd(), '{}.pkl'.format(self.player_number))
+        self.stats.update(values)
+        if self.lock:
+            self.lock.release()
+
+    def allocate_time(self, game_state: GameState, candidate_moves: Optional[int] = None, reserve_moves: int = 2, minimum_time: float = 0.05) -> Optional[float]:
+        """
+        Decides how much time to spend on the current move. With a fixed time per move this is self.time_budget. With a
+        game clock, the time left is divided over the moves that the player still has to make, and the increment of
+        the move is added. The middle of the game gets more than its share, since the opening moves hardly matter and
+        the last moves are solved quickly. A forced move gets the minimal time.
+        @param game_state: A Game state.
+        @param candidate_moves: The number of moves to choose from, if it is known.
+        @param reserve_moves: The number of extra moves that the time left is divided over, as a reserve against
+        taboo moves and against the overhead of starting the computation.
+        @param minimum_time: The minimal time in seconds of a move.
+        @return: The time in seconds for the move, or None if there is no time limit.
+        """
+        if game_state.clock is None:
+            return self.time_budget
+        remaining = game_state.clock[len(game_state.moves) % 2]
+        empties = game_state.board.squares.count(SudokuBoard.empty)
+        initial_empties = max(1, game_state.initial_board.squares.count(SudokuBoard.empty))
+        if candidate_moves is not None and candidate_moves <= 1:
+            return min(minimum_time, remaining)
+        # the player makes every other move
+        moves_to_go = (empties + 1) // 2 + reserve_moves
+        # the progress of the game, from 0 at the start to 1 at the end, which weighs the moves from 0.5 to 1.5
+        progress = 1 - empties / initial_empties
+        weight = 0.5 + 4 * progress * (1 - progress)
+        budget = weight * remaining / moves_to_go + game_state.increment
+        # never more than half of the clock, in case the weights were too optimistic
+        return max(min(minimum_time, remaining), min(budget, remaining / 2))
+
+    def propose_proved_move(self, game_state: GameState) -> bool:
+        """
+        Solves the position exactly if it has few enough empty squares, and proposes the optimal move.
+        The limits of the solver can be configured through the attributes of self.endgame_solver. At most half of the
+        time budget is spent on it, so a search still has time to find a move if the position cannot be solved. A
+        greedy move is proposed before the solver starts, so a move is supplied even if the solver is interrupted.
+        @param game_state: A Game state.
+        @return: True if a proved optimal move was proposed.
+        """
+        board = game_state.board
+        if not 0 < board.squares.count(SudokuBoard.empty) <= self.endgame_solver.max_empties:
+            return False
+        fallback = generate_move(board, ((move.i, move.j, move.value) for move in game_state.taboo_moves), True, random.Random())
+        if fallback is not None:
+            k, value = fallback
+            self.propose_move(Move(*board.f2rc(k), value))
+        time_budget = self.allocate_time(game_state)
+        time_limit = self.endgame_time_limit if time_budget is None else time_budget / 2
+        result = self.endgame_solver.solve(game_state.board, time_limit)
+        if result is None:
+            return False
+        self.propose_move(result.move)
+        self.report_stats(nodes=result.nodes, proved=1)
+        return True
+
+    def remove_taboo_moves(self, board: SudokuBoard, moves: List[Move], count: int, time_limit: float, position_hash: Optional[int] = None) -> List[Move]:
+        """
+        Screens the first moves with self.taboo_predictor, and removes the moves that are proved to leave the sudoku
+        without a solution. The oracle would declare them taboo, and the turn would be lost. If all moves are proved
+        taboo, none of them is removed.
+        @param board: A sudoku board.
+        @param moves: The candidate moves, in the order in which they are searched.
+        @param count: The number of moves that are screened.
+        @param time_limit: The time in seconds that may be spent.
+        @param position_hash: The Zobrist hash of board, if it is known already.
+        @return: The moves without the proved taboo moves.
+        """
+        labels = self.taboo_predictor.screen(board, moves[:count], time_limit, position_hash)
+        taboo = {index for index, label in enumerate(labels) if label == TABOO}
+        self.report_stats(taboo_screened=len(labels), taboo_removed=len(taboo))
+        if not taboo or len(taboo) == len(moves):
+            return moves
+        return [move for index, move in enumerate(moves) if index not in taboo]
+
+    def save(self, object, fast: bool = False):
+        """
+        Saves an object, such that it can be loaded in the next call to compute_best_move.
+        @param object: The object to be saved.
+        @param fast: If True, marshal is used instead of pickle. It is much faster for large tables, but it only
+        supports built-in types like dicts, lists, tuples and numbers.
+        """
+        save_path = os.path.join(os.getcwd(), '{}.{}'.format(self.player_number, 'marshal' if fast else 'pkl'))
         start_time = datetime.now()
-        with open(save_path, 'wb') as handle:
-            pickle.dump(object, handle)
+        # the object is written to a temporary file that replaces the saved file at once, so a process that is
+        # terminated while saving leaves the previous object intact, and the lock of the runner is not held while
+        # writing a large object
+        temporary_path = save_path + '.tmp'
+        with open(temporary_path, 'wb') as handle:
+            (marshal if fast else pickle).dump(object, handle)
             handle.close()
+        os.replace(temporary_path, save_path)
         end_time = datetime.now()
         duration =  end_time - start_time
         # print('Saving data took {} seconds and {} milliseconds'.format(math.floor(duration.total_seconds()), round(duration.microseconds/1000)))
-        if self.lock:
-            self.lock.release()
 
 
-    def load(self):
+    def load(self, fast: bool = False):
+        """
+        Loads the object that was saved by a previous call to save.
+        @param fast: If True, the object was saved with marshal instead of pickle.
+        @return: The saved object, or None if nothing was saved.
+        """
         if self.lock:
             self.lock.acquire()
-        load_path = os.path.join(os.getcwd(), '{}.pkl'.format(self.player_number))
+        load_path = os.path.join(os.getcwd(), '{}.{}'.format(self.player_number, 'marshal' if fast else 'pkl'))
         start_time = datetime.now()
         if not os.path.isfile(load_path):
             if self.lock:
                 self.lock.release()
             return None
         with open(load_path, 'rb') as handle:
-            contents = pickle.load(handle)
+            contents = (marshal if fast else pickle).load(handle)
             handle.close()
             end_time = datetime.now()
             duration =  end_time - start_time
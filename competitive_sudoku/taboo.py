@@ -0,0 +1,86 @@
+#  (C) Copyright Wieger Wesselink 2021. Distributed under the GPL-3.0-or-later
+#  Software License, (See accompanying file LICENSE or copy at
+#  https://www.gnu.org/licenses/gpl-3.0.txt)
+
+import time
+from typing import Dict, List, Optional
+from competitive_sudoku.solver import SolutionWitness, solve_bounded
+from competitive_sudoku.sudoku import Move, SudokuBoard
+from competitive_sudoku.zobrist import ZobristKeys
+
+SAFE, TABOO, UNKNOWN = 'safe', 'taboo', 'unknown'  # the labels of a move
+
+
+class TabooPredictor(object):
+    """
+    Predicts which moves the oracle will declare taboo, i.e. after which the sudoku has no solution. Every move is
+    checked with constraint propagation and a search with a small node budget, and labeled SAFE, TABOO or UNKNOWN.
+
+    The proved labels are stored under the Zobrist hash of the board after the move, so they are valid in every later
+    turn. The last solution that was found is kept in a SolutionWitness as well: a move that agrees with it is SAFE
+    without a search.
+    """
+
+    def __init__(self, max_nodes: int = 100, max_table_size: int = 100000):
+        """
+        @param max_nodes: The node budget of the search of a single move.
+        @param max_table_size: The table of proved labels is cleared when it grows beyond this number of entries.
+        """
+        self.max_nodes = max_nodes
+        self.max_table_size = max_table_size
+        self.table: Dict[int, bool] = {}  # the hash of a board -> whether it has a solution
+        self.witness = SolutionWitness()
+
+    def screen(self, board: SudokuBoard, moves: List[Move], time_limit: float, position_hash: Optional[int] = None) -> List[str]:
+        """
+        Labels moves in the given order until the time limit is reached, the remaining moves are UNKNOWN.
+        @param board: A sudoku board, it is restored to its original contents before returning.
+        @param moves: Moves that do not conflict with a filled square of board.
+        @param time_limit: The time in seconds that may be spent.
+        @param position_hash: The Zobrist hash of board, if it is known already.
+        @return: The labels of the moves.
+        """
+        deadline = time.perf_counter() + time_limit
+        N = board.N
+        keys = ZobristKeys.for_size(N).keys
+        if position_hash is None:
+            position_hash = ZobristKeys.for_size(N).hash(board)
+        if len(self.table) > self.max_table_size:
+            self.table.clear()
+        witness = self.witness
+        agrees = witness.agrees_with(board)
+        labels = []
+        for move in moves:
+            k = move.i * N + move.j
+            key = position_hash ^ keys[k][move.value]
+            solvable = self.table.get(key)
+            if solvable is None and agrees and witness.solution[k] == move.value:
+                solvable = True
+            if solvable is None and time.perf_counter() < deadline:
+                board.squares[k] = move.value
+                try:
+                    solvable, solution = solve_bounded(board, self.max_nodes, witness.solution, deadline)
+                finally:
+                    board.squares[k] = SudokuBoard.empty
+                if solvable is not None:
+                    self.table[key] = solvable
+                if solution is not None:
+                    # a solution after the move is a solution of the board as well
+                    witness.solution = solution
+                    agrees = True
+            labels.append(UNKNOWN if solvable is None else SAFE if solvable else TABOO)
+        return labels
+
+    def export_state(self) -> dict:
+        """
+        @return: The proved labels and the last solution, in a form that can be saved with marshal.
+        """
+        return {'table': self.table, 'solution': self.witness.solution}
+
+    def import_state(self, state: Optional[dict]) -> None:
+        """
+        Restores the output of export_state, e.g. of a previous turn.
+        """
+        if state:
+            self.table = state['table']
+            self.witness.solution = state['solution']
@@ -0,0 +1,164 @@
+#  (C) Copyright Wieger Wesselink 2021. Distributed under the GPL-3.0-or-later
+#  Software License, (See accompanying file LICENSE or copy at
+#  https://www.gnu.org/licenses/gpl-3.0.txt)
+
+"""
+A vectorized view of a sudoku position, which generates and scores all moves in a single pass over a boolean
+candidate tensor instead of a loop over the empty squares. It requires numpy, which is optional: use available() to
+check whether it can be used, the SearchEngine and the baseline players fall back to their own move generation.
+"""
+
+from typing import Iterable, List, Tuple
+from competitive_sudoku.sudoku import Move, SudokuBoard
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+points_rule = (0, 1, 3, 7)  # the relation between the regions completed and the points gotten
+
+
+def available() -> bool:
+    """
+    @return: True if numpy is installed, i.e. if a CandidateTensor can be created.
+    """
+    return np is not None
+
+
+class CandidateTensor(object):
+    """
+    The candidate values of all squares of a position as a boolean tensor of shape (N, N, N): candidates[i, j, v - 1]
+    is True if square (i, j) is empty, the value v does not occur in its row, its column and its block, and the move
+    (i, j, v) has not been declared taboo. It is derived from the missing values and the number of empty squares of
+    every region, which are updated for a batch of moves at once.
+    """
+
+    def __init__(self, board: SudokuBoard, taboo_moves: Iterable[Tuple[int, int, int]] = ()):
+        """
+        @param board: A sudoku board.
+        @param taboo_moves: The moves (i, j, value) that were declared taboo.
+        """
+        if np is None:
+            raise RuntimeError('The candidate tensor requires numpy.')
+        m, n, N = board.m, board.n, board.N
+        self.N = N
+        squares = np.array(board.squares, dtype=np.int64).reshape(N, N)
+        indices = np.arange(N)
+        # the block number of every square, numbered as in SearchEngine.block_number
+        self.blocks = (indices[:, None] // m) * m + indices[None, :] // n
+        self.empty = squares == SudokuBoard.empty
+        filled_i, filled_j = np.nonzero(~self.empty)
+        values = squares[filled_i, filled_j] - 1
+        # xxx_missing[r, v - 1] is True if the value v is missing in region r
+        self.row_missing = np.ones((N, N), dtype=bool)
+        self.col_missing = np.ones((N, N), dtype=bool)
+        self.blk_missing = np.ones((N, N), dtype=bool)
+        self.row_missing[filled_i, values] = False
+        self.col_missing[filled_j, values] = False
+        self.blk_missing[self.blocks[filled_i, filled_j], values] = False
+        self.row_empties = self.empty.sum(axis=1)
+        self.col_empties = self.empty.sum(axis=0)
+        self.blk_empties = np.bincount(self.blocks[self.empty], minlength=N)
+        self.taboo = np.zeros((N, N, N), dtype=bool)
+        for i, j, value in taboo_moves:
+            self.taboo[i, j, value - 1] = True
+        self.update_candidates()
+
+    def update_candidates(self) -> None:
+        """
+        Recomputes the candidate tensor from the missing values of the regions.
+        """
+        self.candidates = (self.empty[:, :, None] & self.row_missing[:, None, :] & self.col_missing[None, :, :] &
+                           self.blk_missing[self.blocks] & ~self.taboo)
+
+    def batch(self, moves: Iterable[Tuple[int, int, int]]):
+        """
+        @return: The rows, the columns, the value indices and the blocks of the moves as arrays.
+        """
+        moves = np.array(list(moves), dtype=np.int64).reshape(-1, 3)
+        rows, cols, values = moves[:, 0], moves[:, 1], moves[:, 2] - 1
+        return rows, cols, values, self.blocks[rows, cols]
+
+    def make_moves(self, moves: Iterable[Tuple[int, int, int]]) -> None:
+        """
+        Plays a batch of moves. The moves must be on different empty squares, and together they must not put a value
+        twice in a region.
+        @param moves: The moves as triples (i, j, value).
+        """
+        rows, cols, values, blks = self.batch(moves)
+        self.empty[rows, cols] = False
+        self.row_missing[rows, values] = False
+        self.col_missing[cols, values] = False
+        self.blk_missing[blks, values] = False
+        np.subtract.at(self.row_empties, rows, 1)
+        np.subtract.at(self.col_empties, cols, 1)
+        np.subtract.at(self.blk_empties, blks, 1)
+        self.update_candidates()
+
+    def unmake_moves(self, moves: Iterable[Tuple[int, int, int]]) -> None:
+        """
+        Cancels a batch of moves that was played with make_moves.
+        @param moves: The moves as triples (i, j, value).
+        """
+        rows, cols, values, blks = self.batch(moves)
+        self.empty[rows, cols] = True
+        self.row_missing[rows, values] = True
+        self.col_missing[cols, values] = True
+        self.blk_missing[blks, values] = True
+        np.add.at(self.row_empties, rows, 1)
+        np.add.at(self.col_empties, cols, 1)
+        np.add.at(self.blk_empties, blks, 1)
+        self.update_candidates()
+
+    def scored_moves(self, points_weight: float = 2, using_heuristics: bool = True):
+        """
+        Computes the legal moves with their points and their score, in the order of the squares and the values.
+        @param points_weight: The weight of the points of a move in its score.
+        @param using_heuristics: If True, the parity heuristic is added to the score of a move.
+        @return: The arrays (rows, columns, values, points, scores). The scores equal those of SearchEngine.evaluate.
+        """
+        rows, cols, values = np.nonzero(self.candidates)
+        blks = self.blocks[rows, cols]
+        # the number of empty squares that are left in the regions of a move after it is played
+        empties_left = (self.row_empties[rows] - 1, self.col_empties[cols] - 1, self.blk_empties[blks] - 1)
+        completed = sum((left == 0).astype(np.int64) for left in empties_left)
+        points = np.array(points_rule)[completed]
+        scores = points_weight * points.astype(np.float64)
+        if using_heuristics:
+            # the parity heuristic of calculate_heuristic_score
+            parity = [np.where(left % 2 == 0, 1 / (left + 1), -1 / np.maximum(left, 1)) for left in empties_left]
+            scores = (parity[0] + parity[1] + parity[2]) / 3 + scores
+        return rows, cols, values + 1, points, scores
+
+    @staticmethod
+    def to_moves(rows, cols, values) -> List[Move]:
+        """
+        @return: The moves of the given arrays of rows, columns and values.
+        """
+        return [Move(i, j, value) for i, j, value in zip(rows.tolist(), cols.tolist(), values.tolist())]
+
+    def legal_moves(self) -> List[Move]:
+        """
+        @return: All moves that do not conflict with a filled square and that have not been declared taboo.
+        """
+        rows, cols, values = np.nonzero(self.candidates)
+        return self.to_moves(rows, cols, values + 1)
+
+    def ordered_moves(self, points_weight: float = 2, using_heuristics: bool = True) -> List[Move]:
+        """
+        @return: The legal moves sorted by their score, the best first. Moves with equal scores keep their order.
+        """
+        rows, cols, values, _, scores = self.scored_moves(points_weight, using_heuristics)
+        order = np.argsort(-scores, kind='stable')
+        return self.to_moves(rows[order], cols[order], values[order])
+
+    def greedy_moves(self) -> List[Move]:
+        """
+        @return: The legal moves that get the most points.
+        """
+        rows, cols, values, points, _ = self.scored_moves(using_heuristics=False)
+        if not len(points):
+            return []
+        best = points == points.max()
+        return self.to_moves(rows[best], cols[best], values[best])
@@ -0,0 +1,58 @@
+#  (C) Copyright Wieger Wesselink 2021. Distributed under the GPL-3.0-or-later
+#  Software License, (See accompanying file LICENSE or copy at
+#  https://www.gnu.org/licenses/gpl-3.0.txt)
+
+import random
+from competitive_sudoku.sudoku import SudokuBoard
+
+
+class ZobristKeys(object):
+    """
+    Random 64 bit keys for every (square, value) pair of a board of a given size. The hash of a position is the
+    exclusive or of the keys of its filled squares, so it can be updated incrementally when a move is played or undone.
+    """
+
+    _cache = {}
+
+    def __init__(self, N: int, seed: int = 2021):
+        """
+        Constructs the keys for a board with N * N squares.
+        @param N: The number of values of the board.
+        @param seed: The seed of the random generator, such that keys are identical between runs and processes.
+        """
+        rng = random.Random(seed * 1000 + N)
+        self.N = N
+        # keys[k][value] is the key of the value on square k, keys[k][0] is 0 for empty squares
+        self.keys = [[0] + [rng.getrandbits(64) for _ in range(N)] for _ in range(N * N)]
+
+    @staticmethod
+    def for_size(N: int) -> 'ZobristKeys':
+        """
+        Returns the shared keys for boards with N values.
+        @param N: The number of values of the board.
+        """
+        keys = ZobristKeys._cache.get(N)
+        if keys is None:
+            keys = ZobristKeys._cache[N] = ZobristKeys(N)
+        return keys
+
+    def key(self, k: int, value: int) -> int:
+        """
+        @param k: A square index in the range [0, ..., N * N)
+        @param value: A value in the range [1, ..., N]
+        @return: The key of the value on square k.
+        """
+        return self.keys[k][value]
+
+    def hash(self, board: SudokuBoard) -> int:
+        """
+        Computes the hash of a board from scratch.
+        @param board: A sudoku board.
+        @return: The exclusive or of the keys of all filled squares.
+        """
+        h = 0
+        keys = self.keys
+        for k, value in enumerate(board.squares):
+            if value != SudokuBoard.empty:
+                h ^= keys[k][value]
+        return h
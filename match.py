@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+
+#  (C) Copyright Wieger Wesselink 2021. Distributed under the GPL-3.0-or-later
+#  Software License, (See accompanying file LICENSE or copy at
+#  https://www.gnu.org/licenses/gpl-3.0.txt)
+
+"""
+Script for playing a match between two agents that stops as soon as the result is decided.
+
+The games are played in pairs: both games of a pair start from the same board, and each agent moves first once. The
+boards are taken in turn from the given board files, or from a binary corpus. The match stops when the sequential
+probability ratio test decides between elo0 and elo1, or, with --stop elo, when the confidence interval of the Elo
+difference no longer contains 0. In both cases it stops after at most --max-pairs pairs.
+
+Typical usage:
+
+    python match.py --first team6_A2 --second team6_A1 --time 0.5 --elo0 0 --elo1 50
+    python match.py --first team6_A3 --second team6_A2 --corpus boards.sdkc --stop elo --confidence 0.9
+"""
+
+import argparse
+import importlib
+import os
+import platform
+import tempfile
+from pathlib import Path
+from typing import Iterator, List, Optional
+from competitive_sudoku.events import EventStream, JsonlSink, NullSink
+from competitive_sudoku.oracle import CachedOracle, Oracle, create_oracle
+from competitive_sudoku.records import Corpus
+from competitive_sudoku.sprt import SPRT, elo_interval
+from competitive_sudoku.sudoku import SudokuBoard, load_sudoku
+from competitive_sudoku.sudokuai import SudokuAI
+from simulate_game import simulate_game
+
+
+def match_boards(board_files: List[str], corpus_file: str) -> Iterator[SudokuBoard]:
+    """
+    @return: The boards of the match, repeated endlessly.
+    """
+    if corpus_file:
+        with Corpus(corpus_file) as corpus:
+            boards = list(corpus.boards())
+    else:
+        boards = [load_sudoku(filename) for filename in board_files]
+    while True:
+        yield from boards
+
+
+def play_game(board: SudokuBoard, player1: SudokuAI, player2: SudokuAI, solve_sudoku_path: str, calculation_time: float, events: EventStream, oracle: Optional[Oracle] = None) -> int:
+    """
+    Plays a single game in a fresh working directory, such that the agents do not load data that was saved in an
+    earlier game.
+    @return: The winner of the game, 1 or 2, or 0 for a draw.
+    """
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as work_dir:
+        os.chdir(work_dir)
+        try:
+            return simulate_game(board, player1, player2, solve_sudoku_path, calculation_time, events=events, oracle=oracle)
+        finally:
+            os.chdir(cwd)
+
+
+def play_pair(board: SudokuBoard, first: SudokuAI, second: SudokuAI, solve_sudoku_path: str, calculation_time: float, events: EventStream, oracle: Optional[Oracle] = None) -> float:
+    """
+    Plays two games on board, in which each agent moves first once.
+    @return: The average score of the first agent, where a win counts as 1 and a draw as 0.5.
+    """
+    score = {0: 0.5, 1: 1.0, 2: 0.0}[play_game(board, first, second, solve_sudoku_path, calculation_time, events, oracle)]
+    score += {0: 0.5, 1: 0.0, 2: 1.0}[play_game(board, second, first, solve_sudoku_path, calculation_time, events, oracle)]
+    return score / 2
+
+
+def main():
+    solve_sudoku_path = str(Path('bin\\solve_sudoku.exe' if platform.system() == 'Windows' else 'bin/solve_sudoku').resolve())
+
+    cmdline_parser = argparse.ArgumentParser(description='Script for playing a match between two agents with early stopping.')
+    cmdline_parser.add_argument('--first', help="the module name of the first agent's SudokuAI class", required=True)
+    cmdline_parser.add_argument('--second', help="the module name of the second agent's SudokuAI class", required=True)
+    cmdline_parser.add_argument('--time', help="the time (in seconds) for computing a move (default: 0.5)", type=float, default=0.5)
+    cmdline_parser.add_argument('--boards', metavar='FILE', nargs='*', help='the start positions (default: all boards in the boards directory)')
+    cmdline_parser.add_argument('--corpus', metavar='FILE', help='take the start positions from a binary board corpus')
+    cmdline_parser.add_argument('--stop', choices=['sprt', 'elo'], default='sprt', help='the stopping rule (default: sprt)')
+    cmdline_parser.add_argument('--elo0', type=float, default=0, help='the Elo difference of the null hypothesis of the SPRT (default: 0)')
+    cmdline_parser.add_argument('--elo1', type=float, default=50, help='the Elo difference of the alternative hypothesis of the SPRT (default: 50)')
+    cmdline_parser.add_argument('--alpha', type=float, default=0.05, help='the false positive rate of the SPRT (default: 0.05)')
+    cmdline_parser.add_argument('--beta', type=float, default=0.05, help='the false negative rate of the SPRT (default: 0.05)')
+    cmdline_parser.add_argument('--confidence', type=float, default=0.95, help='the confidence level of the Elo interval (default: 0.95)')
+    cmdline_parser.add_argument('--min-pairs', type=int, default=4, help='the number of pairs before the match may stop (default: 4)')
+    cmdline_parser.add_argument('--max-pairs', type=int, default=200, help='the maximal number of pairs (default: 200)')
+    cmdline_parser.add_argument('--oracle', choices=['executable', 'local', 'service', 'local-service'], default='executable', help='the oracle that validates the moves, see simulate_game.py (default: executable)')
+    cmdline_parser.add_argument('--oracle-cache', metavar='FILE', help='keep the cache of the oracle in this file between runs')
+    cmdline_parser.add_argument('--log', metavar='FILE', type=str, help='append the events of the games to this JSONL file')
+    args = cmdline_parser.parse_args()
+
+    board_files = args.boards or sorted(str(path) for path in Path('boards').glob('*.txt'))
+    boards = match_boards(board_files, args.corpus)
+    first = importlib.import_module(args.first + '.sudokuai').SudokuAI()
+    second = importlib.import_module(args.second + '.sudokuai').SudokuAI()
+    events = EventStream([JsonlSink(args.log) if args.log else NullSink()])
+    # every board is played at least twice, so the oracle answers are cached
+    oracle = CachedOracle(create_oracle(args.oracle, solve_sudoku_path), path=args.oracle_cache)
+
+    test = SPRT(args.elo0, args.elo1, args.alpha, args.beta)
+    decision = None
+    try:
+        while len(test.scores) < args.max_pairs:
+            test.add(play_pair(next(boards), first, second, solve_sudoku_path, args.time, events, oracle))
+            elo, lower, upper = elo_interval(test.scores, args.confidence)
+            print(f'pair {len(test.scores):4}: score {sum(test.scores) / len(test.scores):.3f}  '
+                  f'elo {elo:7.1f} [{lower:7.1f}, {upper:7.1f}]  llr {test.llr():6.2f} [{test.lower_bound:.2f}, {test.upper_bound:.2f}]')
+            if len(test.scores) < args.min_pairs:
+                continue
+            if args.stop == 'sprt':
+                decision = test.result()
+            elif lower > 0 or upper < 0:
+                decision = 'stronger' if lower > 0 else 'weaker'
+            if decision:
+                break
+    finally:
+        oracle.close()
+        events.close()
+
+    if args.stop == 'sprt':
+        verdict = {'H1': f'elo >= {args.elo1}', 'H0': f'elo <= {args.elo0}', None: 'undecided'}[decision]
+    else:
+        verdict = {'stronger': f'{args.first} is stronger', 'weaker': f'{args.first} is weaker', None: 'undecided'}[decision]
+    print(f'{args.first} vs. {args.second}: {verdict} after {2 * len(test.scores)} games')
+    statistics = oracle.statistics()
+    print(f"oracle cache: {statistics['hits']} hits, {statistics['misses']} misses, hit rate {statistics['hit_rate']:.1%}")
+
+
+if __name__ == '__main__':
+    main()
@@ -16,7 +16,7 @@ from competitive_sudoku.sudoku import GameState, SudokuBoard, Move, TabooMove, l
 from competitive_sudoku.sudokuai import SudokuAI
 
 
-def simulate_game(initial_board: SudokuBoard, human_player_number: int, AI_player: SudokuAI, solve_sudoku_path: str, time_for_human: int = 1, time_for_AI: float = 0.5) -> None:
+def simulate_game(initial_board: SudokuBoard, human_player_number: int, AI_player: SudokuAI, solve_sudoku_path: str, time_for_human: int = 1, time_for_AI: float = 0.5, ponder_share: float = 0.0) -> None:
     """
     Simulates a game between two instances of SudokuAI, starting in initial_board. The first move is played by player1.
     @param initial_board: The initial position of the game.
@@ -25,6 +25,8 @@ def simulate_game(initial_board: SudokuBoard, human_player_number: int, AI_playe
     @param solve_sudoku_path: The location of the oracle executable.
     @param time_for_AI: The time limit for AI to calculate the best move
     @param time_for_human: The time limit for human to propose a move
+    @param ponder_share: If positive, the AI ponders while you think, using at most this share of a CPU. By default it
+    does not ponder.
     """
     import copy
 
@@ -39,6 +41,11 @@ def simulate_game(initial_board: SudokuBoard, human_player_number: int, AI_playe
         lock = multiprocessing.Lock()
         AI_player.lock = lock
 
+        # the agent uses the time budget to stop its search before it is terminated
+        AI_player.time_budget = time_for_AI
+        AI_player.player_number = 3 - human_player_number
+        AI_player.ponder_share = ponder_share
+
         # use shared variables to store the best move
         AI_player.best_move = manager.list([0, 0, 0])
 
@@ -48,6 +55,11 @@ def simulate_game(initial_board: SudokuBoard, human_player_number: int, AI_playe
             i, j, value = 0, 0, 0
             if player_number == human_player_number:
                 print(f"-----------------------------\nIt's your turn.")
+                # the AI searches ahead while you think
+                ponder_process = None
+                if ponder_share > 0:
+                    ponder_process = multiprocessing.Process(target=AI_player.ponder, args=(game_state,))
+                    ponder_process.start()
                 print(f"please propose a move in the form of <i j value> within {time_for_human} seconds. NB: Current "
                       f"taboo moves are {[(mv.i, mv.j, mv.value) for mv in game_state.taboo_moves]}")
 
@@ -67,6 +79,14 @@ def simulate_game(initial_board: SudokuBoard, human_player_number: int, AI_playe
                 # finally:
                 #     signal.alarm(0)  # cancel alarm
 
+                # stop pondering once the move is known
+                if ponder_process:
+                    lock.acquire()
+                    ponder_process.terminate()
+                    lock.release()
+                    # the AI saves without the lock, it must have stopped before its own turn starts
+                    ponder_process.join()
+
             else:
                 print(f'-----------------------------\nYour AI opponent is thinking...')
                 AI_player.best_move[0] = 0
@@ -2,11 +2,10 @@
 #  Software License, (See accompanying file LICENSE or copy at
 #  https://www.gnu.org/licenses/gpl-3.0.txt)
 
-import re
-from competitive_sudoku.execute import solve_sudoku
-from competitive_sudoku.sudoku import GameState, Move
+import random
+from competitive_sudoku.baseline import baseline_move
+from competitive_sudoku.sudoku import GameState
 import competitive_sudoku.sudokuai
-import platform
 
 
 class SudokuAI(competitive_sudoku.sudokuai.SudokuAI):
@@ -14,23 +13,9 @@ class SudokuAI(competitive_sudoku.sudokuai.SudokuAI):
     Sudoku AI that computes a move for a given sudoku configuration.
     """
 
-    def __init__(self):
-        super().__init__()
-        self.solve_sudoku_path = 'bin\\solve_sudoku.exe' if platform.system() == 'Windows' else 'bin/solve_sudoku'  # N.B. this path is set from outside
-
-    # Uses solve_sudoku to compute a random move.
+    # Computes a random move in the same way as solve_sudoku --random, without running it.
     def compute_best_move(self, game_state: GameState) -> None:
-        board = game_state.board
-        board_text = str(board)
-        options = '--random'
-        taboo_moves = ' '.join(f'{move.i} {move.j} {move.value}' for move in game_state.taboo_moves)
-        if taboo_moves:
-            options += f' --taboo="{taboo_moves}"'
-        output = solve_sudoku(self.solve_sudoku_path, board_text, options)
-        m = re.search(r"Generated move \((\d+),(\d+)\)", output)
-        if not m:
-            raise RuntimeError('Could not generate a random move:\n' + output)
-        k = int(m.group(1))
-        value = int(m.group(2))
-        i, j = board.f2rc(k)
-        self.propose_move(Move(i, j, value))
+        # every move is computed in a new process, so the generator is seeded from the OS for every move instead of
+        # continuing the state of the parent
+        rng = random.Random()
+        self.propose_move(baseline_move(game_state.board, game_state.taboo_moves, False, rng))
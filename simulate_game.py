@@ -11,7 +11,11 @@ import platform
 import re
 import time
 from pathlib import Path
+from typing import Optional, Tuple
+from competitive_sudoku.events import ConsoleSink, EventStream, JsonlSink, NullSink
 from competitive_sudoku.execute import solve_sudoku
+from competitive_sudoku.oracle import CachedOracle, ExecutableOracle, Oracle, create_oracle
+from competitive_sudoku.profiling import GameProfiler, run_profiled
 from competitive_sudoku.sudoku import GameState, SudokuBoard, Move, TabooMove, load_sudoku_from_text
 from competitive_sudoku.sudokuai import SudokuAI
 
@@ -34,7 +38,7 @@ def check_oracle(solve_sudoku_path: str) -> None:
         print(output)
 
 
-def simulate_game(initial_board: SudokuBoard, player1: SudokuAI, player2: SudokuAI, solve_sudoku_path: str, calculation_time: float = 0.5) -> None:
+def simulate_game(initial_board: SudokuBoard, player1: SudokuAI, player2: SudokuAI, solve_sudoku_path: str, calculation_time: float = 0.5, events: Optional[EventStream] = None, profile_dir: Optional[str] = None, oracle: Optional[Oracle] = None, ponder_share: float = 0.0, clock: Optional[Tuple[float, float]] = None) -> int:
     """
     Simulates a game between two instances of SudokuAI, starting in initial_board. The first move is played by player1.
     @param initial_board: The initial position of the game.
@@ -42,15 +46,69 @@ def simulate_game(initial_board: SudokuBoard, player1: SudokuAI, player2: Sudoku
     @param player2: The AI of the second player.
     @param solve_sudoku_path: The location of the oracle executable.
     @param calculation_time: The amount of time in seconds for computing the best move.
+    @param events: The sinks of the events of the game. By default the game is printed to the console.
+    @param profile_dir: If set, the players compute their moves under a profiler, and the profiles are written to this
+    directory. At the end of the game they are merged per player.
+    @param oracle: The oracle that validates the moves. By default the solve_sudoku program is run for every move.
+    @param ponder_share: If positive, the agents ponder during the turn of the opponent, using at most this share of a
+    CPU, see SudokuAI.ponder.
+    @param clock: If set, the game is played with a game clock instead of a fixed time per move: the total time in
+    seconds of each player, and the increment that is added after every move. A move takes as long as the agent needs,
+    at most the time left on its clock. The clock runs from the start of the move process until the process stops,
+    without the time to start the process and to stop the pondering opponent. A player that is still computing when
+    its clock runs out loses the game. The calculation_time is ignored then.
+    @return: The winner of the game, 1 or 2, or 0 for a draw.
     """
     import copy
     N = initial_board.N
 
+    if events is None:
+        events = EventStream([ConsoleSink()])
+    if oracle is None:
+        oracle = ExecutableOracle(solve_sudoku_path)
     game_state = GameState(initial_board, copy.deepcopy(initial_board), [], [], [0, 0])
-    move_number = 0
+    if clock is not None:
+        game_state.clock = [clock[0], clock[0]]
+        game_state.increment = clock[1]
     number_of_moves = initial_board.squares.count(SudokuBoard.empty)
-    print('Initial state')
-    print(game_state)
+    events.emit('start', render=lambda: str(game_state), board=str(initial_board),
+                players=[type(player1).__module__, type(player2).__module__], calculation_time=calculation_time,
+                clock=None if clock is None else list(clock))
+
+    profiler = GameProfiler(profile_dir) if profile_dir else None
+    try:
+        return simulate_moves(game_state, number_of_moves, player1, player2, oracle, calculation_time, events, profiler, ponder_share)
+    finally:
+        if profiler:
+            profiler.merge()
+
+
+def move_statistics(stats: dict) -> dict:
+    """
+    @return: The statistics that an agent reported, extended with the derived nodes per second and hit rate.
+    """
+    stats = dict(stats)
+    if stats.get('time') and 'nodes' in stats:
+        stats['nps'] = round(stats['nodes'] / stats['time'])
+    if stats.get('tt_probes'):
+        stats['tt_hit_rate'] = round(stats.get('tt_hits', 0) / stats['tt_probes'], 4)
+    return stats
+
+
+def simulate_moves(game_state: GameState, number_of_moves: int, player1: SudokuAI, player2: SudokuAI, oracle: Oracle, calculation_time: float, events: EventStream, profiler: Optional[GameProfiler], ponder_share: float = 0.0) -> int:
+    """
+    Plays the moves of a game that is started by simulate_game.
+    @param oracle: The oracle that validates the moves.
+    @param events: The sinks of the events of the game.
+    @param profiler: The profiles of the moves, or None if the players are not profiled.
+    @param ponder_share: The share of a CPU that the agents may use to ponder, or 0 if they do not ponder.
+    @return: The winner of the game, 1 or 2, or 0 for a draw.
+    """
+    move_number = 0
+
+    def finish(result: str, winner: int) -> int:
+        events.emit('end', result=result, winner=winner, scores=list(game_state.scores), oracle=oracle.statistics())
+        return winner
 
     with multiprocessing.Manager() as manager:
         # use a lock to protect assignments to best_move
@@ -58,45 +116,99 @@ def simulate_game(initial_board: SudokuBoard, player1: SudokuAI, player2: Sudoku
         player1.lock = lock
         player2.lock = lock
 
+        # the agents use the time budget to stop their search before they are terminated
+        player1.time_budget = calculation_time
+        player2.time_budget = calculation_time
+
+        # the player numbers keep the data that the agents save between turns apart
+        player1.player_number = 1
+        player2.player_number = 2
+
+        player1.ponder_share = ponder_share
+        player2.ponder_share = ponder_share
+
         # use shared variables to store the best move
         player1.best_move = manager.list([0, 0, 0])
         player2.best_move = manager.list([0, 0, 0])
 
+        # the statistics are only shared if a sink records them, otherwise reporting them costs nothing
+        player1.stats = manager.dict() if events.wants_stats else None
+        player2.stats = manager.dict() if events.wants_stats else None
+
         while move_number < number_of_moves:
             player, player_number = (player1, 1) if len(game_state.moves) % 2 == 0 else (player2, 2)
-            print(f'-----------------------------\nCalculate a move for player {player_number}')
+            opponent = player2 if player_number == 1 else player1
+            events.emit('turn', player=player_number)
+            turn_start = time.perf_counter()
             player.best_move[0] = 0
             player.best_move[1] = 0
             player.best_move[2] = 0
+            if player.stats is not None:
+                player.stats.clear()
+            if game_state.clock is not None:
+                # the agent decides how much of the time on its clock it uses, see SudokuAI.allocate_time
+                player.time_budget = game_state.clock[player_number - 1]
+            used_time = 0.0
+            out_of_time = False
             try:
-                process = multiprocessing.Process(target=player.compute_best_move, args=(game_state,))
+                if profiler:
+                    profile_path = profiler.move_profile_path(player_number, len(game_state.moves))
+                    process = multiprocessing.Process(target=run_profiled, args=(player.compute_best_move, (game_state,), profile_path))
+                else:
+                    process = multiprocessing.Process(target=player.compute_best_move, args=(game_state,))
                 process.start()
-                time.sleep(calculation_time)
+                move_start = time.perf_counter()
+                # the opponent searches ahead in the meantime, it is stopped together with the player
+                ponder_process = None
+                if ponder_share > 0:
+                    ponder_process = multiprocessing.Process(target=opponent.ponder, args=(game_state,))
+                    ponder_process.start()
+                if game_state.clock is None:
+                    time.sleep(calculation_time)
+                else:
+                    process.join(game_state.clock[player_number - 1])
+                    used_time = time.perf_counter() - move_start
+                    out_of_time = process.is_alive()
                 lock.acquire()
                 process.terminate()
+                if ponder_process:
+                    ponder_process.terminate()
+                if profiler:
+                    # wait until the profile is written, the lock is kept such that the best move cannot change anymore
+                    process.join(5)
+                    if process.is_alive():
+                        process.kill()
                 lock.release()
+                if ponder_process:
+                    # the opponent saves without the lock, it must have stopped before its own turn starts
+                    ponder_process.join()
             except Exception as err:
                 print('Error: an exception occurred.\n', err)
+            if game_state.clock is not None:
+                if out_of_time:
+                    game_state.clock[player_number - 1] = 0.0
+                    return finish(f'Player {player_number} ran out of time. Player {3-player_number} wins the game.', 3 - player_number)
+                game_state.clock[player_number - 1] = max(0.0, game_state.clock[player_number - 1] - used_time) + game_state.increment
             i, j, value = player.best_move
             best_move = Move(i, j, value)
-            print(f'Best move: {best_move}')
             player_score = 0
+            taboo = False
+            oracle_time = 0.0
             if best_move != Move(0, 0, 0):
                 if TabooMove(i, j, value) in game_state.taboo_moves:
-                    print(f'Error: {best_move} is a taboo move. Player {2-player_number} wins the game.')
-                    return
+                    return finish(f'Error: {best_move} is a taboo move. Player {3-player_number} wins the game.', 3 - player_number)
                 board_text = str(game_state.board)
                 options = f'--move "{game_state.board.rc2f(i, j)} {value}"'
-                output = solve_sudoku(solve_sudoku_path, board_text, options)
+                oracle_start = time.perf_counter()
+                output = oracle.solve(board_text, options)
+                oracle_time = time.perf_counter() - oracle_start
                 if 'Invalid move' in output:
-                    print(f'Error: {best_move} is not a valid move. Player {3-player_number} wins the game.')
-                    return
+                    return finish(f'Error: {best_move} is not a valid move. Player {3-player_number} wins the game.', 3 - player_number)
                 if 'Illegal move' in output:
-                    print(f'Error: {best_move} is not a legal move. Player {3-player_number} wins the game.')
-                    return
+                    return finish(f'Error: {best_move} is not a legal move. Player {3-player_number} wins the game.', 3 - player_number)
                 if 'has no solution' in output:
-                    print(f'The sudoku has no solution after the move {best_move}.')
                     player_score = 0
+                    taboo = True
                     game_state.moves.append(TabooMove(i, j, value))
                     game_state.taboo_moves.append(TabooMove(i, j, value))
                 if 'The score is' in output:
@@ -109,18 +221,28 @@ def simulate_game(initial_board: SudokuBoard, player1: SudokuAI, player2: Sudoku
                     else:
                         raise RuntimeError(f'Unexpected output of sudoku solver: "{output}".')
             else:
-                print(f'No move was supplied. Player {3-player_number} wins the game.')
-                return
+                return finish(f'No move was supplied. Player {3-player_number} wins the game.', 3 - player_number)
             game_state.scores[player_number-1] = game_state.scores[player_number-1] + player_score
-            print(f'Reward: {player_score}')
-            print(game_state)
+            events.emit('move', render=lambda: str(game_state), player=player_number, move=[i, j, value],
+                        reward=player_score, taboo=taboo, time=round(time.perf_counter() - turn_start, 4),
+                        oracle_time=round(oracle_time, 4), stats=move_statistics(player.stats) if player.stats is not None else None,
+                        clock=None if game_state.clock is None else [round(t, 3) for t in game_state.clock])
 
         if game_state.scores[0] > game_state.scores[1]:
-            print('Player 1 wins the game.')
+            return finish('Player 1 wins the game.', 1)
         elif game_state.scores[0] == game_state.scores[1]:
-            print('The game ends in a draw.')
-        elif game_state.scores[0] < game_state.scores[1]:
-            print('Player 2 wins the game.')
+            return finish('The game ends in a draw.', 0)
+        else:
+            return finish('Player 2 wins the game.', 2)
+
+
+def parse_clock(text: str) -> Tuple[float, float]:
+    """
+    Parses a time control of the form TOTAL+INCREMENT, e.g. 60+0.2, or TOTAL.
+    @return: The total time and the increment in seconds.
+    """
+    total, _, increment = text.partition('+')
+    return float(total), float(increment or 0)
 
 
 def main():
@@ -130,8 +252,16 @@ def main():
     cmdline_parser.add_argument('--first', help="the module name of the first player's SudokuAI class (default: random_player)", default='random_player')
     cmdline_parser.add_argument('--second', help="the module name of the second player's SudokuAI class (default: random_player)", default='random_player')
     cmdline_parser.add_argument('--time', help="the time (in seconds) for computing a move (default: 0.5)", type=float, default=0.5)
+    cmdline_parser.add_argument('--clock', metavar='TOTAL+INC', type=parse_clock, help='play with a game clock instead of --time, e.g. 60+0.2 for 60 seconds per player and 0.2 seconds added after every move, a player that is still computing when its clock runs out loses the game')
     cmdline_parser.add_argument('--check', help="check if the solve_sudoku program works", action='store_true')
     cmdline_parser.add_argument('--board', metavar='FILE', type=str, help='a text file containing the start position')
+    cmdline_parser.add_argument('--profile', metavar='DIR', type=str, help='profile the computation of the moves and write the profiles to this directory')
+    cmdline_parser.add_argument('--log', metavar='FILE', type=str, help='append the events of the game, with the search statistics of every move, to this JSONL file')
+    cmdline_parser.add_argument('--oracle', choices=['executable', 'local', 'service', 'local-service'], default='executable',
+                                help='run solve_sudoku for every move, use a Python stand-in, or keep worker processes that run either of them (default: executable)')
+    cmdline_parser.add_argument('--oracle-cache', metavar='FILE', type=str, help='cache the answers of the oracle in this file between runs')
+    cmdline_parser.add_argument('--ponder', metavar='SHARE', type=float, default=0.0, help='let the agents search during the turn of the opponent, using at most this share of a CPU (default: 0, no pondering)')
+    cmdline_parser.add_argument('--quiet', help="do not print the game to the console", action='store_true')
     args = cmdline_parser.parse_args()
 
     if args.check:
@@ -161,16 +291,22 @@ def main():
     module2 = importlib.import_module(args.second + '.sudokuai')
     player1 = module1.SudokuAI()
     player2 = module2.SudokuAI()
-    if args.first in ('random_player', 'greedy_player'):
-        player1.solve_sudoku_path = solve_sudoku_path
-    if args.second in ('random_player', 'greedy_player'):
-        player2.solve_sudoku_path = solve_sudoku_path
-
 
     # for i in range(5):
     #     print('Iteration: ' + str(i))
     #     simulate_game(board, player1, player2, solve_sudoku_path=solve_sudoku_path, calculation_time=args.time)
-    simulate_game(board, player1, player2, solve_sudoku_path=solve_sudoku_path, calculation_time=args.time)
+    sinks = [NullSink() if args.quiet else ConsoleSink()]
+    if args.log:
+        sinks.append(JsonlSink(args.log))
+    events = EventStream(sinks)
+    oracle = create_oracle(args.oracle, solve_sudoku_path)
+    if args.oracle_cache:
+        oracle = CachedOracle(oracle, path=args.oracle_cache)
+    try:
+        simulate_game(board, player1, player2, solve_sudoku_path=solve_sudoku_path, calculation_time=args.time, events=events, profile_dir=args.profile, oracle=oracle, ponder_share=args.ponder, clock=args.clock)
+    finally:
+        oracle.close()
+        events.close()
 
 
 if __name__ == '__main__':
@@ -2,193 +2,107 @@
 #  Software License, (See accompanying file LICENSE or copy at
 #  https://www.gnu.org/licenses/gpl-3.0.txt)
 
-import random
 import time
-from competitive_sudoku.sudoku import GameState, Move, SudokuBoard, TabooMove
+from competitive_sudoku.sudoku import GameState
+from competitive_sudoku.engine import SearchEngine
+from competitive_sudoku.search import IterativeDeepening, SearchTimeout
 import competitive_sudoku.sudokuai
-import copy
+
 
 class SudokuAI(competitive_sudoku.sudokuai.SudokuAI):
     """
     Sudoku AI that computes a move for a given sudoku configuration.
     """
 
+    parameters = {
+        'safety_margin': (0.1, 0.02, 0.3),  # the fraction of the time budget that is kept in reserve
+        'partial_usage': (0.5, 0.1, 0.9),  # see IterativeDeepening
+        'propagation': (0, 0, 1),  # if 1, the moves are generated from candidates reduced by constraint propagation
+    }
+
     def __init__(self):
         super().__init__()
+        self.engine = None
+
+    def minimax(self, depth: int, max_player: bool):
+        """
+        plain minimax search without pruning
+        :param depth: the depth of the minimax tree
+        :param max_player: if it is maximizer
+        :return: the aggregated score if choose this move considering possible future moves
+        """
+        engine = self.engine
+        engine.controller.tick()
+        if depth == 0:
+            return 0
+
+        moves = engine.get_all_legal_moves()
+        if not moves:
+            return 0
+
+        if max_player:
+            max_eval = -float('inf')
+            for move in moves:
+                cur_move_score = engine.move_and_calculate_score(move, True)
+                # aggregate scores
+                eval = cur_move_score + self.minimax(depth - 1, False)
+                max_eval = max(max_eval, eval)
+                # reset | pop move from board
+                engine.cancel_move(move)
+            return max_eval
+
+        else:
+            min_eval = float('inf')
+            for move in moves:
+                cur_move_score = engine.move_and_calculate_score(move, False)
+                # aggregate scores
+                eval = cur_move_score + self.minimax(depth - 1, True)
+                min_eval = min(min_eval, eval)
+                # reset | pop move from board
+                engine.cancel_move(move)
+            return min_eval
 
     # N.B. This is a very naive implementation.
     def compute_best_move(self, game_state: GameState) -> None:
-        N = game_state.board.N
-        n = game_state.board.n
-        m = game_state.board.m
-
-        def calculate_move_score(board, i, j, value, maximizing):
-            """"
-            The evaluation function evaluates the score in the game that will be obtained by the proposed move (i,j,value)
-            """
-            # Add our hypothetical move to the current situation on the board
-            board.put(i, j, value)
-
-            # Create variables for each region that could be completed by a move (row, column, region)
-            # Where 1 = filled and 0 = not filled. All initialized to 1.
-            row = 1
-            column = 1
-            block = 1
-
-            # CHECK ROW: loop through all k values in row i
-            for k in range(N):
-                # Check if we find an empty cell in row i column k
-                if board.get(i, k) == SudokuBoard.empty:
-                    row = 0
-                    break
-
-            # CHECK COLUMN: loop through all l values in column j
-            for l in range(N):
-                # Check if we find an empty cell in column j row l
-                if board.get(l, j) == SudokuBoard.empty:
-                    column = 0
-                    break
-
-            # CHECK BLOCK: Loop through rows (l) and columns (k) inside
-            # Find the coordinates of the upper left corner of the block in which (i,j) is positioned
-            block_position_verti = i // m * m
-            block_position_hori = j // n * n
-
-            for l in range(block_position_verti, block_position_verti + m):
-                for k in range(block_position_hori, block_position_hori + n):
-                    if board.get(l, k) == SudokuBoard.empty:
-                        block = 0
-                        break
-
-            # the total score in the game earned with this move
-            score = 0
-            regions_filled = row + column + block
-            if maximizing:
-                # Calculate the total score in the game for current move and return the score
-                if regions_filled == 0:
-                    score = 0
-                elif regions_filled == 1:
-                    score = 1
-                elif regions_filled == 2:
-                    score = 3
-                elif regions_filled == 3:
-                    score = 7
-
-            if not maximizing:
-                # Calculate the negated total score in the game for current move of the opposition
-                if regions_filled == 0:
-                    score = 0
-                elif regions_filled == 1:
-                    score = -1
-                elif regions_filled == 2:
-                    score = -3
-                elif regions_filled == 3:
-                    score = -7
-
-            return score
-
-        """ Returns all legal moves given a board """
-        def get_all_legal_moves(board):
-
-            # Generate all moves that are possible
-            possible_moves = [Move(i, j, value) for i in range(N) for j in range(N) for value in range(1, N + 1) if
-                              board.get(i, j) == SudokuBoard.empty and not TabooMove(i, j,
-                                                                                     value) in game_state.taboo_moves]
-            # filter out illegal moves
-            all_moves_legal = []
+        start_time = time.perf_counter()
+        # a small endgame is solved exactly, there is no need to search it
+        if self.propose_proved_move(game_state):
+            return
 
-            for move in possible_moves:
-                i = move.i
-                j = move.j
-                value = move.value
-                legal = True
+        # the score of a move is the number of points it gets, without heuristics
+        engine = self.engine = SearchEngine(game_state, using_heuristics=False, points_weight=1, propagation=bool(self.propagation))
 
-                # Check if value already in row
-                for k in range(N):
-                    if game_state.board.get(i, k) == value:
-                        legal = False
-                        break
-
-                if legal:
-                    # Check if value already in column
-                    for l in range(N):
-                        if board.get(l, j) == value:
-                            legal = False
-                            break
-
-                if legal:
-                    # Find the coordinates of the upper left corner of the block in which (i,j) is positioned
-                    block_position_verti = i // m * m
-                    block_position_hori = j // n * n
-
-                    # Loop through rows (l) and columns (k) inside
-                    for l in range(block_position_verti, block_position_verti + m):
-                        for k in range(block_position_hori, block_position_hori + n):
-                            if board.get(l, k) == value:
-                                legal = False
-                                break
-
-                # If all checks are passed add the move to the list of legal moves
-                if legal:
-                    all_moves_legal.append(move)
-
-            return all_moves_legal
-
-        def minimax(board, depth, max_player):
-
-            if depth == 0:
-                return 0
-
-            moves = get_all_legal_moves(board)
-            if not moves:
-                return 0
-
-            if max_player:
-                max_eval = -float('inf')
-                for move in moves:
-                    i, j, value = move.i, move.j, move.value
-                    # moved when implementing calculate_move_score
-                    cur_move_score = calculate_move_score(board, i, j, value, True)
-                    # aggregate scores
-                    eval = cur_move_score + minimax(board, depth-1, False)
-                    max_eval = max(max_eval, eval)
-                    # reset | pop move from board
-                    board.put(i, j, 0)
-                return max_eval
-
-            else:
-                min_eval = float('inf')
-                for move in moves:
-                    i, j, value = move.i, move.j, move.value
-                    # moved when implementing calculate_move_score
-                    cur_move_score = calculate_move_score(board, i, j, value, False)
-                    # aggregate scores
-                    eval = cur_move_score + minimax(board, depth-1, True)
-                    min_eval = min(min_eval, eval)
-                    # reset | pop move from board
-                    board.put(i, j, 0)
-                return min_eval
-
-        #get board and set as initial best move, the first of legal moves
-        board = game_state.board
-        moves = get_all_legal_moves(board)
+        # the legal moves sorted by their points, the first is proposed before searching
+        moves = engine.root_moves()
         best_move = moves[0]
         self.propose_move(best_move)
 
-        for depth in range(1, 20):
+        # the controller stops the iterative deepening before the time budget is used up
+        controller = engine.controller = IterativeDeepening(self.allocate_time(game_state, len(moves)), safety_margin=self.safety_margin, check_interval=engine.check_interval(),
+                                                           partial_usage=self.partial_usage, start_time=start_time)
+        for depth in controller.depths(1, len(engine.positions_of_empty_cells)):
             #print(depth, '\t')  # usually can search for less than 5 layers
             max_eval = -float('inf')
-            for move in moves:
-                i, j, value = move.i, move.j, move.value
-                cur_move_score = calculate_move_score(board, i, j, value, True)
-                eval = cur_move_score + minimax(board, depth - 1, False)
-                if eval > max_eval:
-                    max_eval = eval
-                    best_move = move
-                board.put(i, j, 0)
-            self.propose_move(best_move)
+            try:
+                for move in moves:
+                    cur_move_score = engine.move_and_calculate_score(move, True)
+                    eval = cur_move_score + self.minimax(depth - 1, False)
+                    engine.cancel_move(move)
+                    if eval > max_eval:
+                        max_eval = eval
+                        best_move = move
+                        # the previous best move is searched first, so a better move is safe to play even if this
+                        # iteration is not finished
+                        self.propose_move(best_move)
+            except SearchTimeout:
+                engine.unwind()
+                break
+            # search the best move first in the next iteration
+            moves.remove(best_move)
+            moves.insert(0, best_move)
+            self.report_stats(nodes=controller.nodes, depth=depth, time=controller.elapsed())
 
 #----------------------------#
 # the order of playing matters for small-size game board, e.g. easy-2x2.txt
 # compared with greedy_player, the minimax agent considers more turns, so it usually get fewer scores in the early stage, but overtake the opponent later
-# the scores are very close when losing to greedy_player
\ No newline at end of file
+# the scores are very close when losing to greedy_player
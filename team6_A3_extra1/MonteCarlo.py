@@ -3,8 +3,10 @@ from collections import defaultdict
 
 
 class MonteCarloTreeSearchNode:
-    def __init__(self, state, parent=None, parent_action=None):
+    def __init__(self, state, parent=None, parent_action=None, c_param=0.1, sample_size=100):
         self.state = state
+        self.c_param = c_param  # the exploration weight of the tree policy
+        self.sample_size = sample_size  # the number of moves the rollout policy chooses from
         self.parent = parent
         self.parent_action = parent_action
         self.children = []
@@ -49,14 +51,16 @@ class MonteCarloTreeSearchNode:
         action = self._untried_actions.pop()
         next_state = self.state.move(action)
         child_node = MonteCarloTreeSearchNode(
-            next_state, parent=self, parent_action=action)
+            next_state, parent=self, parent_action=action, c_param=self.c_param, sample_size=self.sample_size)
 
         self.children.append(child_node)
         # print(f"\t action = {[action.i, action.j, action.value]}")
         return child_node
 
     # selection
-    def best_child(self, c_param=0.1):
+    def best_child(self, c_param=None):
+        if c_param is None:
+            c_param = self.c_param
         choices_weights = [(c.q() / c.n()) + c_param * np.sqrt((2 * np.log(self.n()) / c.n())) for c in self.children]
         return self.children[np.argmax(choices_weights)]
 
@@ -77,7 +81,7 @@ class MonteCarloTreeSearchNode:
         # the policy should quickly get the game result, but quick policy usually can not make it converge quickly
         # try greedy policy
         import random
-        sample_size = min(len(possible_moves), 100)
+        sample_size = min(len(possible_moves), self.sample_size)
         sample = random.sample(possible_moves, sample_size)
         max_score = 0
         max_move = sample[0]
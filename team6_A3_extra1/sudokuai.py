@@ -5,6 +5,8 @@
 from team6_A3_extra1.MonteCarlo import MonteCarloTreeSearchNode
 from team6_A3_extra1.State import State
 from competitive_sudoku.sudoku import GameState, Move, SudokuBoard, TabooMove
+from competitive_sudoku.engine import SearchEngine
+from competitive_sudoku.search import CpuThrottle
 import competitive_sudoku.sudokuai
 import time
 import numpy as np
@@ -14,6 +16,15 @@ class SudokuAI(competitive_sudoku.sudokuai.SudokuAI):
     """
     Sudoku AI that computes a move for a given sudoku configuration.
     """
+
+    parameters = {
+        'c_param': (0.1, 0.0, 1.0),  # the exploration weight of the tree policy
+        'rollout_sample_size': (100, 10, 400),  # the number of moves the rollout policy chooses from
+        'simulation_no': (100000, 1000, 100000),  # the maximal number of simulations
+        'screened_moves': (16, 0, 64),  # the number of moves of a new root that are checked for being taboo
+        'screening_share': (0.1, 0.0, 0.3),  # the fraction of the time budget for checking them
+    }
+
     def __init__(self):
         super().__init__()
 
@@ -21,70 +32,13 @@ class SudokuAI(competitive_sudoku.sudokuai.SudokuAI):
         '''
         :return: legal moves for initial boards
         '''
-        board = game_state.board
-        m, n, N = board.m, board.n, board.N
-
-        # a set consisting of all position (i, j) of empty cells
-        positions_of_empty_cells = set()
-        # numbers_missing_for_xxx has a length of N, each element is a set representing which numbers is missing in that region
-        numbers_missing_for_rows = []
-        numbers_missing_for_cols = []
-        numbers_missing_for_blks = []
-
-        # row
-        for i in range(N):
-            numbers = set(num for num in range(1, N + 1))
-            for j in range(N):
-                val = board.get(i, j)
-                if val == 0:  # find an empty cell
-                    positions_of_empty_cells.add((i, j))
-                else:  # this val is not missing
-                    numbers.remove(val)
-            numbers_missing_for_rows.append(numbers)
-
-        # column
-        for j in range(N):
-            numbers = set(num for num in range(1, N + 1))
-            for i in range(N):
-                val = board.get(i, j)
-                if val == 0:
-                    positions_of_empty_cells.add((i, j))
-                else:
-                    numbers.remove(val)
-            numbers_missing_for_cols.append(numbers)
-
-        # block
-        # the block number is defined from left to right, from top to bottom
-        # i.e. 0,1,...,m-1; m,m+1,...,2*m-1; 2*m, 2*m+1,...
-        n_block = 0
-        for r in range(0, N, m):
-            for c in range(0, N, n):
-                # (r, c) is the top-left cell of the block
-                numbers = set(num for num in range(1, N + 1))
-                for i in range(r, r + m):
-                    for j in range(c, c + n):
-                        val = board.get(i, j)
-                        if val == 0:
-                            positions_of_empty_cells.add((i, j))
-                        else:
-                            numbers.remove(val)
-                numbers_missing_for_blks.append(numbers)
-                n_block += 1
-
-        legal_moves = []
-        for (x, y) in positions_of_empty_cells:
-            # the corresponding block number of (x, y)
-            n_block = (x // m) * m + y // n
-            # legal values should be at least the intersection of the missing number of corresponding three regions
-            possible_values = numbers_missing_for_rows[x] & numbers_missing_for_cols[y] & numbers_missing_for_blks[
-                n_block]
-            # should has not been declared taboo
-            possible_moves = [Move(x, y, val) for val in possible_values if not TabooMove(x, y, val) in game_state.taboo_moves]
-            legal_moves.extend(possible_moves)
-
-        return legal_moves
+        return SearchEngine(game_state, propagation=True).get_all_legal_moves()
 
     def compute_best_move(self, game_state: GameState) -> None:
+        # a small endgame is solved exactly, there is no need to search it
+        if self.propose_proved_move(game_state):
+            return
+
         root = self.load()
         can_find_target_node = 0
         if root:
@@ -122,15 +76,28 @@ class SudokuAI(competitive_sudoku.sudokuai.SudokuAI):
             init_board = game_state.board
             init_scores = game_state.scores
             init_legal_moves = self.get_initial_legal_moves(game_state)
+            # a move that leaves the sudoku without a solution wastes the turn, the first moves are checked for that
+            time_budget = self.allocate_time(game_state, len(init_legal_moves))
+            if time_budget:
+                # the proved labels are kept next to the tree, so the positions of later turns reuse them
+                saved_state = self.load(fast=True)
+                self.taboo_predictor.import_state(saved_state and saved_state.get('taboo_predictor'))
+                init_legal_moves = self.remove_taboo_moves(game_state.board, init_legal_moves, self.screened_moves,
+                                                           self.screening_share * time_budget)
+                self.save({'taboo_predictor': self.taboo_predictor.export_state()}, fast=True)
             init_player = 1 if len(game_state.moves) % 2 == 0 else 2
             # initialize the root node
             initial_state = State(init_board, init_scores, init_legal_moves, init_player, init_player)
-            root = MonteCarloTreeSearchNode(state=initial_state)
+            root = MonteCarloTreeSearchNode(state=initial_state, c_param=self.c_param, sample_size=self.rollout_sample_size)
             # propose a move at the start
             self.propose_move(init_legal_moves[0])
 
-        simulation_no = 100000
-        for i in range(simulation_no):
+        # with a game clock the computation has to stop by itself, the time left is not used up
+        time_budget = self.allocate_time(game_state, len(root.state.legal_moves))
+        start_time = time.perf_counter()
+        for i in range(self.simulation_no):
+            if time_budget is not None and time.perf_counter() - start_time >= 0.9 * time_budget:
+                break
             v = root._tree_policy()
             # backpropagate score reward instead of wins
             player, reward = v.rollout()
@@ -140,3 +107,36 @@ class SudokuAI(competitive_sudoku.sudokuai.SudokuAI):
                 selected_node = root.best_child(c_param=0.)
                 self.propose_move(selected_node.parent_action)
                 self.save(root)  # only keep the latest saved node
+                self.report_stats(simulations=i + 1, time=time.perf_counter() - start_time)
+        if root.children:
+            self.propose_move(root.best_child(c_param=0.).parent_action)
+            self.save(root)
+
+    def ponder(self, game_state: GameState) -> None:
+        root = self.load()
+        if not root or not game_state.moves or isinstance(game_state.moves[-1], TabooMove):
+            return
+        # the saved tree starts before the last move, the simulations are run below that move, so the subtrees of the
+        # likely replies grow, and compute_best_move finds the actual reply as usual
+        node = None
+        for child in root.children:
+            if child.parent_action == game_state.moves[-1]:
+                node = child
+                break
+        if node is None or node.is_terminal_node():
+            return
+        throttle = CpuThrottle(self.ponder_share)
+        # pickling the whole tree takes time, it is saved at most once per ponder_save_interval, and once more at the end
+        time_limit = self.ponder_time(game_state)
+        start_time = last_save = time.perf_counter()
+        for i in range(self.simulation_no):
+            if time_limit is not None and time.perf_counter() - start_time >= 0.9 * time_limit:
+                break
+            v = node._tree_policy()
+            player, reward = v.rollout()
+            v.backpropagate(player, reward)
+            throttle.pause()
+            if time.perf_counter() - last_save >= self.ponder_save_interval:
+                self.save(root)
+                last_save = time.perf_counter()
+        self.save(root)
@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+
+#  (C) Copyright Wieger Wesselink 2021. Distributed under the GPL-3.0-or-later
+#  Software License, (See accompanying file LICENSE or copy at
+#  https://www.gnu.org/licenses/gpl-3.0.txt)
+
+"""
+Script for tuning the parameters of an agent with self-play. The tunable parameters of an agent and their ranges are
+declared in the parameters attribute of its SudokuAI class. A setting is evaluated by playing pairs of games (see
+match.py) against the agent with its default parameters, in parallel over a pool of processes.
+
+Three optimizers are available:
+
+    random    evaluate --candidates random settings with --pairs pairs each
+    halving   successive halving: evaluate --candidates random settings, keep the best half and double the number of
+              pairs, until one setting is left
+    spsa      simultaneous perturbation stochastic approximation: in every one of --iterations iterations, a perturbed
+              setting plays --pairs pairs against the opposite perturbation, and the setting moves in the direction
+              of the winner
+
+At the end, the best setting plays --final-pairs pairs against the defaults, and its Elo difference is printed with a
+confidence interval. Since the games run in parallel, the agents share the CPU with each other; use --workers to keep
+the number of parallel games below the number of cores.
+
+Typical usage:
+
+    python tune.py --agent team6_A2 --optimizer halving --candidates 16 --pairs 2 --time 0.2
+    python tune.py --agent team6_A2 --optimizer spsa --iterations 50 --pairs 4 --save best.json
+    python tune.py --agent team6_A2 --oracle local
+
+Every worker creates its own oracle (--oracle, see simulate_game.py). The default runs bin/solve_sudoku, on systems
+without it use --oracle local.
+"""
+
+import argparse
+import importlib
+import json
+import os
+import platform
+import random
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Tuple
+from competitive_sudoku.events import EventStream, NullSink
+from competitive_sudoku.oracle import CachedOracle, create_oracle
+from competitive_sudoku.sprt import elo_interval
+from competitive_sudoku.sudoku import SudokuBoard, load_sudoku
+from match import play_pair
+
+
+def play_configured_pair(agent: str, setting1: dict, setting2: dict, board: SudokuBoard, solve_sudoku_path: str, calculation_time: float, oracle_kind: str) -> float:
+    """
+    The task of a worker process: plays a pair of games between two settings of an agent.
+    @param oracle_kind: The kind of oracle that validates the moves, see create_oracle. The oracle is created in the
+    worker, and cached since both games are played on the same board.
+    @return: The average score of setting1.
+    """
+    module = importlib.import_module(agent + '.sudokuai')
+    player1 = module.SudokuAI()
+    player1.configure(**setting1)
+    player2 = module.SudokuAI()
+    player2.configure(**setting2)
+    oracle = CachedOracle(create_oracle(oracle_kind, solve_sudoku_path))
+    try:
+        return play_pair(board, player1, player2, solve_sudoku_path, calculation_time, EventStream([NullSink()]), oracle)
+    finally:
+        oracle.close()
+
+
+class Tuner(object):
+    """
+    Evaluates settings of an agent against its defaults, or against each other, in a pool of processes.
+    """
+
+    def __init__(self, agent: str, boards: List[SudokuBoard], solve_sudoku_path: str, calculation_time: float, oracle_kind: str, executor: ProcessPoolExecutor, rng: random.Random):
+        self.agent = agent
+        self.parameters = importlib.import_module(agent + '.sudokuai').SudokuAI.parameters
+        self.defaults = {name: default for name, (default, _, _) in self.parameters.items()}
+        self.boards = boards
+        self.solve_sudoku_path = solve_sudoku_path
+        self.calculation_time = calculation_time
+        self.oracle_kind = oracle_kind
+        self.executor = executor
+        self.rng = rng
+        self.next_board = 0
+
+    def setting(self, x: Dict[str, float]) -> dict:
+        """
+        Converts a point of the unit cube to a setting. Parameters with an integer default get integer values.
+        @param x: A mapping from parameter names to values in [0, 1].
+        """
+        setting = {}
+        for name, (default, low, high) in self.parameters.items():
+            value = low + min(max(x[name], 0), 1) * (high - low)
+            setting[name] = round(value) if isinstance(default, int) else value
+        return setting
+
+    def random_point(self) -> Dict[str, float]:
+        return {name: self.rng.random() for name in self.parameters}
+
+    def evaluate(self, matches: List[Tuple[dict, dict]], pairs: int) -> List[List[float]]:
+        """
+        Plays a number of pairs for every match in parallel. The matches share the boards, so their results are
+        comparable.
+        @param matches: A list of (setting, opponent setting).
+        @param pairs: The number of pairs of every match.
+        @return: The pair scores of every match.
+        """
+        boards = [self.boards[(self.next_board + k) % len(self.boards)] for k in range(pairs)]
+        self.next_board += pairs
+        futures = [[self.executor.submit(play_configured_pair, self.agent, setting, opponent, board, self.solve_sudoku_path, self.calculation_time, self.oracle_kind)
+                    for board in boards] for setting, opponent in matches]
+        return [[future.result() for future in match_futures] for match_futures in futures]
+
+    def random_search(self, candidates: int, pairs: int) -> dict:
+        settings = [self.setting(self.random_point()) for _ in range(candidates)]
+        scores = self.evaluate([(setting, self.defaults) for setting in settings], pairs)
+        best = max(range(candidates), key=lambda k: sum(scores[k]))
+        return settings[best]
+
+    def successive_halving(self, candidates: int, pairs: int) -> dict:
+        settings = [self.setting(self.random_point()) for _ in range(candidates)]
+        scores = [[] for _ in settings]
+        while len(settings) > 1:
+            for total, new in zip(scores, self.evaluate([(setting, self.defaults) for setting in settings], pairs)):
+                total.extend(new)
+            ranking = sorted(range(len(settings)), key=lambda k: sum(scores[k]) / len(scores[k]), reverse=True)
+            keep = ranking[:max(1, len(settings) // 2)]
+            print(f'{len(settings)} settings, {len(scores[0])} pairs each, best score {sum(scores[keep[0]]) / len(scores[keep[0]]):.3f}')
+            settings = [settings[k] for k in keep]
+            scores = [scores[k] for k in keep]
+            pairs *= 2
+        return settings[0]
+
+    def spsa(self, iterations: int, pairs: int, a: float = 0.2, c: float = 0.1) -> dict:
+        names = list(self.parameters)
+        x = {name: (self.defaults[name] - low) / (high - low) for name, (_, low, high) in self.parameters.items()}
+        for k in range(iterations):
+            a_k = a / (k + 1) ** 0.602
+            c_k = c / (k + 1) ** 0.101
+            delta = {name: self.rng.choice((-1, 1)) for name in names}
+            plus = self.setting({name: x[name] + c_k * delta[name] for name in names})
+            minus = self.setting({name: x[name] - c_k * delta[name] for name in names})
+            scores = self.evaluate([(plus, minus)], pairs)[0]
+            # the score of plus against minus estimates the directional derivative along delta
+            gradient = 2 * (sum(scores) / len(scores) - 0.5) / (2 * c_k)
+            x = {name: min(max(x[name] + a_k * gradient * delta[name], 0), 1) for name in names}
+            print(f'iteration {k + 1}: score {sum(scores) / len(scores):.3f} setting {self.setting(x)}')
+        return self.setting(x)
+
+
+def main():
+    solve_sudoku_path = str(Path('bin\\solve_sudoku.exe' if platform.system() == 'Windows' else 'bin/solve_sudoku').resolve())
+
+    cmdline_parser = argparse.ArgumentParser(description='Script for tuning the parameters of an agent with self-play.')
+    cmdline_parser.add_argument('--agent', help="the module name of the agent's SudokuAI class", required=True)
+    cmdline_parser.add_argument('--optimizer', choices=['random', 'halving', 'spsa'], default='halving', help='the optimizer (default: halving)')
+    cmdline_parser.add_argument('--time', help="the time (in seconds) for computing a move (default: 0.2)", type=float, default=0.2)
+    cmdline_parser.add_argument('--oracle', choices=['executable', 'local', 'service', 'local-service'], default='executable', help='the oracle that validates the moves, see simulate_game.py (default: executable)')
+    cmdline_parser.add_argument('--boards', metavar='FILE', nargs='*', help='the start positions (default: all boards in the boards directory)')
+    cmdline_parser.add_argument('--candidates', type=int, default=16, help='the number of random settings of random and halving (default: 16)')
+    cmdline_parser.add_argument('--iterations', type=int, default=30, help='the number of iterations of spsa (default: 30)')
+    cmdline_parser.add_argument('--pairs', type=int, default=2, help='the number of pairs per evaluation (default: 2)')
+    cmdline_parser.add_argument('--final-pairs', type=int, default=32, help='the number of pairs of the final evaluation (default: 32)')
+    cmdline_parser.add_argument('--workers', type=int, default=os.cpu_count(), help='the number of parallel games (default: the number of cores)')
+    cmdline_parser.add_argument('--seed', type=int, default=0, help='the seed of the optimizer (default: 0)')
+    cmdline_parser.add_argument('--save', metavar='FILE', help='save the best setting and its evaluation as JSON')
+    args = cmdline_parser.parse_args()
+
+    board_files = args.boards or sorted(str(path) for path in Path('boards').glob('*.txt'))
+    boards = [load_sudoku(filename) for filename in board_files]
+    with ProcessPoolExecutor(args.workers) as executor:
+        tuner = Tuner(args.agent, boards, solve_sudoku_path, args.time, args.oracle, executor, random.Random(args.seed))
+        if not tuner.parameters:
+            print(f'{args.agent} has no tunable parameters.')
+            return
+        if args.optimizer == 'random':
+            best = tuner.random_search(args.candidates, args.pairs)
+        elif args.optimizer == 'halving':
+            best = tuner.successive_halving(args.candidates, args.pairs)
+        else:
+            best = tuner.spsa(args.iterations, args.pairs)
+        scores = tuner.evaluate([(best, tuner.defaults)], args.final_pairs)[0]
+
+    elo, lower, upper = elo_interval(scores)
+    score = sum(scores) / len(scores)
+    print(f'best setting: {best}')
+    print(f'against the defaults: score {score:.3f}, elo {elo:.1f} with 95% confidence interval [{lower:.1f}, {upper:.1f}]')
+    if args.save:
+        with open(args.save, 'w') as handle:
+            json.dump({'agent': args.agent, 'setting': best, 'defaults': tuner.defaults, 'score': score,
+                       'elo': elo, 'elo_interval': [lower, upper], 'pairs': len(scores)}, handle, indent=2)
+
+
+if __name__ == '__main__':
+    main()